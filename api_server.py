@@ -7,12 +7,19 @@ RAG系统API服务器
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import uvicorn
 import os
+import time
+
+PROCESS_START = time.time()
 
 from rag_system import RAGSystem
+from rag_system.serving import InferenceExecutor, EventLoopLagMonitor
+from rag_system.build_jobs import BuildJobManager
+from rag_system.multiprocess_encoder import available_cpus
 
 app = FastAPI(title="RAG系统API", version="1.0.0")
 
@@ -26,11 +33,24 @@ app.add_middleware(
 
 rag_system = None
 
+# 编码、向量检索和重排在有界线程池中执行，避免阻塞事件循环
+inference_executor = InferenceExecutor(int(os.getenv("RAG_MAX_INFLIGHT", "4")))
+loop_lag_monitor = EventLoopLagMonitor()
+# 知识库构建在独立线程中作为后台任务执行，写入新版本集合后切换别名
+build_jobs = BuildJobManager()
+# 构建的数据文件只由服务端配置，不接受请求指定的路径
+BUILD_STUDENT_CSV = os.getenv("RAG_STUDENT_CSV", "data/students.csv")
+BUILD_PLAN_TXT = os.getenv("RAG_PLAN_TXT", "data/cultivation_plan.txt")
+
 class QueryRequest(BaseModel):
     question: str
     top_k_retrieve: Optional[int] = 20
     top_k_final: Optional[int] = 5
 
+class BuildRequest(BaseModel):
+    collection_name: Optional[str] = "student_knowledge"
+    encode_workers: Optional[int] = None
+
 class QueryResponse(BaseModel):
     question: str
     answer: str
@@ -40,9 +60,20 @@ class QueryResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     global rag_system
+    loop_lag_monitor.start()
     print("初始化RAG系统...")
-    rag_system = RAGSystem()
-    print("RAG系统初始化完成")
+    rag_system = RAGSystem(
+        micro_batching=os.getenv("RAG_MICRO_BATCHING", "0") == "1",
+        max_batch_size=int(os.getenv("RAG_MAX_BATCH_SIZE", "32")),
+        max_batch_wait_ms=float(os.getenv("RAG_MAX_BATCH_WAIT_MS", "5")),
+        vector_backend=os.getenv("RAG_VECTOR_BACKEND", "chroma"),
+        semantic_cache=os.getenv("RAG_SEMANTIC_CACHE", "0") == "1",
+        semantic_cache_threshold=float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.98"))
+    )
+    # 模型在后台预热，服务立即可以响应存活探测
+    if os.getenv("RAG_WARM_UP", "1") == "1":
+        rag_system.warm_up(background=True)
+    print(f"RAG系统初始化完成，启动耗时 {(time.time() - PROCESS_START) * 1000:.0f} 毫秒")
 
 @app.get("/")
 async def root():
@@ -54,7 +85,8 @@ async def query(request: QueryRequest):
         if not rag_system:
             raise HTTPException(status_code=500, detail="RAG系统未初始化")
         
-        result = rag_system.query(
+        result = await inference_executor.run(
+            rag_system.query,
             question=request.question,
             top_k_retrieve=request.top_k_retrieve,
             top_k_final=request.top_k_final
@@ -65,28 +97,91 @@ async def query(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
 
-@app.post("/api/build_knowledge_base")
-async def build_knowledge_base():
-    try:
-        if not rag_system:
-            raise HTTPException(status_code=500, detail="RAG系统未初始化")
-        
-        rag_system.build_knowledge_base(
-            student_csv="data/students.csv",
-            plan_txt="data/cultivation_plan.txt"
-        )
-        
-        return {"message": "知识库构建成功"}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"构建失败: {str(e)}")
+@app.post("/api/build_knowledge_base", status_code=202)
+async def build_knowledge_base(request: Optional[BuildRequest] = None):
+    """提交后台构建任务，立即返回任务ID；构建期间查询继续使用旧版本"""
+    if not rag_system:
+        raise HTTPException(status_code=500, detail="RAG系统未初始化")
+    
+    request = request or BuildRequest()
+    params = request.dict()
+    # 编码进程数不超过可用核心数
+    if params["encode_workers"] is not None:
+        params["encode_workers"] = max(1, min(params["encode_workers"], len(available_cpus())))
+    params.update(student_csv=BUILD_STUDENT_CSV, plan_txt=BUILD_PLAN_TXT)
+    job = build_jobs.submit(
+        lambda job: rag_system.build_knowledge_base_version(job=job, **params),
+        params=params
+    )
+    return {"message": "知识库构建任务已提交", "job_id": job.id, "status": job.status}
+
+@app.get("/api/build_jobs")
+async def list_build_jobs():
+    return {"jobs": [job.to_dict() for job in build_jobs.list()]}
+
+@app.get("/api/build_jobs/{job_id}")
+async def get_build_job(job_id: str):
+    job = build_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"构建任务不存在: {job_id}")
+    return job.to_dict()
+
+@app.post("/api/build_jobs/{job_id}/cancel")
+async def cancel_build_job(job_id: str):
+    job = build_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"构建任务不存在: {job_id}")
+    return job.to_dict()
 
 @app.get("/api/health")
 async def health_check():
     return {
         "status": "healthy",
-        "rag_system_initialized": rag_system is not None
+        "rag_system_initialized": rag_system is not None,
+        "rag_system_ready": rag_system is not None and rag_system.is_ready
+    }
+
+@app.get("/api/health/live")
+async def liveness():
+    """存活探测：进程能响应即为存活，不依赖模型加载"""
+    return {
+        "status": "alive",
+        "uptime_seconds": time.time() - PROCESS_START
     }
 
+@app.get("/api/health/ready")
+async def readiness():
+    """就绪探测：模型和向量数据库加载完成前返回503"""
+    if not rag_system:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "ready": False})
+    
+    readiness_info = rag_system.get_readiness()
+    readiness_info["start_to_ready_seconds"] = (
+        rag_system.ready_at - PROCESS_START if rag_system.ready_at else None
+    )
+    readiness_info["status"] = "ready" if readiness_info["ready"] else "not_ready"
+    return JSONResponse(status_code=200 if readiness_info["ready"] else 503, content=readiness_info)
+
+@app.get("/api/batching_stats")
+async def batching_stats():
+    if not rag_system:
+        raise HTTPException(status_code=500, detail="RAG系统未初始化")
+    return rag_system.get_batching_stats()
+
+@app.get("/api/runtime_metrics")
+async def runtime_metrics():
+    """推理线程池和事件循环延迟指标"""
+    return {
+        "inference_executor": inference_executor.get_stats(),
+        "event_loop_lag_ms": loop_lag_monitor.get_stats(),
+        "semantic_cache": rag_system.get_semantic_cache_stats() if rag_system else None
+    }
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    loop_lag_monitor.stop()
+    build_jobs.shutdown()
+    inference_executor.shutdown()
+
 if __name__ == "__main__":
     uvicorn.run("api_server:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -6,10 +6,80 @@
 
 import pandas as pd
 import os
-import chromadb
-from sentence_transformers import SentenceTransformer
+import sys
+import inspect
 import numpy as np
 import re
+from contextlib import contextmanager
+from rag_system.embedding_cache import EmbeddingCache, model_fingerprint
+from rag_system.model_registry import BI_ENCODER, get_model_registry
+from rag_system.bm25_index import BM25Index, bm25_index_path
+from rag_system.vector_db import ChromaVectorDB
+from rag_system.document_ids import assign_document_ids
+from rag_system.build_manifest import BuildManifest
+from rag_system.collection_aliases import CollectionAliases
+
+EMBEDDING_CACHE_DIR = "./embedding_cache"
+BGE_MODEL_PATHS = ["D:/bge_models/bge-small-zh-v1.5", "BAAI/bge-small-zh-v1.5"]
+GRADUATES_CSV = "data/real_graduates.csv"
+PLANS_TXT = "data/all_cultivation_plans.txt"
+PERSIST_DIRECTORY = "./vector_db"
+COLLECTION_NAME = "student_knowledge"
+# 构建清单中的阶段名；文档文本格式变化时递增版本号
+MANIFEST_STAGE = "knowledge_base"
+DOC_FORMAT_VERSION = 1
+MIN_SECTION_CHARS = 50
+
+def load_bge_model():
+    """从进程级模型注册表获取BGE模型，优先使用本地模型，构建和测试共用同一实例"""
+    registry = get_model_registry()
+    for i, model_path in enumerate(BGE_MODEL_PATHS):
+        try:
+            return registry.acquire(model_path, BI_ENCODER), model_path
+        except Exception:
+            if i + 1 == len(BGE_MODEL_PATHS):
+                raise
+            print("⚠️ 本地模型未找到，尝试使用在线模型...")
+
+@contextmanager
+def bge_model():
+    """加载BGE模型供构建和测试共用，退出时释放模型注册表中的引用"""
+    model, model_path = load_bge_model()
+    try:
+        yield model, model_path
+    finally:
+        get_model_registry().release(model_path, BI_ENCODER)
+
+def expected_model_path():
+    """不加载模型，按load_bge_model的优先级推断将要使用的模型路径"""
+    for model_path in BGE_MODEL_PATHS[:-1]:
+        if os.path.isdir(model_path):
+            return model_path
+    return BGE_MODEL_PATHS[-1]
+
+def serving_collection_name():
+    """COLLECTION_NAME可能是别名（API服务零停机重建后），解析为当前提供服务的集合"""
+    return CollectionAliases(PERSIST_DIRECTORY).resolve(COLLECTION_NAME)
+
+def knowledge_base_params(model_path):
+    """影响知识库内容的参数：模型指纹、分块规则和文档格式"""
+    return {
+        "model_fingerprint": model_fingerprint(model_path),
+        "chunker_source": "".join(inspect.getsource(fn) for fn in
+                                  (split_cultivation_plan, plan_documents, graduate_documents)),
+        "min_section_chars": MIN_SECTION_CHARS,
+        "doc_format_version": DOC_FORMAT_VERSION,
+        "collection": serving_collection_name()
+    }
+
+def knowledge_base_outputs():
+    """
+    知识库阶段的输出文件，被删除或改动时需要重建
+
+    BM25索引与集合同步生成并记录了集合ID，集合在别处被重建时索引也会被改写；
+    chroma.sqlite3在正常读写时也会变化，只检查其是否存在。
+    """
+    return [bm25_index_path(PERSIST_DIRECTORY, serving_collection_name())]
 
 def clean_text(text):
     """清理文本"""
@@ -65,108 +135,135 @@ def split_cultivation_plan(content):
     
     return sections
 
-def build_knowledge_base():
-    """构建知识库"""
+def graduate_documents(csv_path=GRADUATES_CSV):
+    """
+    把毕业生CSV转换为文档和元数据
+    
+    Args:
+        csv_path: 毕业生数据CSV路径
+        
+    Returns:
+        (文档列表, 元数据列表)
+    """
+    documents = []
+    metadatas = []
+    graduates_df = pd.read_csv(csv_path, encoding='utf-8')
+    print(f"读取到 {len(graduates_df)} 条毕业生记录")
+    
+    for idx, row in graduates_df.iterrows():
+        # 生成毕业生描述
+        description = f"毕业生{clean_text(row['姓名'])}，学号{clean_text(row['学号'])}，"
+        description += f"GPA成绩{clean_text(row['GPA'])}，所在地{clean_text(row['所在地'])}，"
+        description += f"发展方向{clean_text(row['发展方向'])}，"
+        
+        if pd.notna(row['就业去向']) and clean_text(row['就业去向']) != '':
+            description += f"就业去向{clean_text(row['就业去向'])}，"
+        
+        if pd.notna(row['年薪']) and clean_text(row['年薪']) != '':
+            description += f"年薪{clean_text(row['年薪'])}"
+        else:
+            description += "年薪信息未提供"
+        
+        documents.append(description)
+        metadatas.append({
+            "type": "graduate",
+            "source": csv_path,
+            "doc_key": clean_text(row['学号']) or f"row_{idx}",
+            "student_id": clean_text(row['学号']),
+            "name": clean_text(row['姓名']),
+            "gpa": clean_text(row['GPA']),
+            "location": clean_text(row['所在地']),
+            "career_path": clean_text(row['发展方向']),
+            "employment": clean_text(row['就业去向']),
+            "salary": clean_text(row['年薪'])
+        })
+    
+    return documents, metadatas
+
+def plan_documents(plan_content, source=PLANS_TXT):
+    """
+    按专业和章节切分合并后的培养方案文本
+    
+    Args:
+        plan_content: all_cultivation_plans.txt的内容
+        source: 来源文件（写入元数据，参与文档ID）
+        
+    Returns:
+        (文档列表, 元数据列表)
+    """
+    documents = []
+    metadatas = []
+    
+    # 按专业分割
+    major_sections = re.split(r'## (.+?) 专业专业培养方案', plan_content)
+    
+    for i in range(1, len(major_sections), 2):
+        if i + 1 < len(major_sections):
+            major_name = major_sections[i].strip()
+            major_content = major_sections[i + 1].strip()
+            
+            if major_name and major_content:
+                # 分割专业内容
+                sections = split_cultivation_plan(major_content)
+                
+                for j, section in enumerate(sections):
+                    if len(section.strip()) > MIN_SECTION_CHARS:  # 过滤太短的段落
+                        documents.append(section.strip())
+                        metadatas.append({
+                            "type": "cultivation_plan",
+                            "source": source,
+                            "doc_key": f"{major_name}#{j}",
+                            "major": major_name,
+                            "section_id": j,
+                            "section_name": section[:50] + "..." if len(section) > 50 else section
+                        })
+    
+    return documents, metadatas
+
+def build_knowledge_base(model, model_path):
+    """构建知识库（model由调用方通过bge_model()获取并负责释放）"""
     
     print("🚀 开始构建知识库...")
     
-    # 初始化向量化器
-    print("🔄 加载BGE模型...")
-    try:
-        model = SentenceTransformer("D:/bge_models/bge-small-zh-v1.5")
-    except:
-        print("⚠️ 本地模型未找到，尝试使用在线模型...")
-        model = SentenceTransformer("BAAI/bge-small-zh-v1.5")
-    print("✅ BGE模型加载完成")
+    # 向量缓存：只有新增或修改过的文本才需要重新编码
+    cache = EmbeddingCache(EMBEDDING_CACHE_DIR, model_fingerprint(model_path))
     
     # 初始化ChromaDB
     print("🔄 初始化ChromaDB...")
-    client = chromadb.PersistentClient(path="./vector_db")
+    vector_db = ChromaVectorDB(PERSIST_DIRECTORY)
     
-    # 删除已存在的集合
-    try:
-        client.delete_collection("student_knowledge")
-        print("🗑️ 删除旧集合")
-    except:
-        pass
-    
-    collection = client.create_collection(
-        name="student_knowledge",
-        metadata={"hnsw:space": "cosine"}
-    )
+    # 保留已有集合，按稳定的文档ID增量同步
+    collection_name = serving_collection_name()
+    vector_db.get_or_create_collection(collection_name)
+    collection = vector_db.collection
     print("✅ ChromaDB初始化完成")
     
     all_documents = []
     all_metadatas = []
-    doc_id_counter = 0
+    source_failed = False
     
     # 处理真实毕业生数据
     print("📊 处理真实毕业生数据...")
     try:
-        graduates_df = pd.read_csv("data/real_graduates.csv", encoding='utf-8')
-        print(f"读取到 {len(graduates_df)} 条毕业生记录")
-        
-        for idx, row in graduates_df.iterrows():
-            # 生成毕业生描述
-            description = f"毕业生{clean_text(row['姓名'])}，学号{clean_text(row['学号'])}，"
-            description += f"GPA成绩{clean_text(row['GPA'])}，所在地{clean_text(row['所在地'])}，"
-            description += f"发展方向{clean_text(row['发展方向'])}，"
-            
-            if pd.notna(row['就业去向']) and clean_text(row['就业去向']) != '':
-                description += f"就业去向{clean_text(row['就业去向'])}，"
-            
-            if pd.notna(row['年薪']) and clean_text(row['年薪']) != '':
-                description += f"年薪{clean_text(row['年薪'])}"
-            else:
-                description += "年薪信息未提供"
-            
-            all_documents.append(description)
-            all_metadatas.append({
-                "type": "graduate",
-                "student_id": clean_text(row['学号']),
-                "name": clean_text(row['姓名']),
-                "gpa": clean_text(row['GPA']),
-                "location": clean_text(row['所在地']),
-                "career_path": clean_text(row['发展方向']),
-                "employment": clean_text(row['就业去向']),
-                "salary": clean_text(row['年薪'])
-            })
-            doc_id_counter += 1
-            
+        documents, metadatas = graduate_documents(GRADUATES_CSV)
+        all_documents.extend(documents)
+        all_metadatas.extend(metadatas)
     except Exception as e:
         print(f"❌ 处理毕业生数据时出错: {e}")
+        source_failed = True
     
     # 处理培养方案数据
     print("📋 处理培养方案数据...")
     try:
-        with open("data/all_cultivation_plans.txt", "r", encoding="utf-8") as f:
+        with open(PLANS_TXT, "r", encoding="utf-8") as f:
             plan_content = f.read()
         
-        # 按专业分割
-        major_sections = re.split(r'## (.+?) 专业专业培养方案', plan_content)
-        
-        for i in range(1, len(major_sections), 2):
-            if i + 1 < len(major_sections):
-                major_name = major_sections[i].strip()
-                major_content = major_sections[i + 1].strip()
-                
-                if major_name and major_content:
-                    # 分割专业内容
-                    sections = split_cultivation_plan(major_content)
-                    
-                    for j, section in enumerate(sections):
-                        if len(section.strip()) > 50:  # 过滤太短的段落
-                            all_documents.append(section.strip())
-                            all_metadatas.append({
-                                "type": "cultivation_plan",
-                                "major": major_name,
-                                "section_id": j,
-                                "section_name": section[:50] + "..." if len(section) > 50 else section
-                            })
-                            doc_id_counter += 1
-                            
+        documents, metadatas = plan_documents(plan_content, PLANS_TXT)
+        all_documents.extend(documents)
+        all_metadatas.extend(metadatas)
     except Exception as e:
         print(f"❌ 处理培养方案数据时出错: {e}")
+        source_failed = True
     
     print(f"📝 总共 {len(all_documents)} 个文档")
     
@@ -174,22 +271,34 @@ def build_knowledge_base():
         print("❌ 没有找到有效文档，知识库构建失败")
         return None
     
+    if source_failed:
+        # 部分数据缺失时同步会把对应文档当作已删除，直接终止
+        print("❌ 数据源处理失败，为避免误删已有文档，终止构建")
+        return None
+    
     # 向量化文档
-    print("🔄 向量化文档...")
+    print("🔄 增量向量化并存储到向量数据库...")
     try:
-        embeddings = model.encode(all_documents, show_progress_bar=True, batch_size=32)
+        # 由 (来源文件, 学号/专业#章节, 内容哈希) 生成稳定ID
+        doc_ids = assign_document_ids(all_documents, all_metadatas)
+        
+        def embed(texts):
+            # 与RAGSystem共用缓存，统一使用归一化向量（余弦空间下检索结果不变）
+            return cache.encode(
+                texts,
+                lambda batch: model.encode(batch, show_progress_bar=False, batch_size=32,
+                                           normalize_embeddings=True)
+            )
         
-        # 生成文档ID
-        doc_ids = [f"doc_{i}" for i in range(len(all_documents))]
+        # 只编码写入新增和修改过的文档，删除源数据中已不存在的文档
+        report = vector_db.sync_documents(doc_ids, all_documents, all_metadatas, embed)
         
-        # 添加到向量数据库
-        print("💾 存储到向量数据库...")
-        collection.add(
-            documents=all_documents,
-            embeddings=embeddings.tolist(),
-            metadatas=all_metadatas,
-            ids=doc_ids
-        )
+        # 同步构建BM25索引，供RAGSystem混合检索使用
+        print("🔤 构建BM25索引...")
+        bm25 = BM25Index()
+        bm25.collection_id = str(collection.id)
+        bm25.add_documents(doc_ids, all_documents, all_metadatas)
+        bm25.save(bm25_index_path(PERSIST_DIRECTORY, collection_name))
         
         print("✅ 知识库构建完成！")
         
@@ -201,7 +310,18 @@ def build_knowledge_base():
         print(f"  - 毕业生文档: {graduate_count} 个")
         print(f"  - 培养方案文档: {plan_count} 个")
         print(f"  - 总文档数: {len(all_documents)} 个")
-        print(f"  - 向量维度: {embeddings.shape[1]}")
+        print(f"  - 新增: {report['added']} 个，更新: {report['updated']} 个，"
+              f"未变: {report['unchanged']} 个，删除: {report['removed']} 个")
+        
+        cache_stats = cache.get_stats()
+        print(f"  - 向量缓存命中: {cache_stats['hits']} 次，未命中: {cache_stats['misses']} 次")
+        
+        # 记录构建清单，输入和参数不变时下次构建直接跳过
+        manifest = BuildManifest()
+        manifest.record(MANIFEST_STAGE, [GRADUATES_CSV, PLANS_TXT],
+                        knowledge_base_params(model_path), knowledge_base_outputs(),
+                        extra={"report": report})
+        manifest.save()
         
         return collection
         
@@ -209,7 +329,7 @@ def build_knowledge_base():
         print(f"❌ 向量化过程中出错: {e}")
         return None
 
-def test_knowledge_base(collection):
+def test_knowledge_base(collection, model):
     """测试知识库"""
     if collection is None:
         print("❌ 知识库未构建成功，无法测试")
@@ -224,11 +344,6 @@ def test_knowledge_base(collection):
         "人工智能方向的毕业生去向如何？"
     ]
     
-    try:
-        model = SentenceTransformer("D:/bge_models/bge-small-zh-v1.5")
-    except:
-        model = SentenceTransformer("BAAI/bge-small-zh-v1.5")
-    
     for question in test_questions:
         print(f"\n问题: {question}")
         
@@ -250,20 +365,37 @@ def test_knowledge_base(collection):
         except Exception as e:
             print(f"  ❌ 查询失败: {e}")
 
-def main():
-    """主函数"""
+def main(force=False):
+    """
+    主函数
+    
+    Args:
+        force: 忽略构建清单，强制重新同步知识库
+    """
     print("=" * 60)
     print("知识库构建工具 - 真实毕业生数据 + 培养方案")
     print("=" * 60)
     
-    # 构建知识库
-    collection = build_knowledge_base()
+    # 数据文件、分块参数、模型均未变化时无需加载模型
+    manifest = BuildManifest()
+    if not force and os.path.exists(os.path.join(PERSIST_DIRECTORY, "chroma.sqlite3")) and manifest.is_up_to_date(
+            MANIFEST_STAGE, [GRADUATES_CSV, PLANS_TXT],
+            knowledge_base_params(expected_model_path()), knowledge_base_outputs()):
+        print("⏭️ 数据文件、分块参数和模型均未变化，知识库无需重建（使用 --force 强制重建）")
+        return
     
-    # 测试知识库
-    test_knowledge_base(collection)
+    print("🔄 加载BGE模型...")
+    with bge_model() as (model, model_path):
+        print("✅ BGE模型加载完成")
+        
+        # 构建知识库
+        collection = build_knowledge_base(model, model_path)
+        
+        # 测试知识库
+        test_knowledge_base(collection, model)
     
     print(f"\n🎉 知识库构建和测试完成！")
     print(f"📁 向量数据库保存在: ./vector_db/")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main(force="--force" in sys.argv) 
\ No newline at end of file
@@ -5,20 +5,23 @@
 """
 
 import chromadb
-from sentence_transformers import SentenceTransformer
 import pandas as pd
+from rag_system.model_registry import BI_ENCODER, get_model_registry
 
 class KnowledgeBaseQuery:
     def __init__(self):
         """初始化知识库查询器"""
         print("🔄 初始化知识库查询器...")
         
-        # 加载模型
+        # 从进程级模型注册表获取模型，与同进程的RAGSystem共用
+        registry = get_model_registry()
         try:
-            self.model = SentenceTransformer("D:/bge_models/bge-small-zh-v1.5")
+            self.model_path = "D:/bge_models/bge-small-zh-v1.5"
+            self.model = registry.acquire(self.model_path, BI_ENCODER)
         except:
             print("⚠️ 本地模型未找到，使用在线模型...")
-            self.model = SentenceTransformer("BAAI/bge-small-zh-v1.5")
+            self.model_path = "BAAI/bge-small-zh-v1.5"
+            self.model = registry.acquire(self.model_path, BI_ENCODER)
         
         # 连接ChromaDB
         try:
@@ -29,6 +32,12 @@ class KnowledgeBaseQuery:
             print(f"❌ 连接知识库失败: {e}")
             self.collection = None
     
+    def close(self):
+        """释放模型引用"""
+        if self.model is not None:
+            get_model_registry().release(self.model_path, BI_ENCODER)
+            self.model = None
+    
     def search(self, query, n_results=5):
         """搜索知识库"""
         if self.collection is None:
@@ -14,6 +14,7 @@ import os
 
 # 导入RAG系统
 from rag_system import RAGSystem
+from rag_system.serving import InferenceExecutor, EventLoopLagMonitor
 
 app = FastAPI(title="本地BGE RAG系统API", version="1.0.0")
 
@@ -27,6 +28,10 @@ app.add_middleware(
 
 rag_system = None
 
+# 编码、向量检索和重排在有界线程池中执行，避免阻塞事件循环
+inference_executor = InferenceExecutor(int(os.getenv("RAG_MAX_INFLIGHT", "4")))
+loop_lag_monitor = EventLoopLagMonitor()
+
 class QueryRequest(BaseModel):
     question: str
     top_k_retrieve: Optional[int] = 20
@@ -46,6 +51,7 @@ class BuildRequest(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     global rag_system
+    loop_lag_monitor.start()
     print("🚀 初始化本地BGE RAG系统...")
     try:
         # 使用本地模型路径
@@ -59,6 +65,8 @@ async def startup_event():
             bi_encoder_model=bi_encoder_path,
             cross_encoder_model=cross_encoder_path
         )
+        # 模型在后台预热，不阻塞服务启动
+        rag_system.warm_up(background=True)
         print("✅ 本地BGE RAG系统初始化完成")
     except Exception as e:
         print(f"❌ 本地BGE RAG系统初始化失败: {e}")
@@ -113,7 +121,8 @@ async def query(request: QueryRequest):
         
         print(f"🔍 处理查询: {request.question}")
         
-        result = rag_system.query(
+        result = await inference_executor.run(
+            rag_system.query,
             question=request.question,
             top_k_retrieve=request.top_k_retrieve,
             top_k_final=request.top_k_final
@@ -149,7 +158,8 @@ async def build_knowledge_base(request: BuildRequest):
         if not os.path.exists(request.plan_txt):
             return {"error": f"培养方案文件不存在: {request.plan_txt}"}
         
-        rag_system.build_knowledge_base(
+        await inference_executor.run(
+            rag_system.build_knowledge_base,
             student_csv=request.student_csv,
             plan_txt=request.plan_txt
         )
@@ -189,7 +199,7 @@ async def test_query():
         if not rag_system:
             return {"error": "RAG系统未初始化"}
         
-        result = rag_system.query(question=test_question)
+        result = await inference_executor.run(rag_system.query, question=test_question)
         
         # 添加模型信息
         bi_encoder_info = rag_system.vectorizer.bi_encoder.get_model_info()
@@ -205,6 +215,19 @@ async def test_query():
     except Exception as e:
         return {"error": f"测试失败: {str(e)}"}
 
+@app.get("/api/runtime_metrics")
+async def runtime_metrics():
+    """推理线程池和事件循环延迟指标"""
+    return {
+        "inference_executor": inference_executor.get_stats(),
+        "event_loop_lag_ms": loop_lag_monitor.get_stats()
+    }
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    loop_lag_monitor.stop()
+    inference_executor.shutdown()
+
 if __name__ == "__main__":
     print("🚀 启动本地BGE RAG API服务器...")
     print("📡 服务器地址: http://localhost:8002")
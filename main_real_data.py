@@ -168,6 +168,7 @@ def demo_advanced_features():
     print("🔧 高级功能演示 - 真实数据")
     print("=" * 60)
     
+    # 模型通过进程级注册表共享，main()中已加载的模型不会重复加载
     rag = RAGSystem()
     
     # 演示相似文档搜索
@@ -201,6 +202,8 @@ def demo_advanced_features():
         print(f"知识库已导出到: {export_path}")
     except Exception as e:
         print(f"❌ 导出失败: {e}")
+    
+    rag.close()
 
 if __name__ == "__main__":
     try:
@@ -10,11 +10,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import uvicorn
+import asyncio
+import functools
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入简化的RAG系统
 from rag_system import RAGSystem
+from rag_system.serving import InferenceExecutor, EventLoopLagMonitor
 
 app = FastAPI(title="离线RAG系统API", version="1.0.0")
 
@@ -28,6 +32,12 @@ app.add_middleware(
 
 rag_system = None
 
+# 编码、向量检索和重排在有界线程池中执行，避免阻塞事件循环
+inference_executor = InferenceExecutor(int(os.getenv("RAG_MAX_INFLIGHT", "4")))
+loop_lag_monitor = EventLoopLagMonitor()
+# 知识库构建耗时较长，使用单独的单线程池，不占用推理线程池的并发名额
+build_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-build")
+
 class QueryRequest(BaseModel):
     question: str
     top_k_retrieve: Optional[int] = 20
@@ -47,6 +57,7 @@ class BuildRequest(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     global rag_system
+    loop_lag_monitor.start()
     print("🚀 初始化离线RAG系统...")
     try:
         # 使用简化的模型名称，系统会自动切换到TF-IDF模式
@@ -54,6 +65,8 @@ async def startup_event():
             bi_encoder_model="local_model",  # 这会触发离线模式
             cross_encoder_model="local_model"  # 这会触发离线模式
         )
+        # 模型在后台预热，不阻塞服务启动
+        rag_system.warm_up(background=True)
         print("✅ 离线RAG系统初始化完成")
     except Exception as e:
         print(f"❌ RAG系统初始化失败: {e}")
@@ -84,7 +97,8 @@ async def query(request: QueryRequest):
         
         print(f"🔍 处理查询: {request.question}")
         
-        result = rag_system.query(
+        result = await inference_executor.run(
+            rag_system.query,
             question=request.question,
             top_k_retrieve=request.top_k_retrieve,
             top_k_final=request.top_k_final
@@ -114,9 +128,13 @@ async def build_knowledge_base(request: BuildRequest):
         if not os.path.exists(request.plan_txt):
             return {"error": f"培养方案文件不存在: {request.plan_txt}"}
         
-        rag_system.build_knowledge_base(
-            student_csv=request.student_csv,
-            plan_txt=request.plan_txt
+        await asyncio.get_running_loop().run_in_executor(
+            build_executor,
+            functools.partial(
+                rag_system.build_knowledge_base,
+                student_csv=request.student_csv,
+                plan_txt=request.plan_txt
+            )
         )
         
         return {"message": "知识库构建成功", "mode": "offline"}
@@ -149,13 +167,27 @@ async def test_query():
         if not rag_system:
             return {"error": "RAG系统未初始化"}
         
-        result = rag_system.query(question=test_question)
+        result = await inference_executor.run(rag_system.query, question=test_question)
         result["mode"] = "offline"
         return result
         
     except Exception as e:
         return {"error": f"测试失败: {str(e)}"}
 
+@app.get("/api/runtime_metrics")
+async def runtime_metrics():
+    """推理线程池和事件循环延迟指标"""
+    return {
+        "inference_executor": inference_executor.get_stats(),
+        "event_loop_lag_ms": loop_lag_monitor.get_stats()
+    }
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    loop_lag_monitor.stop()
+    inference_executor.shutdown()
+    build_executor.shutdown(wait=False)
+
 if __name__ == "__main__":
     print("🚀 启动离线RAG API服务器...")
     print("📡 服务器地址: http://localhost:8000")
@@ -5,9 +5,18 @@
 """
 
 import os
+import sys
 import json
 import re
 
+from rag_system.build_manifest import BuildManifest
+
+# 构建清单中的阶段名；文本提取或输出格式变化时递增版本号，使旧记录失效
+MANIFEST_STAGE = "cultivation_plans_txt"
+STAGE_PARAMS = {"format_version": 1}
+COMBINED_PATH = os.path.join("data", "all_cultivation_plans.txt")
+CONFIG_PATH = os.path.join("data", "cultivation_plans_config.json")
+
 def extract_profession_name(text):
     """从文本中提取专业名称"""
     # 匹配专业名称的模式
@@ -24,53 +33,92 @@ def extract_profession_name(text):
     
     return "未知专业"
 
+def summarize_plan(pages, file_name):
+    """
+    把PDF逐页文本整理为培养方案数据
+    
+    Args:
+        pages: 逐页文本列表（pdf2json的输出）
+        file_name: 来源文件名
+    """
+    # 合并所有文本段落
+    full_text = '\n'.join(pages)
+    
+    # 提取专业名称
+    profession_name = extract_profession_name(full_text)
+    
+    # 统计信息
+    char_count = len(full_text)
+    line_count = len(full_text.split('\n'))
+    
+    # 关键词统计
+    keywords = ['学分', '课程', '实践', '就业', '毕业', '专业', '培养', '设计', '工程']
+    keyword_counts = {}
+    for keyword in keywords:
+        count = full_text.count(keyword)
+        if count > 0:
+            keyword_counts[keyword] = count
+    
+    return {
+        'file_name': file_name,
+        'profession_name': profession_name,
+        'char_count': char_count,
+        'line_count': line_count,
+        'keyword_counts': keyword_counts,
+        'content': full_text
+    }
+
+def combine_plans(processed_plans):
+    """生成合并的培养方案文本（all_cultivation_plans.txt的内容）"""
+    total_chars = sum(p['char_count'] for p in processed_plans)
+    total_lines = sum(p['line_count'] for p in processed_plans)
+    parts = [
+        "# 所有专业培养方案汇总\n\n",
+        f"共包含 {len(processed_plans)} 个专业的培养方案\n",
+        f"总字符数: {total_chars:,}\n",
+        f"总行数: {total_lines:,}\n\n",
+        "=" * 50 + "\n\n"
+    ]
+    for plan in processed_plans:
+        parts.append(f"## {plan['profession_name']}专业培养方案\n\n")
+        parts.append(plan['content'])
+        parts.append("\n\n" + "=" * 50 + "\n\n")
+    return "".join(parts)
+
 def process_cultivation_plan_file(file_path):
     """处理单个培养方案文件"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        # 合并所有文本段落
-        full_text = '\n'.join(data)
-        
-        # 提取专业名称
-        profession_name = extract_profession_name(full_text)
-        
-        # 统计信息
-        char_count = len(full_text)
-        line_count = len(full_text.split('\n'))
-        
-        # 关键词统计
-        keywords = ['学分', '课程', '实践', '就业', '毕业', '专业', '培养', '设计', '工程']
-        keyword_counts = {}
-        for keyword in keywords:
-            count = full_text.count(keyword)
-            if count > 0:
-                keyword_counts[keyword] = count
-        
-        return {
-            'file_name': os.path.basename(file_path),
-            'profession_name': profession_name,
-            'char_count': char_count,
-            'line_count': line_count,
-            'keyword_counts': keyword_counts,
-            'content': full_text
-        }
+        return summarize_plan(data, os.path.basename(file_path))
         
     except Exception as e:
         print(f"❌ 处理文件 {file_path} 失败: {e}")
         return None
 
+def plan_txt_path(profession_name, output_dir="data"):
+    """培养方案txt文件路径"""
+    # 清理文件名
+    safe_name = re.sub(r'[^\w\s-]', '', profession_name)
+    safe_name = re.sub(r'[-\s]+', '_', safe_name)
+    return os.path.join(output_dir, f"{safe_name}_培养方案.txt")
+
+def load_plan_from_txt(summary):
+    """从已生成的txt文件恢复未变化的培养方案内容"""
+    with open(summary['txt_path'], 'r', encoding='utf-8') as f:
+        text = f.read()
+    header = f"# {summary['profession_name']}专业培养方案\n\n"
+    plan_data = dict(summary)
+    plan_data['content'] = text[len(header):] if text.startswith(header) else text
+    return plan_data
+
 def save_cultivation_plan_to_txt(plan_data, output_dir="data"):
     """将培养方案保存为txt文件"""
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    # 清理文件名
-    safe_name = re.sub(r'[^\w\s-]', '', plan_data['profession_name'])
-    safe_name = re.sub(r'[-\s]+', '_', safe_name)
-    
-    file_path = os.path.join(output_dir, f"{safe_name}_培养方案.txt")
+    file_path = plan_txt_path(plan_data['profession_name'], output_dir)
     
     try:
         with open(file_path, 'w', encoding='utf-8') as f:
@@ -82,8 +130,13 @@ def save_cultivation_plan_to_txt(plan_data, output_dir="data"):
         print(f"❌ 保存文件失败: {e}")
         return None
 
-def main():
-    """主函数"""
+def main(force=False):
+    """
+    主函数
+    
+    Args:
+        force: 忽略构建清单，重新处理所有文件
+    """
     print("=" * 60)
     print("📚 处理所有培养方案文件")
     print("=" * 60)
@@ -94,14 +147,36 @@ def main():
         print(f"❌ 培养方案目录不存在: {plan_dir}")
         return
     
-    # 获取所有JSON文件
-    json_files = [f for f in os.listdir(plan_dir) if f.endswith('.json')]
+    # 获取所有JSON文件（排序保证合并文件的顺序稳定）
+    json_files = sorted(f for f in os.listdir(plan_dir) if f.endswith('.json'))
+    json_paths = [os.path.join(plan_dir, f) for f in json_files]
     print(f"📁 找到 {len(json_files)} 个培养方案文件")
     
-    # 处理每个文件
+    # 构建清单：输入JSON、输出txt都没有变化时整个阶段跳过
+    manifest = BuildManifest()
+    cached_files = manifest.get_extra(MANIFEST_STAGE).get("files", {})
+    previous_outputs = [COMBINED_PATH, CONFIG_PATH] + [
+        summary['txt_path'] for summary in cached_files.values()
+    ]
+    if not force and manifest.is_up_to_date(MANIFEST_STAGE, json_paths, STAGE_PARAMS, previous_outputs):
+        print("⏭️ 培养方案文件均未变化，跳过处理")
+        return
+    
+    changed = set(json_paths if force else manifest.changed_inputs(MANIFEST_STAGE, json_paths, STAGE_PARAMS))
+    
+    # 只解析变化的文件，未变化的文件从上次生成的txt恢复内容
     processed_plans = []
-    for file_name in json_files:
-        file_path = os.path.join(plan_dir, file_name)
+    file_summaries = {}
+    for file_name, file_path in zip(json_files, json_paths):
+        key = os.path.normpath(file_path)
+        summary = cached_files.get(key)
+        if file_path not in changed and summary and os.path.exists(summary['txt_path']):
+            plan_data = load_plan_from_txt(summary)
+            processed_plans.append(plan_data)
+            file_summaries[key] = summary
+            print(f"\n⏭️ 未变化: {file_name}（{plan_data['profession_name']}）")
+            continue
+        
         print(f"\n🔍 处理文件: {file_name}")
         
         plan_data = process_cultivation_plan_file(file_path)
@@ -115,6 +190,10 @@ def main():
             txt_path = save_cultivation_plan_to_txt(plan_data)
             if txt_path:
                 print(f"   💾 已保存: {txt_path}")
+                file_summaries[key] = {
+                    field: value for field, value in plan_data.items() if field != 'content'
+                }
+                file_summaries[key]['txt_path'] = txt_path
     
     # 生成汇总报告
     print("\n" + "=" * 60)
@@ -144,19 +223,10 @@ def main():
     
     # 生成合并的培养方案文件
     print(f"\n📝 生成合并的培养方案文件...")
-    combined_path = os.path.join("data", "all_cultivation_plans.txt")
+    combined_path = COMBINED_PATH
     try:
         with open(combined_path, 'w', encoding='utf-8') as f:
-            f.write("# 所有专业培养方案汇总\n\n")
-            f.write(f"共包含 {len(processed_plans)} 个专业的培养方案\n")
-            f.write(f"总字符数: {total_chars:,}\n")
-            f.write(f"总行数: {total_lines:,}\n\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for plan in processed_plans:
-                f.write(f"## {plan['profession_name']}专业培养方案\n\n")
-                f.write(plan['content'])
-                f.write("\n\n" + "=" * 50 + "\n\n")
+            f.write(combine_plans(processed_plans))
         
         print(f"   ✅ 合并文件已保存: {combined_path}")
         
@@ -169,7 +239,7 @@ def main():
         "cultivation_plans": [
             {
                 "name": plan['profession_name'],
-                "file": f"{re.sub(r'[^\w\s-]', '', plan['profession_name']).replace(' ', '_')}_培养方案.txt",
+                "file": os.path.basename(plan_txt_path(plan['profession_name'])),
                 "char_count": plan['char_count'],
                 "line_count": plan['line_count']
             }
@@ -180,7 +250,7 @@ def main():
         "total_lines": total_lines
     }
     
-    config_path = os.path.join("data", "cultivation_plans_config.json")
+    config_path = CONFIG_PATH
     try:
         with open(config_path, 'w', encoding='utf-8') as f:
             json.dump(config_data, f, ensure_ascii=False, indent=2)
@@ -189,9 +259,18 @@ def main():
     except Exception as e:
         print(f"   ❌ 生成配置文件失败: {e}")
     
+    # 记录构建清单（有文件处理失败时不记录，下次重试）
+    if len(file_summaries) == len(json_paths):
+        manifest.record(
+            MANIFEST_STAGE, json_paths, STAGE_PARAMS,
+            outputs=[COMBINED_PATH, CONFIG_PATH] + [s['txt_path'] for s in file_summaries.values()],
+            extra={"files": file_summaries}
+        )
+        manifest.save()
+    
     print("\n" + "=" * 60)
     print("✅ 所有培养方案处理完成")
     print("=" * 60)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main(force="--force" in sys.argv) 
\ No newline at end of file
@@ -5,17 +5,25 @@ RAG API服务器 - 连接前端和RAGflow的中间层
 前端 → 本API → RAGflow → 本API → 前端
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import httpx
 import asyncio
 import json
 import os
+import time
 import logging
 from datetime import datetime
 
+from rag_system.batching import Histogram
+from rag_system.response_cache import ResponseCache, SingleFlight, normalize_question
+from rag_system.upstream_client import PooledHttpClient
+from rag_system.upstream_balancer import NoUpstreamAvailable, Upstream, UpstreamBalancer
+from rag_system.upstream_health import CLOSED, CircuitBreaker, HealthPoller
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,9 +46,31 @@ app.add_middleware(
 # RAGflow配置
 RAGFLOW_CONFIG = {
     "base_url": os.getenv("RAGFLOW_API_URL", "http://localhost:9380"),
+    # 多个RAGflow实例，逗号分隔；未设置时只使用RAGFLOW_API_URL
+    "base_urls": [url.strip() for url in os.getenv("RAGFLOW_API_URLS", "").split(",") if url.strip()],
+    # 负载均衡策略：least_outstanding（在途请求最少）或 ewma（延迟EWMA × 在途请求）
+    "lb_strategy": os.getenv("RAGFLOW_LB_STRATEGY", "least_outstanding"),
+    # 对冲请求：超过近期成功延迟的该百分位数仍未返回时，向另一个实例发送相同请求
+    "hedge": os.getenv("RAGFLOW_HEDGE", "0") == "1",
+    "hedge_percentile": float(os.getenv("RAGFLOW_HEDGE_PERCENTILE", "95")),
+    "hedge_min_delay_ms": float(os.getenv("RAGFLOW_HEDGE_MIN_DELAY_MS", "100")),
     "token": os.getenv("RAGFLOW_TOKEN", ""),
-    "timeout": 30.0
+    "timeout": 30.0,
+    # 相同的并发请求合并为一次上游调用
+    "coalesce": os.getenv("RAGFLOW_COALESCE", "1") == "1",
+    # 低温度（确定性）响应缓存，TTL为0时关闭
+    "cache_ttl": float(os.getenv("RAGFLOW_CACHE_TTL", "300")),
+    "cache_max_entries": int(os.getenv("RAGFLOW_CACHE_MAX_ENTRIES", "1000")),
+    "cache_max_temperature": float(os.getenv("RAGFLOW_CACHE_MAX_TEMPERATURE", "0.1")),
+    # 后台健康检查间隔和超时（秒）
+    "health_interval": float(os.getenv("RAGFLOW_HEALTH_INTERVAL", "10")),
+    "health_timeout": float(os.getenv("RAGFLOW_HEALTH_TIMEOUT", "3")),
+    # 连续失败多少次熔断，熔断多久后开始探测（秒）
+    "breaker_failures": int(os.getenv("RAGFLOW_BREAKER_FAILURES", "5")),
+    "breaker_recovery": float(os.getenv("RAGFLOW_BREAKER_RECOVERY", "30"))
 }
+RAGFLOW_CONFIG["base_urls"] = RAGFLOW_CONFIG["base_urls"] or [RAGFLOW_CONFIG["base_url"]]
+RAGFLOW_CONFIG["base_url"] = RAGFLOW_CONFIG["base_urls"][0]
 
 # 请求模型
 class QueryRequest(BaseModel):
@@ -61,6 +91,47 @@ class QueryResponse(BaseModel):
     reference: List[Dict[str, Any]]
     processing_time: float
     source: str = "ragflow"
+    cached: bool = False
+
+def sse_event(event: str, data: Any) -> str:
+    """编码一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def parse_sse_data(line: str) -> Optional[dict]:
+    """解析上游SSE的data行，非data行、结束标记和无法解析的内容返回None"""
+    line = line.strip()
+    if not line.startswith("data:"):
+        return None
+    raw = line[5:].strip()
+    if not raw or raw == "[DONE]":
+        return None
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+def extract_stream_chunk(payload: dict, answer: str):
+    """
+    从上游的一个流式块中取出增量文本
+    
+    RAGflow每个块携带截至当前的完整回答（data.answer），OpenAI兼容接口携带增量
+    （choices[0].delta.content），两种格式都转换为增量。
+    
+    Returns:
+        (块中的数据字典或None, 增量文本, 截至当前的完整回答)
+    """
+    data = payload.get("data", payload)
+    if isinstance(data, dict) and "answer" in data:
+        full = data.get("answer") or ""
+        if full.startswith(answer):
+            return data, full[len(answer):], full
+        return data, full, answer + full
+    choices = payload.get("choices")
+    if isinstance(choices, list) and choices:
+        delta = (choices[0].get("delta") or {}).get("content") or ""
+        return None, delta, answer + delta
+    return None, "", answer
 
 # RAGflow客户端类
 class RAGflowClient:
@@ -75,64 +146,254 @@ class RAGflowClient:
         }
         if self.token:
             self.headers["Authorization"] = f"Bearer {self.token}"
+        
+        # 每个RAGflow实例一个应用级共享的连接池和熔断器，连接在请求之间复用（RAGFLOW_MAX_CONNECTIONS、
+        # RAGFLOW_KEEPALIVE_EXPIRY、RAGFLOW_CONNECT_TIMEOUT、RAGFLOW_POOL_TIMEOUT等可配置）；
+        # 某个实例不可用时查询立即转向其他实例，全部不可用时立即失败，而不是每个请求都等满超时
+        upstreams = []
+        for base_url in RAGFLOW_CONFIG["base_urls"]:
+            upstream = Upstream(
+                PooledHttpClient.from_env("RAGFLOW", base_url, self.headers, read_timeout=self.timeout),
+                CircuitBreaker(RAGFLOW_CONFIG["breaker_failures"], RAGFLOW_CONFIG["breaker_recovery"])
+            )
+            upstream.health = HealthPoller(lambda upstream=upstream: self.fetch_health(upstream),
+                                           RAGFLOW_CONFIG["health_interval"], upstream.breaker)
+            upstreams.append(upstream)
+        self.balancer = UpstreamBalancer(
+            upstreams,
+            strategy=RAGFLOW_CONFIG["lb_strategy"],
+            hedge=RAGFLOW_CONFIG["hedge"],
+            hedge_percentile=RAGFLOW_CONFIG["hedge_percentile"],
+            hedge_min_delay_ms=RAGFLOW_CONFIG["hedge_min_delay_ms"]
+        )
+        
+        # 流式查询的首字延迟（收到请求到发出第一段回答）和完整耗时
+        self.ttft_ms = Histogram([50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000])
+        self.stream_total_ms = Histogram([100, 500, 1000, 2000, 5000, 10000, 30000, 60000])
+        
+        self.single_flight = SingleFlight() if RAGFLOW_CONFIG["coalesce"] else None
+        self.cache = (ResponseCache(RAGFLOW_CONFIG["cache_max_entries"], RAGFLOW_CONFIG["cache_ttl"])
+                      if RAGFLOW_CONFIG["cache_ttl"] > 0 else None)
+        self.cache_max_temperature = RAGFLOW_CONFIG["cache_max_temperature"]
     
-    async def health_check(self):
-        """检查RAGflow服务健康状态"""
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/health",
-                    headers=self.headers
-                )
-                response.raise_for_status()
-                return response.json()
-        except Exception as e:
-            logger.error(f"RAGflow健康检查失败: {e}")
-            raise HTTPException(status_code=503, detail=f"RAGflow服务不可用: {str(e)}")
+    async def start(self):
+        """应用启动时创建共享连接池并启动后台健康检查"""
+        self.balancer.start()
+        for upstream in self.balancer.upstreams:
+            upstream.health.start()
+    
+    async def close(self):
+        """应用关闭时停止健康检查并释放连接"""
+        for upstream in self.balancer.upstreams:
+            await upstream.health.stop()
+        await self.balancer.close()
+    
+    async def fetch_health(self, upstream: Upstream):
+        """请求一个RAGflow实例的健康接口，失败时抛出异常"""
+        response = await upstream.http.request("GET", "/api/v1/health", timeout=RAGFLOW_CONFIG["health_timeout"])
+        response.raise_for_status()
+        return response.json()
+    
+    def get_health(self) -> dict:
+        """各RAGflow实例缓存的健康状态和熔断状态"""
+        return {
+            upstream.base_url: {
+                "health": upstream.health.get_state(),
+                "circuit_breaker": upstream.breaker.get_stats()
+            }
+            for upstream in self.balancer.upstreams
+        }
+    
+    def build_ragflow_request(self, request: QueryRequest) -> dict:
+        """构建RAGflow请求数据"""
+        return {
+            "question": request.question,
+            "conversation_id": request.conversation_id or self.generate_conversation_id(),
+            "quote": request.quote,
+            "stream": request.stream,
+            "temperature": request.temperature,
+            "top_p": request.top_p,
+            "max_tokens": request.max_tokens
+        }
+    
+    def request_key(self, request: QueryRequest) -> tuple:
+        """请求键：归一化的问题和生成参数；带对话ID的请求依赖对话历史，对话ID也计入键"""
+        return (normalize_question(request.question), request.temperature, request.top_p,
+                request.max_tokens, request.quote, request.conversation_id)
+    
+    def is_cacheable(self, request: QueryRequest) -> bool:
+        """只缓存不依赖对话历史的确定性（低温度）请求"""
+        return (self.cache is not None and not request.conversation_id
+                and (request.temperature or 0.0) <= self.cache_max_temperature)
+    
+    async def cached_query(self, request: QueryRequest) -> QueryResponse:
+        """
+        非流式查询入口：先查响应缓存，再合并相同的并发请求，最后才调用RAGflow
+        
+        合并的请求共享同一个上游回答，返回的是副本。未指定对话ID时，上游新建的对话只属于
+        发起调用的请求：合并等待者和缓存命中各自得到一个新的对话ID，不会继续他人的对话。
+        """
+        start_time = time.perf_counter()
+        key = self.request_key(request)
+        cacheable = self.is_cacheable(request)
+        if cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"响应缓存命中: {request.question}")
+                return cached.copy(deep=True, update={
+                    "cached": True,
+                    "processing_time": time.perf_counter() - start_time,
+                    "conversation_id": self.generate_conversation_id()
+                })
+        
+        async def call():
+            response = await self.query(request)
+            if cacheable:
+                self.cache.put(key, response)
+            return response
+        
+        if self.single_flight is None:
+            return await call()
+        response, shared = await self.single_flight.run(key, call)
+        if shared and not request.conversation_id:
+            return response.copy(deep=True, update={"conversation_id": self.generate_conversation_id()})
+        return response.copy(deep=True)
+    
+    def purge_cache(self, question: Optional[str] = None) -> int:
+        """清除响应缓存，指定问题时只清除该问题（任意生成参数）的条目"""
+        if self.cache is None:
+            return 0
+        if question is None:
+            return self.cache.purge()
+        normalized = normalize_question(question)
+        return self.cache.purge(lambda key: key[0] == normalized)
+    
+    def get_cache_stats(self) -> dict:
+        """响应缓存和请求合并的统计"""
+        return {
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+            "cache_max_temperature": self.cache_max_temperature,
+            "coalescing": self.single_flight.get_stats() if self.single_flight is not None else None
+        }
+    
+    def circuit_open_error(self, error: NoUpstreamAvailable) -> HTTPException:
+        """所有实例熔断期间返回的503，Retry-After为距离下一次探测的秒数"""
+        return HTTPException(
+            status_code=503,
+            detail=f"RAGflow服务暂不可用（已熔断）: {error}",
+            headers={"Retry-After": str(max(1, int(error.retry_after + 0.999)))}
+        )
     
     async def query(self, request: QueryRequest):
-        """向RAGflow发送查询请求"""
+        """向RAGflow发送查询请求（熔断、负载均衡和对冲由balancer处理）"""
         try:
             start_time = datetime.now()
             
             # 构建RAGflow请求数据
-            ragflow_request = {
-                "question": request.question,
-                "conversation_id": request.conversation_id or self.generate_conversation_id(),
-                "quote": request.quote,
-                "stream": request.stream,
-                "temperature": request.temperature,
-                "top_p": request.top_p,
-                "max_tokens": request.max_tokens
-            }
+            ragflow_request = self.build_ragflow_request(request)
             
             logger.info(f"发送请求到RAGflow: {ragflow_request}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/completion",
-                    headers=self.headers,
-                    json=ragflow_request
-                )
-                response.raise_for_status()
-                ragflow_response = response.json()
+            # 带对话ID的请求会写入对话历史，不对冲，避免同一轮对话被两个实例各执行一次
+            response, upstream = await self.balancer.request(
+                "POST", "/api/v1/completion", hedge=not request.conversation_id, json=ragflow_request
+            )
+            response.raise_for_status()
+            ragflow_response = response.json()
             
             processing_time = (datetime.now() - start_time).total_seconds()
-            logger.info(f"RAGflow响应成功，耗时: {processing_time:.2f}秒")
+            logger.info(f"RAGflow响应成功（{upstream.base_url}），耗时: {processing_time:.2f}秒")
             
             # 格式化响应
             return self.format_response(ragflow_response, request.question, processing_time)
             
+        except NoUpstreamAvailable as e:
+            raise self.circuit_open_error(e)
         except httpx.HTTPStatusError as e:
             logger.error(f"RAGflow API错误: {e.response.status_code} - {e.response.text}")
             raise HTTPException(
                 status_code=e.response.status_code,
                 detail=f"RAGflow API错误: {e.response.text}"
             )
+        except httpx.PoolTimeout as e:
+            logger.error(f"等待RAGflow连接超时: {e}")
+            raise HTTPException(status_code=503, detail="RAGflow连接池已满，请稍后重试")
+        except httpx.TimeoutException as e:
+            logger.error(f"RAGflow请求超时: {type(e).__name__}")
+            raise HTTPException(status_code=504, detail=f"RAGflow请求超时: {type(e).__name__}")
         except Exception as e:
             logger.error(f"查询RAGflow失败: {e}")
             raise HTTPException(status_code=500, detail=f"查询失败: {str(e)}")
     
+    async def query_stream(self, request: QueryRequest):
+        """
+        流式查询：RAGflow的增量输出一到达就以SSE转发
+        
+        事件依次为：若干message（delta为新增文本，answer为截至当前的完整回答）、
+        一个reference（与非流式响应相同的字段，另含ttft首字延迟）和done；
+        出错时发送error事件。响应头已经发出，错误无法再通过状态码返回。
+        """
+        start_time = time.perf_counter()
+        ragflow_request = self.build_ragflow_request(request)
+        logger.info(f"发送流式请求到RAGflow: {ragflow_request}")
+        
+        answer = ""
+        last_data = {}
+        ttft = None
+        try:
+            async with self.balancer.stream("POST", "/api/v1/completion", json=ragflow_request) as (response, upstream):
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    logger.error(f"RAGflow API错误（{upstream.base_url}）: {response.status_code} - {body}")
+                    yield sse_event("error", {"status_code": response.status_code,
+                                              "detail": f"RAGflow API错误: {body}"})
+                    return
+                
+                if "text/event-stream" in response.headers.get("content-type", ""):
+                    lines = response.aiter_lines()
+                else:
+                    # 上游没有按流式返回时，把完整响应当作一个块
+                    lines = iter_single(f"data: {(await response.aread()).decode('utf-8')}")
+                
+                async for line in lines:
+                    payload = parse_sse_data(line)
+                    if payload is None:
+                        continue
+                    data, delta, answer = extract_stream_chunk(payload, answer)
+                    if data:
+                        last_data = data
+                    if delta:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start_time
+                            self.ttft_ms.observe(ttft * 1000.0)
+                            logger.info(f"RAGflow首字延迟: {ttft:.2f}秒")
+                        yield sse_event("message", {"delta": delta, "answer": answer})
+        except NoUpstreamAvailable as e:
+            error = self.circuit_open_error(e)
+            yield sse_event("error", {"status_code": error.status_code, "detail": error.detail})
+            return
+        except Exception as e:
+            logger.error(f"流式查询RAGflow失败: {e}")
+            yield sse_event("error", {"detail": f"查询失败: {type(e).__name__}: {e}"})
+            return
+        
+        processing_time = time.perf_counter() - start_time
+        self.stream_total_ms.observe(processing_time * 1000.0)
+        logger.info(f"RAGflow流式响应完成，耗时: {processing_time:.2f}秒")
+        
+        # RAGflow流式块中的reference为 {"chunks": [...]}，展开后复用非流式的格式化逻辑
+        final = dict(last_data, answer=answer)
+        if isinstance(final.get("reference"), dict):
+            final["chunks"] = final.pop("reference").get("chunks", [])
+        result = self.format_response(final, request.question, processing_time).dict()
+        result["ttft"] = ttft
+        yield sse_event("reference", result)
+        yield sse_event("done", {})
+    
+    def get_stream_stats(self) -> dict:
+        """流式查询的首字延迟和完整耗时分布"""
+        return {"ttft_ms": self.ttft_ms.to_dict(), "total_ms": self.stream_total_ms.to_dict()}
+    
     def format_response(self, ragflow_response: dict, original_question: str, processing_time: float) -> QueryResponse:
         """格式化RAGflow响应为标准格式"""
         try:
@@ -195,9 +456,20 @@ class RAGflowClient:
         import uuid
         return f"conv_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8]}"
 
+async def iter_single(item):
+    yield item
+
 # 创建RAGflow客户端实例
 ragflow_client = RAGflowClient()
 
+@app.on_event("startup")
+async def startup_event():
+    await ragflow_client.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await ragflow_client.close()
+
 # API路由
 @app.get("/")
 async def root():
@@ -206,31 +478,35 @@ async def root():
         "message": "RAG API服务器运行中",
         "version": "1.0.0",
         "ragflow_url": RAGFLOW_CONFIG["base_url"],
+        "ragflow_urls": RAGFLOW_CONFIG["base_urls"],
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/api/health")
 async def health_check():
-    """健康检查"""
-    try:
-        # 检查RAGflow连接
-        ragflow_health = await ragflow_client.health_check()
-        
+    """健康检查：返回后台健康检查缓存的各RAGflow实例状态，不会向RAGflow发请求"""
+    upstreams = ragflow_client.get_health()
+    # 启动后首次轮询完成前状态为unknown，熔断器未打开时视为可用，避免服务刚启动就报告降级
+    available = [url for url, state in upstreams.items()
+                 if state["health"]["status"] in ("healthy", "unknown") and state["circuit_breaker"]["state"] == CLOSED]
+    if len(available) == len(upstreams):
         return {
             "status": "healthy",
             "message": "RAG API服务正常运行",
             "ragflow_status": "connected",
-            "ragflow_health": ragflow_health,
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "degraded",
-            "message": "RAG API服务运行中，但RAGflow连接异常",
-            "ragflow_status": "disconnected",
-            "error": str(e),
+            "upstreams": upstreams,
             "timestamp": datetime.now().isoformat()
         }
+    return {
+        "status": "degraded",
+        "message": (f"RAG API服务运行中，{len(upstreams) - len(available)}/{len(upstreams)} 个RAGflow实例连接异常"
+                    if available else "RAG API服务运行中，但RAGflow连接异常"),
+        "ragflow_status": "partial" if available else "disconnected",
+        "error": "; ".join(f"{url}: {state['health']['error'] or state['circuit_breaker']['last_error']}"
+                           for url, state in upstreams.items() if url not in available),
+        "upstreams": upstreams,
+        "timestamp": datetime.now().isoformat()
+    }
 
 @app.post("/api/query", response_model=QueryResponse)
 async def query_rag(request: QueryRequest):
@@ -245,8 +521,16 @@ async def query_rag(request: QueryRequest):
         if not request.question or not request.question.strip():
             raise HTTPException(status_code=400, detail="问题不能为空")
         
-        # 调用RAGflow
-        response = await ragflow_client.query(request)
+        # 流式请求：边接收边转发，回答的第一段不必等完整响应
+        if request.stream:
+            return StreamingResponse(
+                ragflow_client.query_stream(request),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        # 调用RAGflow（经过响应缓存和并发请求合并）
+        response = await ragflow_client.cached_query(request)
         
         logger.info(f"查询完成，返回 {len(response.relevant_docs)} 个相关文档")
         return response
@@ -257,6 +541,33 @@ async def query_rag(request: QueryRequest):
         logger.error(f"查询处理失败: {e}")
         raise HTTPException(status_code=500, detail=f"查询处理失败: {str(e)}")
 
+@app.get("/api/upstream_metrics")
+async def upstream_metrics():
+    """各RAGflow实例的在途请求、延迟分位数、错误、熔断和连接池统计，以及对冲请求统计"""
+    return {
+        "ragflow": ragflow_client.balancer.get_stats(),
+        "streaming": ragflow_client.get_stream_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/response_cache")
+async def response_cache_stats():
+    """响应缓存命中率和请求合并统计"""
+    return {
+        **ragflow_client.get_cache_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.delete("/api/response_cache")
+async def purge_response_cache(question: Optional[str] = Query(None, description="只清除该问题的缓存")):
+    """清除响应缓存（如知识库更新后）"""
+    purged = ragflow_client.purge_cache(question)
+    return {
+        "message": f"已清除 {purged} 条缓存响应",
+        "purged": purged,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/api/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """获取对话历史（如果RAGflow支持）"""
@@ -293,7 +604,7 @@ if __name__ == "__main__":
     
     print(f"🚀 启动RAG API服务器...")
     print(f"📍 服务地址: http://{host}:{port}")
-    print(f"🔗 RAGflow地址: {RAGFLOW_CONFIG['base_url']}")
+    print(f"🔗 RAGflow地址: {', '.join(RAGFLOW_CONFIG['base_urls'])}")
     print(f"📚 API文档: http://{host}:{port}/docs")
     
     uvicorn.run(
@@ -1,4 +1,10 @@
 # RAG系统包初始化文件
-from .rag_system import RAGSystem
+# RAGSystem延迟导入：只使用子模块（如embedding_cache）的脚本不需要加载整个RAG系统
 
-__all__ = ['RAGSystem'] 
\ No newline at end of file
+__all__ = ['RAGSystem']
+
+def __getattr__(name):
+    if name == 'RAGSystem':
+        from .rag_system import RAGSystem
+        return RAGSystem
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
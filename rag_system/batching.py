@@ -0,0 +1,177 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class Histogram:
+    """简单的分桶直方图，用于统计批大小和排队等待时间"""
+
+    def __init__(self, bounds: Sequence[float]):
+        """
+        Args:
+            bounds: 各桶的上界（升序），超出最大上界的值计入溢出桶
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """记录一个观测值"""
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict:
+        """导出为字典"""
+        buckets = {f"<={bound:g}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets[f">{self.bounds[-1]:g}"] = self.counts[-1]
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else 0.0,
+            "max": self.max,
+            "buckets": buckets
+        }
+
+
+class MicroBatcher:
+    """
+    进程内动态微批调度器
+
+    并发调用方提交的单条请求会在后台线程中聚合，等待最多max_wait_ms毫秒
+    或凑满max_batch_size条后，作为一个批次交给batch_fn执行，
+    结果再按顺序分发回各自的调用方。
+    """
+
+    def __init__(self,
+                 batch_fn: Callable[[List[Any]], Sequence[Any]],
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 name: str = "micro-batcher"):
+        """
+        初始化微批调度器
+
+        Args:
+            batch_fn: 批处理函数，输入条目列表，返回与之对齐的结果序列
+            max_batch_size: 单批最大条目数
+            max_wait_ms: 批次收集的最长等待时间（毫秒）
+            name: 调度器名称，用于线程名和统计信息
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100, 500])
+        self._stats_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        # 关闭检查与入队在同一把锁内完成，保证关闭后不会有条目排在结束标记之后
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Any:
+        """提交单个条目并阻塞等待结果"""
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: List[Any]) -> List[Any]:
+        """
+        提交多个条目并阻塞等待全部结果
+
+        Args:
+            items: 条目列表，可能与其他调用方的条目拼在同一批次中
+
+        Returns:
+            与items对齐的结果列表
+        """
+        now = time.perf_counter()
+        futures = []
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} 已关闭")
+            for item in items:
+                future: Future = Future()
+                self._queue.put((item, future, now))
+                futures.append(future)
+        return [future.result() for future in futures]
+
+    def _run(self) -> None:
+        """后台线程：收集批次并执行"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            self._execute(batch)
+            if stop:
+                break
+
+    def _execute(self, batch: List) -> None:
+        """执行一个批次并分发结果"""
+        started = time.perf_counter()
+        with self._stats_lock:
+            self.batch_sizes.observe(len(batch))
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+
+        try:
+            results = list(self.batch_fn([item for item, _, _ in batch]))
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name} 批处理函数返回 {len(results)} 个结果，"
+                                 f"批次有 {len(batch)} 个条目")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """获取批大小和排队等待时间直方图"""
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "pending": self._queue.qsize(),
+                "batch_size": self.batch_sizes.to_dict(),
+                "queue_wait_ms": self.queue_wait_ms.to_dict()
+            }
+
+    def close(self) -> None:
+        """停止后台线程，已入队的条目会先处理完"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
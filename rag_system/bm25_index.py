@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 连续的中日韩字符，或连续的字母/数字（课程代号、学分、公司英文名等）
+_TOKEN_PATTERN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[a-z0-9]+(?:\.[0-9]+)?')
+
+
+def tokenize(text: str, ngram_sizes: Sequence[int] = (1, 2)) -> List[str]:
+    """
+    字符n-gram分词：中文按字符n-gram切分，字母数字串整体作为一个词
+
+    Args:
+        text: 输入文本
+        ngram_sizes: 中文字符n-gram的长度
+
+    Returns:
+        词项列表
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        run = match.group()
+        if not ('㐀' <= run[0] <= '﫿'):
+            tokens.append(run)
+            continue
+        for n in ngram_sizes:
+            if len(run) < n:
+                continue
+            tokens.extend(run[i:i + n] for i in range(len(run) - n + 1))
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合（RRF）
+
+    Args:
+        rankings: 多个检索器的结果ID列表（按相关度降序）
+        k: 平滑常数
+
+    Returns:
+        按融合分数降序排列的 (ID, 分数) 列表
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """基于字符n-gram的BM25倒排索引，可持久化为JSON"""
+
+    def __init__(self, ngram_sizes: Sequence[int] = (1, 2), k1: float = 1.5, b: float = 0.75):
+        """
+        初始化BM25索引
+
+        Args:
+            ngram_sizes: 中文字符n-gram的长度
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.k1 = k1
+        self.b = b
+        self.collection_id: Optional[str] = None
+
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.doc_lengths: List[int] = []
+        # 词项 -> [[文档下标, 词频], ...]
+        self.postings: Dict[str, List[List[int]]] = defaultdict(list)
+
+    @property
+    def avg_doc_length(self) -> float:
+        return sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def add_documents(self,
+                      ids: List[str],
+                      documents: List[str],
+                      metadatas: Optional[List[Dict]] = None) -> None:
+        """
+        添加文档到索引
+
+        Args:
+            ids: 文档ID列表（与向量数据库一致）
+            documents: 文档内容列表
+            metadatas: 元数据列表
+        """
+        if metadatas is None:
+            metadatas = [{} for _ in documents]
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            index = len(self.ids)
+            term_counts = Counter(tokenize(document, self.ngram_sizes))
+            for term, count in term_counts.items():
+                self.postings[term].append([index, count])
+            self.ids.append(doc_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+            self.doc_lengths.append(sum(term_counts.values()))
+
+    def search(self, query: str, top_k: int = 20) -> List[Dict]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询文本
+            top_k: 返回结果数量
+
+        Returns:
+            结果列表，每项包含id、document、metadata、score
+        """
+        doc_count = len(self.ids)
+        if doc_count == 0:
+            return []
+        avg_length = self.avg_doc_length or 1.0
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term, query_count in Counter(tokenize(query, self.ngram_sizes)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / avg_length)
+                scores[index] += query_count * idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {
+                "id": self.ids[index],
+                "document": self.documents[index],
+                "metadata": self.metadatas[index],
+                "score": score
+            }
+            for index, score in ranked
+        ]
+
+    def save(self, path: str) -> None:
+        """保存索引到JSON文件"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "ngram_sizes": list(self.ngram_sizes),
+            "k1": self.k1,
+            "b": self.b,
+            "collection_id": self.collection_id,
+            "ids": self.ids,
+            "documents": self.documents,
+            "metadatas": self.metadatas,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        print(f"BM25索引已保存: {path}（{len(self.ids)} 个文档，{len(self.postings)} 个词项）")
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """从JSON文件加载索引"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(data["ngram_sizes"], data["k1"], data["b"])
+        index.collection_id = data.get("collection_id")
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.metadatas = data["metadatas"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = defaultdict(list, data["postings"])
+        return index
+
+
+def bm25_index_path(persist_directory: str, collection_name: str) -> str:
+    """集合对应的BM25索引文件路径"""
+    return os.path.join(persist_directory, "bm25", f"{collection_name}.json")
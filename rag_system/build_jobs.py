@@ -0,0 +1,157 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class BuildCancelled(Exception):
+    """构建任务被取消"""
+
+
+class BuildJob:
+    """一个后台构建任务"""
+
+    def __init__(self, job_id: str, params: Dict):
+        self.id = job_id
+        self.params = params
+        self.status = QUEUED
+        self.progress: Dict = {}
+        self.report: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def update_progress(self, **progress) -> None:
+        """构建函数回报进度（如阶段、已处理文档数）"""
+        with self._lock:
+            self.progress.update(progress)
+
+    def check_cancelled(self) -> None:
+        """构建函数在检查点调用，任务已被取消时抛出BuildCancelled"""
+        if self.cancel_event.is_set():
+            raise BuildCancelled(f"构建任务 {self.id} 已取消")
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "params": self.params,
+                "progress": dict(self.progress),
+                "report": self.report,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": ((self.finished_at or now) - self.started_at) if self.started_at else None,
+                "cancel_requested": self.cancel_event.is_set()
+            }
+
+
+class BuildJobManager:
+    """
+    后台构建任务管理器
+
+    构建任务在独立的单线程池中依次执行，不占用推理线程池，也不阻塞事件循环；
+    提交后立即返回任务ID，通过get查询状态和进度，通过cancel请求取消。
+    只保留最近max_history个已结束的任务。
+    """
+
+    def __init__(self, max_history: int = 50, max_concurrent: int = 1):
+        """
+        Args:
+            max_history: 保留的已结束任务数
+            max_concurrent: 同时执行的构建任务数
+        """
+        self.max_history = max_history
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="rag-build")
+        self._jobs: "OrderedDict[str, BuildJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[BuildJob], Optional[Dict]], params: Optional[Dict] = None) -> BuildJob:
+        """
+        提交构建任务
+
+        Args:
+            fn: 构建函数，接收BuildJob（用于回报进度和检查取消），返回构建报告
+            params: 任务参数（仅用于展示）
+
+        Returns:
+            新建的任务
+        """
+        job = BuildJob(uuid.uuid4().hex[:12], params or {})
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: BuildJob, fn: Callable[[BuildJob], Optional[Dict]]) -> None:
+        with job._lock:
+            if job.cancel_event.is_set():
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            report = fn(job)
+            status, error = SUCCEEDED, None
+        except BuildCancelled as e:
+            report, status, error = None, CANCELLED, str(e)
+        except Exception as e:
+            traceback.print_exc()
+            report, status, error = None, FAILED, str(e)
+        with job._lock:
+            job.report = report
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        print(f"构建任务 {job.id} 结束: {status}")
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[BuildJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[BuildJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[BuildJob]:
+        """
+        请求取消任务：排队中的任务不会开始，运行中的任务在下一个检查点停止
+
+        Returns:
+            对应的任务，不存在时返回None
+        """
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.cancel_event.set()
+        return job
+
+    def shutdown(self) -> None:
+        """取消所有未结束的任务并等待当前任务退出"""
+        for job in self.list():
+            if job.status not in FINISHED_STATES:
+                job.cancel_event.set()
+        self._pool.shutdown(wait=True)
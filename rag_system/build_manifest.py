@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_MANIFEST_PATH = "./vector_db/build_manifest.json"
+
+
+def _params_hash(params: Dict) -> str:
+    return hashlib.sha256(
+        json.dumps(params, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()[:16]
+
+
+class BuildManifest:
+    """
+    知识库构建清单
+
+    为每个构建阶段记录输入文件哈希、参数（分块参数、模型指纹等）和输出文件哈希。
+    输入、参数和输出都与上次一致的阶段可以直接跳过。文件哈希按 (大小, 修改时间)
+    缓存，未改动的文件不会被重新读取，无变化的重建只需若干次stat。
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        """
+        初始化构建清单
+
+        Args:
+            path: 清单JSON文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"stages": {}, "files": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"构建清单损坏，将重新生成: {e}")
+        self.data.setdefault("stages", {})
+        self.data.setdefault("files", {})
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """
+        计算文件内容哈希，文件不存在时返回None
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            SHA-256前16位
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.normpath(path)
+        with self._lock:
+            cached = self.data["files"].get(key)
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime_ns:
+            return cached["hash"]
+
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()[:16]
+        with self._lock:
+            self.data["files"][key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": digest}
+        return digest
+
+    def _hashes(self, paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {os.path.normpath(path): self.file_hash(path) for path in paths}
+
+    def is_up_to_date(self,
+                      stage: str,
+                      inputs: Iterable[str],
+                      params: Optional[Dict] = None,
+                      outputs: Iterable[str] = ()) -> bool:
+        """
+        判断阶段是否可以跳过
+
+        Args:
+            stage: 阶段名称
+            inputs: 输入文件路径
+            params: 影响输出的参数
+            outputs: 输出文件路径（被删除或改动时需要重建）
+
+        Returns:
+            输入、参数、输出均与上次记录一致时返回True
+        """
+        record = self.data["stages"].get(stage)
+        if record is None:
+            return False
+        if record["params"] != _params_hash(params or {}):
+            return False
+        if record["inputs"] != self._hashes(inputs):
+            return False
+        output_hashes = self._hashes(outputs)
+        if any(digest is None for digest in output_hashes.values()):
+            return False
+        return record["outputs"] == output_hashes
+
+    def changed_inputs(self, stage: str, inputs: Iterable[str], params: Optional[Dict] = None) -> List[str]:
+        """
+        找出与上次记录相比内容变化（或新增）的输入文件；参数变化时全部视为变化
+
+        Args:
+            stage: 阶段名称
+            inputs: 输入文件路径
+            params: 影响输出的参数
+
+        Returns:
+            需要重新处理的输入文件路径
+        """
+        inputs = list(inputs)
+        record = self.data["stages"].get(stage)
+        if record is None or record["params"] != _params_hash(params or {}):
+            return inputs
+        return [path for path in inputs
+                if record["inputs"].get(os.path.normpath(path)) != self.file_hash(path)]
+
+    def get_extra(self, stage: str) -> Dict:
+        """获取阶段记录的附加信息"""
+        record = self.data["stages"].get(stage) or {}
+        return record.get("extra", {})
+
+    def record(self,
+               stage: str,
+               inputs: Iterable[str],
+               params: Optional[Dict] = None,
+               outputs: Iterable[str] = (),
+               extra: Optional[Dict] = None) -> None:
+        """
+        记录阶段成功完成时的输入、参数和输出
+
+        Args:
+            stage: 阶段名称
+            inputs: 输入文件路径
+            params: 影响输出的参数
+            outputs: 输出文件路径
+            extra: 附加信息（如每个输入文件的处理结果）
+        """
+        self.data["stages"][stage] = {
+            "inputs": self._hashes(inputs),
+            "params": _params_hash(params or {}),
+            "outputs": self._hashes(outputs),
+            "extra": extra or {},
+            "updated_at": time.time()
+        }
+
+    def invalidate(self, stage: str) -> None:
+        """删除阶段记录，下次构建时强制执行"""
+        self.data["stages"].pop(stage, None)
+
+    def save(self) -> None:
+        """原子写入清单文件"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
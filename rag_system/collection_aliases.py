@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+
+def versioned_collection_name(alias: str) -> str:
+    """生成新版本集合名：<别名>__v<时间戳>_<随机后缀>"""
+    return f"{alias}__v{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def is_versioned_collection_name(alias: str, name: str) -> bool:
+    """判断集合名是否由versioned_collection_name为该别名生成"""
+    return name.startswith(f"{alias}__v")
+
+
+class CollectionAliases:
+    """
+    集合别名表
+
+    查询使用稳定的别名（如student_knowledge），别名指向实际提供服务的版本集合。
+    重建时写入新版本集合，完成后原子地切换别名，查询始终读到完整的版本。
+    别名表保存在 <persist_directory>/collection_aliases.json，修改后其他进程按修改时间重新加载。
+    """
+
+    def __init__(self, persist_directory: str = "./vector_db"):
+        """
+        Args:
+            persist_directory: 向量数据库存储目录
+        """
+        self.path = os.path.join(persist_directory, "collection_aliases.json")
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._data = {"aliases": {}, "history": {}}
+
+    def _reload(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取集合别名表失败: {e}")
+            return
+        data.setdefault("aliases", {})
+        data.setdefault("history", {})
+        self._data = data
+        self._mtime = mtime
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def resolve(self, name: str) -> str:
+        """别名解析为实际集合名；不是别名时原样返回"""
+        with self._lock:
+            self._reload()
+            return self._data["aliases"].get(name, name)
+
+    def get_all(self) -> Dict[str, str]:
+        """全部别名 -> 集合名"""
+        with self._lock:
+            self._reload()
+            return dict(self._data["aliases"])
+
+    def swap(self, alias: str, collection_name: str, keep_previous: int = 1) -> List[str]:
+        """
+        把别名原子地切换到新集合
+
+        旧集合进入历史列表，保留最近keep_previous个（正在进行中的查询仍可读完），
+        更早的版本由调用方删除。只有versioned_collection_name生成的版本会进入历史，
+        首次切换前与别名同名的未版本化集合不会被返回删除。
+
+        Args:
+            alias: 别名
+            collection_name: 新的实际集合名
+            keep_previous: 保留的旧版本数量
+
+        Returns:
+            需要删除的旧集合名列表
+        """
+        with self._lock:
+            self._reload()
+            previous = self._data["aliases"].get(alias, alias)
+            history = [name for name in self._data["history"].get(alias, [])
+                       if name not in (previous, collection_name)]
+            if previous != collection_name and is_versioned_collection_name(alias, previous):
+                history.insert(0, previous)
+            expired = history[keep_previous:]
+            self._data["aliases"][alias] = collection_name
+            self._data["history"][alias] = history[:keep_previous]
+            self._save()
+            return expired
+
+    def remove(self, alias: str) -> List[str]:
+        """
+        删除别名
+
+        Returns:
+            别名指向的集合及其历史版本
+        """
+        with self._lock:
+            self._reload()
+            current = self._data["aliases"].pop(alias, None)
+            history = self._data["history"].pop(alias, [])
+            self._save()
+            return ([current] if current else []) + history
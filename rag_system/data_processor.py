@@ -1,6 +1,11 @@
 import pandas as pd
 import os
-from typing import List, Dict, Tuple
+import re
+from typing import List, Dict, Iterator, Tuple
+
+# 培养方案中的专业标题（如 "## 微电子科学与工程 专业专业培养方案"）和章节标题（如 "一、专业介绍"）
+MAJOR_HEADING = re.compile(r'^## (.+?) 专业专业培养方案$')
+SECTION_HEADING = re.compile(r'^[一二三四五六七八九十]+、\S*')
 
 class DataProcessor:
     """数据处理类"""
@@ -10,30 +15,38 @@ class DataProcessor:
     
     def process_student_data(self, csv_file: str) -> Tuple[List[str], List[Dict]]:
         """处理学生数据CSV文件"""
+        documents = []
+        metadatas = []
+        for description, metadata in self.iter_student_data(csv_file):
+            documents.append(description)
+            metadatas.append(metadata)
+        
+        print(f"处理完成，生成 {len(documents)} 个学生文档")
+        return documents, metadatas
+    
+    def iter_student_data(self, csv_file: str) -> Iterator[Tuple[str, Dict]]:
+        """逐条生成学生文档和元数据"""
         if not os.path.exists(csv_file):
             raise FileNotFoundError(f"文件不存在: {csv_file}")
         
         df = pd.read_csv(csv_file, encoding='utf-8')
         print(f"读取学生数据: {len(df)} 条记录")
         
-        documents = []
-        metadatas = []
-        
-        for _, row in df.iterrows():
+        for index, row in df.iterrows():
             description = self.generate_student_description(row)
-            documents.append(description)
             
+            student_id = str(row.get('student_id', '')) if pd.notna(row.get('student_id')) else ''
             metadata = {
                 "type": "student",
+                "source": csv_file,
+                # 学号作为行键，缺失时退回行号
+                "doc_key": student_id or f"row_{index}",
                 "student_id": str(row.get('student_id', '')),
                 "name": str(row.get('name', '')),
                 "major": str(row.get('major', '')),
                 "graduation_year": str(row.get('graduation_year', ''))
             }
-            metadatas.append(metadata)
-        
-        print(f"处理完成，生成 {len(documents)} 个学生文档")
-        return documents, metadatas
+            yield description, metadata
     
     def generate_student_description(self, student_data: pd.Series) -> str:
         """生成学生描述文本"""
@@ -62,6 +75,22 @@ class DataProcessor:
     
     def process_cultivation_plan(self, text_file: str) -> Tuple[List[str], List[Dict]]:
         """处理培养方案文档"""
+        documents = []
+        metadatas = []
+        for chunk, metadata in self.iter_cultivation_plan(text_file):
+            documents.append(chunk)
+            metadatas.append(metadata)
+        
+        print(f"处理完成，生成 {len(documents)} 个文档块")
+        return documents, metadatas
+    
+    def iter_cultivation_plan(self, text_file: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        逐块生成培养方案文档和元数据
+        
+        先按专业和章节切分，再在章节内按长度分块；doc_key为 "专业#章节#块序号"，
+        修改某一章节只会改变该章节内的文档ID，其他章节的文档不需要重新编码。
+        """
         if not os.path.exists(text_file):
             raise FileNotFoundError(f"文件不存在: {text_file}")
         
@@ -70,26 +99,59 @@ class DataProcessor:
         
         print(f"读取培养方案文档，长度: {len(content)} 字符")
         
-        chunks = self.split_text(content)
-        
-        documents = []
-        metadatas = []
-        
-        for i, chunk in enumerate(chunks):
-            documents.append(chunk)
-            metadata = {
-                "type": "cultivation_plan",
-                "chunk_id": i,
-                "source": text_file
-            }
-            metadatas.append(metadata)
+        chunk_id = 0
+        for section_key, section in self.iter_plan_sections(content):
+            for j, chunk in enumerate(self.iter_text_chunks(section)):
+                metadata = {
+                    "type": "cultivation_plan",
+                    "chunk_id": chunk_id,
+                    "source": text_file,
+                    "section": section_key,
+                    "doc_key": f"{section_key}#{j}"
+                }
+                chunk_id += 1
+                yield chunk, metadata
+    
+    def iter_plan_sections(self, content: str) -> Iterator[Tuple[str, str]]:
+        """
+        按专业标题和章节标题切分培养方案
         
-        print(f"处理完成，生成 {len(documents)} 个文档块")
-        return documents, metadatas
+        Args:
+            content: 培养方案全文
+            
+        Returns:
+            生成 (章节键 "专业#章节标题", 章节文本) 的生成器；标题前的内容章节标题为空
+        """
+        major, heading, lines = "", "", []
+        for line in content.splitlines():
+            stripped = line.strip()
+            major_match = MAJOR_HEADING.match(stripped)
+            section_match = None if major_match else SECTION_HEADING.match(stripped)
+            if major_match or section_match:
+                section = "\n".join(lines).strip()
+                # 只有专业标题的部分并入该专业的第一个章节
+                if section_match and MAJOR_HEADING.match(section):
+                    heading = section_match.group(0)
+                    lines.append(line)
+                    continue
+                if section:
+                    yield f"{major}#{heading}", section
+                lines = []
+                if major_match:
+                    major, heading = major_match.group(1).strip(), ""
+                else:
+                    heading = section_match.group(0)
+            lines.append(line)
+        section = "\n".join(lines).strip()
+        if section:
+            yield f"{major}#{heading}", section
     
     def split_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """分割长文本为小块"""
-        chunks = []
+        return list(self.iter_text_chunks(text, chunk_size, overlap))
+    
+    def iter_text_chunks(self, text: str, chunk_size: int = 500, overlap: int = 50) -> Iterator[str]:
+        """逐块生成分割后的文本"""
         start = 0
         text_length = len(text)
         
@@ -104,7 +166,7 @@ class DataProcessor:
             
             chunk = text[start:end].strip()
             if chunk and len(chunk) > 20:
-                chunks.append(chunk)
+                yield chunk
             
             # 移动到下一个位置
             start = max(start + 1, end - overlap)
@@ -112,8 +174,6 @@ class DataProcessor:
             # 防止无限循环
             if start >= text_length:
                 break
-        
-        return chunks
     
     def process_mixed_data(self, 
                           student_csv: str = None, 
@@ -137,4 +197,28 @@ class DataProcessor:
             all_metadatas.extend(plan_metas)
         
         print(f"混合数据处理完成，总共 {len(all_documents)} 个文档")
-        return all_documents, all_metadatas 
\ No newline at end of file
+        return all_documents, all_metadatas
+    
+    def iter_mixed_data(self, 
+                        student_csv: str = None, 
+                        plan_txt: str = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        逐条生成混合数据，供流水线式构建边处理边编码
+        
+        增量构建会删除已读取数据源中不再出现的文档，指定的文件不存在时直接报错，
+        不能当作该数据源为空。
+        
+        Raises:
+            FileNotFoundError: 指定的数据文件不存在
+        """
+        for path in (student_csv, plan_txt):
+            if path and not os.path.exists(path):
+                raise FileNotFoundError(f"文件不存在: {path}")
+        
+        if student_csv:
+            print("处理学生数据...")
+            yield from self.iter_student_data(student_csv)
+        
+        if plan_txt:
+            print("处理培养方案...")
+            yield from self.iter_cultivation_plan(plan_txt)
@@ -0,0 +1,105 @@
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def content_hash(text: str) -> str:
+    """文档内容哈希（前16位十六进制）"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def slot_id(source: str, key: str) -> str:
+    """由 (来源文件, 章节/行键) 得到的稳定槽位标识"""
+    return hashlib.sha1(f"{source}\x00{key}".encode('utf-8')).hexdigest()[:16]
+
+
+def make_document_id(source: str, key: str, text: str) -> str:
+    """
+    生成确定性的文档ID：<槽位标识>-<内容哈希>
+
+    同一来源、同一键、同一内容每次构建得到相同ID；内容变化时槽位标识不变、
+    内容哈希变化，据此区分"更新"和"新增"。
+
+    Args:
+        source: 来源文件
+        key: 章节或行键（如学号、专业名#章节序号）
+        text: 文档内容
+
+    Returns:
+        文档ID
+    """
+    return f"{slot_id(source, key)}-{content_hash(text)}"
+
+
+def split_document_id(doc_id: str) -> Tuple[str, Optional[str]]:
+    """拆分为 (槽位标识, 内容哈希)；旧格式ID（如doc_0）整体视为槽位"""
+    slot, sep, digest = doc_id.rpartition("-")
+    if not sep or len(slot) != 16 or len(digest) != 16:
+        return doc_id, None
+    return slot, digest
+
+
+def iter_document_ids(records: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    流式生成文档ID，与assign_document_ids规则相同
+
+    Args:
+        records: (文档内容, 元数据) 迭代器
+
+    Returns:
+        生成 (文档ID, 文档内容, 元数据) 的生成器
+    """
+    seen: Dict[Tuple[str, str], int] = {}
+    for index, (document, metadata) in enumerate(records):
+        source = str(metadata.get("source", "unknown"))
+        key = str(metadata.get("doc_key", index))
+        occurrence = seen.get((source, key), 0)
+        seen[(source, key)] = occurrence + 1
+        if occurrence:
+            key = f"{key}#{occurrence}"
+        metadata["content_hash"] = content_hash(document)
+        yield make_document_id(source, key, document), document, metadata
+
+
+def assign_document_ids(documents: List[str], metadatas: List[Dict]) -> List[str]:
+    """
+    根据元数据中的source和doc_key生成文档ID，并把content_hash写入元数据
+
+    同一 (source, doc_key) 重复出现时依次追加 #1、#2 …，保证ID唯一且可复现。
+
+    Args:
+        documents: 文档内容列表
+        metadatas: 元数据列表（缺少source/doc_key时分别退回"unknown"和序号）
+
+    Returns:
+        文档ID列表
+    """
+    return [doc_id for doc_id, _, _ in iter_document_ids(zip(documents, metadatas))]
+
+
+def plan_sync(existing_ids: Iterable[str], new_ids: List[str]) -> Dict:
+    """
+    对比集合中已有的ID和本次构建的ID，得到增量更新计划
+
+    Args:
+        existing_ids: 集合中已有的文档ID
+        new_ids: 本次构建的文档ID
+
+    Returns:
+        {"write": 需要编码写入的ID集合, "delete": 需要删除的ID列表,
+         "added": 数量, "updated": 数量, "unchanged": 数量, "removed": 数量}
+    """
+    existing = set(existing_ids)
+    new = set(new_ids)
+    write = new - existing
+    delete = existing - new
+
+    delete_slots = {split_document_id(doc_id)[0] for doc_id in delete}
+    updated = sum(1 for doc_id in write if split_document_id(doc_id)[0] in delete_slots)
+    return {
+        "write": write,
+        "delete": sorted(delete),
+        "added": len(write) - updated,
+        "updated": updated,
+        "unchanged": len(new & existing),
+        "removed": len(delete) - updated
+    }
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本（NFKC + 折叠空白），作为缓存键的一部分"""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+def model_fingerprint(model_name: str, backend: str = "torch") -> str:
+    """
+    计算模型指纹
+
+    本地模型目录会把权重/配置文件的大小和修改时间计入指纹，
+    模型路径或模型文件变化时指纹随之变化，旧缓存自动失效。
+
+    Args:
+        model_name: 模型名称或本地模型路径
+        backend: 推理后端，非torch后端（如int8量化）的向量不与torch混用
+
+    Returns:
+        模型指纹字符串
+    """
+    hasher = hashlib.sha256(model_name.encode("utf-8"))
+    if backend != "torch":
+        hasher.update(f"|backend={backend}".encode("utf-8"))
+    if os.path.isdir(model_name):
+        for root, _, files in sorted(os.walk(model_name)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(path, model_name)
+                hasher.update(f"{rel_path}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+    return hasher.hexdigest()[:16]
+
+
+class EmbeddingCache:
+    """
+    基于SQLite的持久化向量缓存，键为 (模型指纹, 规范化文本哈希)
+
+    同一个缓存文件可由多个模型/后端共享（如build_kb与RAGSystem、torch与onnx），
+    各自只读写自己指纹的条目；旧指纹的条目不再命中，随LRU容量淘汰自然清出。
+    """
+
+    def __init__(self,
+                 cache_dir: str,
+                 fingerprint: str,
+                 max_entries: int = 200000):
+        """
+        初始化向量缓存
+
+        Args:
+            cache_dir: 缓存目录
+            fingerprint: 模型指纹，见 model_fingerprint
+            max_entries: 缓存文件的最大条目数（所有指纹合计），超出后按最近访问时间淘汰
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_path = os.path.join(cache_dir, "embeddings.sqlite3")
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, dim INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+    def _make_key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.fingerprint}:{digest}"
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与texts对齐的向量列表，未命中的位置为None
+        """
+        keys = [self._make_key(text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite单条语句的参数数量有限，分批查询
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """
+        批量写入缓存
+
+        Args:
+            texts: 文本列表
+            embeddings: 与texts对齐的向量数组
+        """
+        if len(texts) == 0:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        now = time.time()
+        rows = [
+            (self._make_key(text), self.fingerprint, int(vector.shape[0]), vector.tobytes(), now)
+            for text, vector in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, fingerprint, dim, vector, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰超出容量的条目（调用方持有锁）"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def encode(self,
+               texts: List[str],
+               encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        通过缓存编码文本，只有未命中的文本会交给模型
+
+        Args:
+            texts: 文本列表
+            encode_fn: 编码函数，输入文本列表，返回向量数组
+
+        Returns:
+            与texts对齐的向量数组
+        """
+        cached = self.get_many(texts)
+        missing_indices = [i for i, vector in enumerate(cached) if vector is None]
+
+        if missing_indices:
+            # 同一批次中重复的文本只编码一次
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing_indices))
+            print(f"向量缓存命中 {len(texts) - len(missing_indices)}/{len(texts)}，"
+                  f"需编码 {len(unique_texts)} 个文本")
+            new_embeddings = np.asarray(encode_fn(unique_texts), dtype=np.float32)
+            self.put_many(unique_texts, new_embeddings)
+            lookup = dict(zip(unique_texts, new_embeddings))
+            for i in missing_indices:
+                cached[i] = lookup[texts[i]]
+        else:
+            print(f"向量缓存全部命中: {len(texts)} 个文本")
+
+        if not cached:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(cached)
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            size = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE fingerprint = ?", (self.fingerprint,)
+            ).fetchone()[0]
+            total_size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "path": self.cache_path,
+            "fingerprint": self.fingerprint,
+            "entries": size,
+            "total_entries": total_size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def clear(self) -> None:
+        """清空当前模型指纹的缓存，不影响共享同一缓存文件的其他模型"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE fingerprint = ?", (self.fingerprint,))
+            self._conn.commit()
+        print("向量缓存已清空")
+
+    def close(self) -> None:
+        """关闭缓存连接"""
+        with self._lock:
+            self._conn.close()
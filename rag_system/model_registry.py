@@ -0,0 +1,207 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# 模型类型
+BI_ENCODER = "bi_encoder"
+CROSS_ENCODER = "cross_encoder"
+
+
+def _load_model(kind: str, model_path: str, backend: str):
+    """按类型和后端加载模型实例"""
+    if backend == "torch":
+        if kind == BI_ENCODER:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_path)
+            return model.to('cuda' if torch.cuda.is_available() else 'cpu')
+        if kind == CROSS_ENCODER:
+            from sentence_transformers import CrossEncoder
+            return CrossEncoder(model_path)
+    else:
+        from .onnx_backend import OnnxCrossEncoder, OnnxSentenceEncoder
+        quantize = backend == "onnx-int8"
+        if kind == BI_ENCODER:
+            return OnnxSentenceEncoder(model_path, quantize=quantize)
+        if kind == CROSS_ENCODER:
+            return OnnxCrossEncoder(model_path, quantize=quantize)
+    raise ValueError(f"未知的模型类型: {kind}")
+
+
+class _Entry:
+    """注册表中的一个模型条目"""
+
+    def __init__(self):
+        self.model = None
+        self.refcount = 0
+        self.idle_since: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    进程级模型注册表
+
+    按 (模型类型, 模型路径, 推理后端) 共享模型实例，引用计数归零后
+    按idle_ttl决定是否淘汰。同一模型只加载一次，多个RAGSystem、
+    查询工具和脚本共用同一份内存。sentence-transformers和ONNX Runtime
+    的推理调用本身可以在多线程中并发使用。
+    """
+
+    def __init__(self,
+                 idle_ttl: Optional[float] = None,
+                 loader: Callable[[str, str, str], object] = _load_model):
+        """
+        初始化模型注册表
+
+        Args:
+            idle_ttl: 引用计数归零后保留的秒数，None表示永久保留，0表示立即淘汰
+            loader: 模型加载函数，参数为 (模型类型, 模型路径, 推理后端)
+        """
+        self.idle_ttl = idle_ttl
+        self.loader = loader
+        self.loads = 0
+        self.evictions = 0
+        self._entries: Dict[Tuple[str, str, str], _Entry] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        if idle_ttl:
+            self._start_reaper()
+
+    def acquire(self, model_path: str, kind: str, backend: str = "torch"):
+        """
+        获取共享的模型实例，引用计数加一；首次获取时加载模型
+
+        Args:
+            model_path: 模型名称或本地模型路径
+            kind: 模型类型，BI_ENCODER 或 CROSS_ENCODER
+            backend: 推理后端
+
+        Returns:
+            模型实例（加载失败时抛出异常，且不占用引用）
+        """
+        key = (kind, model_path, backend)
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.refcount += 1
+            entry.idle_since = None
+
+        try:
+            # 每个模型单独加锁，加载大模型时不阻塞其他模型
+            with entry.lock:
+                if entry.model is None:
+                    start = time.perf_counter()
+                    entry.model = self.loader(kind, model_path, backend)
+                    entry.load_seconds = time.perf_counter() - start
+                    self.loads += 1
+                    print(f"模型注册表加载模型: {kind} {model_path} ({backend})，"
+                          f"耗时 {entry.load_seconds:.2f} 秒")
+                return entry.model
+        except Exception:
+            self.release(model_path, kind, backend)
+            raise
+
+    def release(self, model_path: str, kind: str, backend: str = "torch") -> None:
+        """
+        释放模型引用，引用计数归零后按idle_ttl淘汰
+
+        Args:
+            model_path: 模型名称或本地模型路径
+            kind: 模型类型
+            backend: 推理后端
+        """
+        key = (kind, model_path, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refcount == 0:
+                return
+            entry.refcount -= 1
+            if entry.refcount == 0:
+                entry.idle_since = time.time()
+                if self.idle_ttl == 0:
+                    self._evict(key)
+
+    def evict_idle(self, max_idle_seconds: Optional[float] = None) -> int:
+        """
+        淘汰空闲超时的模型
+
+        Args:
+            max_idle_seconds: 空闲时长阈值，默认使用idle_ttl
+
+        Returns:
+            淘汰的模型数量
+        """
+        threshold = self.idle_ttl if max_idle_seconds is None else max_idle_seconds
+        if threshold is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items()
+                       if entry.refcount == 0 and entry.idle_since is not None
+                       and now - entry.idle_since >= threshold]
+            for key in expired:
+                self._evict(key)
+        return len(expired)
+
+    def _evict(self, key) -> None:
+        """移除条目（调用方持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.model is not None:
+            self.evictions += 1
+            print(f"模型注册表淘汰空闲模型: {key[0]} {key[1]} ({key[2]})")
+
+    def _start_reaper(self) -> None:
+        """启动后台线程，定期淘汰空闲模型"""
+        def reap():
+            while True:
+                time.sleep(max(self.idle_ttl / 2, 1.0))
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="model-registry-reaper", daemon=True)
+        self._reaper.start()
+
+    def get_stats(self) -> Dict:
+        """获取注册表统计信息"""
+        with self._lock:
+            models = [
+                {
+                    "kind": kind,
+                    "model_path": model_path,
+                    "backend": backend,
+                    "loaded": entry.model is not None,
+                    "refcount": entry.refcount,
+                    "load_seconds": entry.load_seconds
+                }
+                for (kind, model_path, backend), entry in self._entries.items()
+            ]
+        return {
+            "idle_ttl": self.idle_ttl,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "models": models
+        }
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """获取进程级模型注册表"""
+    return _registry
+
+
+def configure_model_registry(idle_ttl: Optional[float] = None) -> ModelRegistry:
+    """
+    配置进程级模型注册表的空闲淘汰策略
+
+    Args:
+        idle_ttl: 引用计数归零后保留的秒数，None表示永久保留
+
+    Returns:
+        模型注册表
+    """
+    _registry.idle_ttl = idle_ttl
+    if idle_ttl and _registry._reaper is None:
+        _registry._start_reaper()
+    return _registry
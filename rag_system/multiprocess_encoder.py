@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# 工作进程内的模型实例（每个进程一份）
+_worker_state: Dict = {}
+
+
+def available_cpus() -> List[int]:
+    """当前进程可用的CPU编号（考虑容器/taskset的亲和性限制）"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_worker(model_name: str, backend: str, threads: int, cpu_sets: List[List[int]], slots) -> None:
+    """
+    工作进程初始化：绑定CPU、限制线程数，然后加载模型
+
+    线程数必须在导入torch/onnxruntime之前通过环境变量设置，否则各进程都会按
+    全部核心数启动线程池，造成严重的超额订阅。
+    """
+    slot = slots.get()
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if cpu_sets and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_sets[slot % len(cpu_sets)])
+
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device="cpu")
+    else:
+        from .onnx_backend import OnnxSentenceEncoder
+        model = OnnxSentenceEncoder(model_name, quantize=backend == "onnx-int8", num_threads=threads)
+    _worker_state["model"] = model
+    _worker_state["slot"] = slot
+
+
+def _encode_shard(texts: List[str], batch_size: int) -> np.ndarray:
+    """工作进程：编码一个分片，输出保持分片内原始顺序（模型内部已按长度排序组批）"""
+    from .vectorizer import to_numpy
+
+    model = _worker_state["model"]
+    return to_numpy(model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_tensor=True,
+        normalize_embeddings=True
+    )).astype(np.float32, copy=False)
+
+
+class MultiProcessEncoder:
+    """
+    多进程文档编码器，用于大规模构建
+
+    语料按连续分片分发给若干工作进程，每个进程加载一份模型、绑定到互不重叠的CPU核心并
+    限制自身线程数；分片结果按原始顺序拼回。输入较少时直接调用fallback在当前进程编码，
+    避免进程启动和模型加载的开销。
+    """
+
+    def __init__(self,
+                 model_name: str,
+                 backend: str = "torch",
+                 num_workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None,
+                 shard_size: int = 1024,
+                 batch_size: int = 32,
+                 min_texts: int = 4096,
+                 fallback: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 pin_cpus: bool = True):
+        """
+        初始化多进程编码器（工作进程在首次需要时启动）
+
+        Args:
+            model_name: 模型名称或本地路径
+            backend: 推理后端，"torch"、"onnx" 或 "onnx-int8"
+            num_workers: 工作进程数，默认 可用核心数 // threads_per_worker
+            threads_per_worker: 每个进程的计算线程数，默认 可用核心数 // num_workers（至少1）
+            shard_size: 每个分片的文本数
+            batch_size: 工作进程内的批处理大小
+            min_texts: 少于该数量时使用fallback单进程编码
+            fallback: 单进程编码函数
+            pin_cpus: 是否把每个工作进程绑定到固定的CPU核心
+        """
+        cpus = available_cpus()
+        if num_workers is None:
+            threads_per_worker = threads_per_worker or 1
+            num_workers = max(1, len(cpus) // threads_per_worker)
+        elif threads_per_worker is None:
+            threads_per_worker = max(1, len(cpus) // num_workers)
+
+        self.model_name = model_name
+        self.backend = backend
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self.min_texts = min_texts
+        self.fallback = fallback
+        # 核心数足够时每个进程独占 threads_per_worker 个核心
+        self.cpu_sets = []
+        if pin_cpus and len(cpus) >= num_workers * threads_per_worker:
+            self.cpu_sets = [cpus[i * threads_per_worker:(i + 1) * threads_per_worker]
+                             for i in range(num_workers)]
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._disabled = False
+        self.stats = {"multiprocess_texts": 0, "fallback_texts": 0, "seconds": 0.0}
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn：torch在fork出的子进程中可能死锁
+            context = multiprocessing.get_context("spawn")
+            slots = context.Queue()
+            for slot in range(self.num_workers):
+                slots.put(slot)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.threads_per_worker, self.cpu_sets, slots)
+            )
+            print(f"🚀 多进程编码已启动: {self.num_workers} 个进程 × {self.threads_per_worker} 线程"
+                  f"{'（已绑定CPU）' if self.cpu_sets else ''}")
+        return self._executor
+
+    def _encode_local(self, texts: List[str]) -> np.ndarray:
+        if self.fallback is None:
+            raise RuntimeError("未提供单进程编码函数")
+        self.stats["fallback_texts"] += len(texts)
+        return self.fallback(texts)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        编码文本，输出与输入顺序一致
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            float32向量矩阵
+        """
+        if (self._disabled or self.num_workers <= 1 or len(texts) < self.min_texts) and self.fallback:
+            return self._encode_local(texts)
+
+        start = time.perf_counter()
+        try:
+            result = self._encode_sharded(texts)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            # 进程池不可用（如工作进程加载模型失败）时退回单进程，后续调用不再尝试
+            print(f"⚠️ 多进程编码失败，退回单进程: {e}")
+            self._disabled = True
+            self.close()
+            return self._encode_local(texts)
+        self.stats["multiprocess_texts"] += len(texts)
+        self.stats["seconds"] += time.perf_counter() - start
+        return result
+
+    def _encode_sharded(self, texts: List[str]) -> np.ndarray:
+        """按分片提交，在途分片数限制为进程数的两倍；按提交顺序取回结果写入对应位置"""
+        executor = self._start()
+        bounds = [(begin, min(begin + self.shard_size, len(texts)))
+                  for begin in range(0, len(texts), self.shard_size)]
+        window = self.num_workers * 2
+        result = None
+        in_flight = []
+        next_shard = 0
+        done = 0
+        while done < len(bounds):
+            while next_shard < len(bounds) and len(in_flight) < window:
+                begin, end = bounds[next_shard]
+                in_flight.append((begin, end, executor.submit(_encode_shard, texts[begin:end], self.batch_size)))
+                next_shard += 1
+            begin, end, future = in_flight.pop(0)
+            embeddings = future.result()
+            if result is None:
+                result = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            result[begin:end] = embeddings
+            done += 1
+        if result is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return result
+
+    def close(self) -> None:
+        """关闭工作进程"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,740 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .vector_db import CollectionNotFoundError, IngestProgress, VectorDB, iter_record_batches
+
+# 拷贝向量到新快照时每次处理的行数，限制峰值内存
+_COPY_ROWS = 65536
+# 增量段数量达到该值时合并为新快照
+_MAX_SEGMENTS = 32
+# 被覆盖或删除的行超过该比例时合并为新快照
+_MAX_DEAD_RATIO = 0.25
+# 删除集合时无法立即清除的残留目录标记，之后打开可写向量库时重试
+_DELETED_MARKER = "DELETED"
+
+
+class NumpyCollection:
+    """
+    NumPy扁平索引的一个集合视图：基础快照加按顺序追加的增量段
+
+    parts为各段内存映射的归一化float32矩阵（只读），ids/documents/metadatas按行拼接。
+    同一ID后写入的行覆盖先前的行，删除以墓碑记录，live标记每一行是否仍有效。
+    """
+
+    def __init__(self, name: str, collection_id: str, snapshot: str, metadata: Optional[Dict] = None):
+        self.name = name
+        self.id = collection_id
+        self.snapshot = snapshot
+        self.version = 0
+        self.segments: List[str] = []
+        self.parts: List[np.ndarray] = []
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.live = np.zeros(0, dtype=bool)
+        self.metadata = metadata or {"hnsw:space": "cosine"}
+        self.id_to_index: Dict[str, int] = {}
+
+    def count(self) -> int:
+        return len(self.id_to_index)
+
+    @property
+    def rows(self) -> int:
+        """全部行数，包括已被覆盖或删除的行"""
+        return len(self.ids)
+
+    def copy(self) -> "NumpyCollection":
+        """浅拷贝（共享内存映射），用于在不影响正在使用旧视图的查询的前提下追加增量段"""
+        other = NumpyCollection(self.name, self.id, self.snapshot, self.metadata)
+        other.version = self.version
+        other.segments = list(self.segments)
+        other.parts = list(self.parts)
+        other.ids = list(self.ids)
+        other.documents = list(self.documents)
+        other.metadatas = list(self.metadatas)
+        other.live = self.live.copy()
+        other.id_to_index = dict(self.id_to_index)
+        return other
+
+    def extend(self, vectors: np.ndarray, ids: List[str], documents: List[str],
+               metadatas: List[Dict], deleted: Iterable[str] = ()) -> None:
+        """
+        追加一段：先应用段内的删除，再追加新行（覆盖同ID的旧行）
+
+        Args:
+            vectors: 新行的归一化向量
+            ids: 新行的文档ID
+            documents: 新行的文档内容
+            metadatas: 新行的元数据
+            deleted: 本段删除的文档ID
+        """
+        offset = self.rows
+        self.live = np.concatenate([self.live, np.ones(len(ids), dtype=bool)])
+        for doc_id in deleted:
+            index = self.id_to_index.pop(doc_id, None)
+            if index is not None:
+                self.live[index] = False
+        for position, doc_id in enumerate(ids):
+            index = self.id_to_index.get(doc_id)
+            if index is not None:
+                self.live[index] = False
+            self.id_to_index[doc_id] = offset + position
+        self.parts.append(vectors)
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+
+    def live_runs(self) -> List[np.ndarray]:
+        """有效行按顺序切分成的连续区间（内存映射视图，不复制）"""
+        runs = []
+        offset = 0
+        for part in self.parts:
+            keep = np.flatnonzero(self.live[offset:offset + len(part)])
+            runs.extend(NumpyVectorDB._contiguous_runs(part, keep.tolist()))
+            offset += len(part)
+        return runs
+
+
+def _match_where(metadata: Dict, where: Dict) -> bool:
+    """简单的元数据过滤，支持等值、$eq、$ne、$in"""
+    for key, condition in where.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, target in condition.items():
+                if op == "$eq" and value != target:
+                    return False
+                if op == "$ne" and value == target:
+                    return False
+                if op == "$in" and value not in target:
+                    return False
+                if op not in ("$eq", "$ne", "$in"):
+                    raise ValueError(f"不支持的过滤操作: {op}")
+        elif value != condition:
+            return False
+    return True
+
+
+def _remove_tree(path: str) -> bool:
+    """
+    删除目录，失败时报告而不是静默忽略
+
+    Windows上仍被内存映射（如其他服务进程正在读取的旧快照）的文件无法删除，
+    残留目录在之后的写入或打开可写向量库时重试。
+
+    Returns:
+        是否已完全删除
+    """
+    failures = []
+
+    def on_error(function, failed_path, error):
+        failures.append((failed_path, error[1] if isinstance(error, tuple) else error))
+
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=on_error)
+    else:
+        shutil.rmtree(path, onerror=on_error)
+    failures = [(failed_path, error) for failed_path, error in failures
+                if not isinstance(error, FileNotFoundError)]
+    if failures:
+        print(f"删除 {path} 失败（{len(failures)} 个文件仍被占用），稍后重试: {failures[0][1]}")
+    return not failures
+
+
+class NumpyVectorDB(VectorDB):
+    """
+    进程内NumPy扁平索引
+
+    每个集合保存为 <persist_directory>/numpy/<集合名>/ 下的一个基础快照目录
+    （vectors.npy归一化float32矩阵 + table.json中的ID、文档、元数据）和快照目录中
+    按顺序追加的增量段（segNNNNNN.f32原始向量 + segNNNNNN.json，含墓碑）。
+    CURRENT文件记录当前快照和增量段列表，写入时只写新的增量段后原子替换CURRENT，
+    写入代价与本次写入的数据量成正比；增量段过多或失效行过多时合并为新快照。
+    读取端以内存映射打开，多个工作进程共享同一份页缓存，不复制向量；
+    CURRENT只追加了增量段时只加载新段。
+    检索为精确的矩阵-向量乘积，语料规模在百万级以内时比HNSW的调用开销更低。
+    同一时间只应有一个写入进程。
+    """
+
+    def __init__(self, persist_directory: str = "./vector_db", read_only: bool = False,
+                 batch_size: int = 1000):
+        """
+        初始化NumPy向量数据库
+
+        Args:
+            persist_directory: 数据持久化目录
+            read_only: 只读模式，多个服务进程打开同一快照时使用
+            batch_size: 流式写入时每批处理的记录数
+        """
+        self.persist_directory = persist_directory
+        self.batch_size = batch_size
+        self.root = os.path.join(persist_directory, "numpy")
+        self.read_only = read_only
+        os.makedirs(self.root, exist_ok=True)
+        self.collection: Optional[NumpyCollection] = None
+        self._current_mtime = None
+        self._lock = threading.Lock()
+        # 查询用的集合句柄：集合名 -> (CURRENT修改时间, 集合视图)
+        self._handles: Dict[str, Tuple[float, NumpyCollection]] = {}
+        if not read_only:
+            # 重试上次未能删除的旧快照和已删除集合
+            for entry in os.listdir(self.root):
+                if os.path.isdir(self._collection_dir(entry)):
+                    self._collect_garbage(entry, after_write=False)
+        print(f"NumPy向量库初始化完成，数据目录: {self.root}" + ("（只读）" if read_only else ""))
+
+    def _collection_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _current_path(self, name: str) -> str:
+        return os.path.join(self._collection_dir(name), "CURRENT")
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise ValueError("向量库以只读模式打开")
+        if not self.collection:
+            self.create_collection()
+        self._refresh()
+
+    def _read_current(self, name: str) -> Dict:
+        """读取CURRENT：{"snapshot": 快照目录, "version": 版本, "segments": [增量段]}"""
+        with open(self._current_path(name), 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+        if text.startswith("{"):
+            return json.loads(text)
+        # 旧格式：只有快照目录名，没有增量段
+        return {"snapshot": text, "segments": []}
+
+    def _write_current(self, name: str, state: Dict) -> None:
+        """原子替换CURRENT并重新打开当前集合"""
+        tmp_path = self._current_path(name) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._current_path(name))
+        self._current_mtime = os.path.getmtime(self._current_path(name))
+        previous = self.collection if self.collection is not None and self.collection.name == name else None
+        self.collection = self._open(name, previous)
+
+    def _open(self, name: str, previous: Optional[NumpyCollection] = None) -> NumpyCollection:
+        """
+        以内存映射方式打开集合的当前快照和增量段
+
+        Args:
+            name: 集合名称
+            previous: 同一集合之前打开的视图；CURRENT只追加了增量段时在其副本上加载新段
+        """
+        state = self._read_current(name)
+        snapshot_dir = os.path.join(self._collection_dir(name), state["snapshot"])
+        if (previous is not None and previous.snapshot == state["snapshot"]
+                and state["segments"][:len(previous.segments)] == previous.segments):
+            collection = previous.copy()
+        else:
+            with open(os.path.join(snapshot_dir, "table.json"), 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode='r')
+            collection = NumpyCollection(name, table["collection_id"], state["snapshot"], table.get("metadata"))
+            collection.extend(vectors, table["ids"], table["documents"], table["metadatas"])
+            collection.version = table["version"]
+
+        for segment in state["segments"][len(collection.segments):]:
+            with open(os.path.join(snapshot_dir, segment + ".json"), 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            shape = (len(table["ids"]), table["dim"])
+            if shape[0]:
+                vectors = np.memmap(os.path.join(snapshot_dir, segment + ".f32"),
+                                    dtype=np.float32, mode='r', shape=shape)
+            else:
+                vectors = np.zeros(shape, dtype=np.float32)
+            collection.extend(vectors, table["ids"], table["documents"], table["metadatas"], table["deleted"])
+            collection.segments.append(segment)
+        collection.version = state.get("version", collection.version)
+        return collection
+
+    def _write_snapshot(self, name: str, collection_id: str, version: int,
+                        parts: List[np.ndarray], ids: List[str], documents: List[str],
+                        metadatas: List[Dict], metadata: Optional[Dict] = None) -> None:
+        """
+        写入新的基础快照（不含增量段）并原子切换CURRENT，然后清理旧快照
+
+        Args:
+            parts: 按顺序拼接的向量块（可以是内存映射数组），分段拷贝到新快照
+        """
+        collection_dir = self._collection_dir(name)
+        # 随机后缀：删除失败残留的同版本目录不会与新快照冲突
+        snapshot = f"v{version:06d}_{uuid.uuid4().hex[:6]}"
+        snapshot_dir = os.path.join(collection_dir, snapshot)
+        os.makedirs(snapshot_dir)
+
+        parts = [part for part in parts if len(part)]
+        dim = int(parts[0].shape[1]) if parts else 0
+        vectors = np.lib.format.open_memmap(
+            os.path.join(snapshot_dir, "vectors.npy"), mode='w+',
+            dtype=np.float32, shape=(sum(len(part) for part in parts), dim)
+        )
+        offset = 0
+        for part in parts:
+            for begin in range(0, len(part), _COPY_ROWS):
+                chunk = part[begin:begin + _COPY_ROWS]
+                vectors[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+        vectors.flush()
+        del vectors
+
+        with open(os.path.join(snapshot_dir, "table.json"), 'w', encoding='utf-8') as f:
+            json.dump({
+                "collection_id": collection_id,
+                "version": version,
+                "dim": dim,
+                "metadata": metadata,
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas
+            }, f, ensure_ascii=False)
+
+        self._write_current(name, {"snapshot": snapshot, "version": version, "segments": []})
+        self._collect_garbage(name)
+
+    def _append_segment(self, vectors, ids: List[str], documents: List[str],
+                        metadatas: List[Dict], deleted: Optional[List[str]] = None) -> None:
+        """
+        向当前集合追加一个增量段并原子切换CURRENT，必要时合并为新快照
+
+        Args:
+            vectors: 新行的归一化向量矩阵，或已写好的暂存文件路径（(路径, 维度)）
+            ids: 新行的文档ID
+            documents: 新行的文档内容
+            metadatas: 新行的元数据
+            deleted: 本段删除的文档ID
+        """
+        collection = self.collection
+        version = collection.version + 1
+        segment = f"seg{version:06d}"
+        segment_path = os.path.join(self._collection_dir(collection.name), collection.snapshot, segment)
+
+        if isinstance(vectors, tuple):
+            staging_path, dim = vectors
+            os.replace(staging_path, segment_path + ".f32")
+        else:
+            dim = int(vectors.shape[1]) if len(vectors) else 0
+            if len(vectors):
+                with open(segment_path + ".f32.tmp", 'wb') as f:
+                    np.ascontiguousarray(vectors, dtype=np.float32).tofile(f)
+                os.replace(segment_path + ".f32.tmp", segment_path + ".f32")
+
+        with open(segment_path + ".json.tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                "dim": dim,
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas,
+                "deleted": deleted or []
+            }, f, ensure_ascii=False)
+        os.replace(segment_path + ".json.tmp", segment_path + ".json")
+
+        self._write_current(collection.name, {
+            "snapshot": collection.snapshot,
+            "version": version,
+            "segments": collection.segments + [segment]
+        })
+
+        collection = self.collection
+        dead = collection.rows - collection.count()
+        if len(collection.segments) >= _MAX_SEGMENTS or dead > _MAX_DEAD_RATIO * collection.rows:
+            self._compact()
+        else:
+            self._collect_garbage(collection.name)
+
+    def _compact(self) -> None:
+        """把当前集合的有效行合并为新的基础快照"""
+        collection = self.collection
+        keep = np.flatnonzero(collection.live)
+        print(f"合并集合 {collection.name}: {len(collection.segments)} 个增量段，"
+              f"{collection.rows - collection.count()} 个失效行")
+        self._write_snapshot(
+            collection.name, collection.id, collection.version + 1,
+            collection.live_runs(),
+            [collection.ids[i] for i in keep],
+            [collection.documents[i] for i in keep],
+            [collection.metadatas[i] for i in keep],
+            collection.metadata
+        )
+
+    def _collect_garbage(self, name: str, after_write: bool = True) -> None:
+        """
+        删除集合中不再使用的快照目录，保留当前快照和上一个快照（给正在切换的读取进程留出时间）
+
+        删除前先释放本进程对这些快照的内存映射；仍被其他进程占用而删除失败的目录
+        保留到下一次写入时重试。集合已删除（只剩残留标记）时重试删除整个目录。
+
+        Args:
+            name: 集合名称
+            after_write: 是否由本实例的写入触发；只有写入进程才能确定比当前快照新的目录
+                是中断的合并留下的，而不是另一个进程正在写入的快照
+        """
+        collection_dir = self._collection_dir(name)
+        if os.path.exists(os.path.join(collection_dir, _DELETED_MARKER)) \
+                and not os.path.exists(self._current_path(name)):
+            _remove_tree(collection_dir)
+            return
+        try:
+            current = self._read_current(name)["snapshot"]
+        except (OSError, ValueError):
+            return
+
+        def version_of(entry: str) -> int:
+            return int(entry[1:].split("_")[0])
+
+        snapshots = [entry for entry in os.listdir(collection_dir)
+                     if entry.startswith("v") and os.path.isdir(os.path.join(collection_dir, entry))]
+        current_version = version_of(current)
+        older = sorted((entry for entry in snapshots if version_of(entry) < current_version), key=version_of)
+        # 比当前快照新的目录是中断的合并留下的
+        stale = older[:-1]
+        if after_write:
+            stale += [entry for entry in snapshots
+                      if entry != current and version_of(entry) >= current_version]
+        if not stale:
+            return
+
+        with self._lock:
+            cached = self._handles.get(name)
+            if cached is not None and cached[1].snapshot in stale:
+                del self._handles[name]
+        for entry in stale:
+            _remove_tree(os.path.join(collection_dir, entry))
+
+    def _refresh(self) -> None:
+        """CURRENT被其他进程更新后重新映射新快照（只追加了增量段时只加载新段）"""
+        if not self.collection:
+            return
+        try:
+            mtime = os.path.getmtime(self._current_path(self.collection.name))
+        except OSError:
+            return
+        if mtime != self._current_mtime:
+            with self._lock:
+                if mtime != self._current_mtime:
+                    self.collection = self._open(self.collection.name, self.collection)
+                    self._current_mtime = mtime
+
+    def open_collection(self, name: str) -> NumpyCollection:
+        """获取集合当前视图的句柄（只读取，不创建，也不改变当前集合），按CURRENT修改时间缓存"""
+        try:
+            mtime = os.path.getmtime(self._current_path(name))
+        except OSError:
+            raise CollectionNotFoundError(f"集合不存在: {name}")
+        with self._lock:
+            cached = self._handles.get(name)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, self._open(name, cached[1] if cached is not None else None))
+                self._handles[name] = cached
+        return cached[1]
+
+    @staticmethod
+    def _contiguous_runs(vectors: np.ndarray, keep: List[int]) -> List[np.ndarray]:
+        """把保留的行号切分为连续区间的切片（内存映射视图，不复制）"""
+        parts = []
+        start = None
+        for position, row in enumerate(keep):
+            if start is None:
+                start = row
+            if position + 1 == len(keep) or keep[position + 1] != row + 1:
+                parts.append(vectors[start:row + 1])
+                start = None
+        return parts
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(1, -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def create_collection(self, name: str = "student_knowledge", **index_params) -> None:
+        """
+        创建向量集合
+
+        Args:
+            name: 集合名称
+            **index_params: HNSW参数（M、ef_construction、ef_search），扁平索引为精确检索，忽略
+        """
+        if os.path.exists(self._current_path(name)):
+            print(f"集合已存在: {name}")
+            self._current_mtime = os.path.getmtime(self._current_path(name))
+            self.collection = self._open(name)
+            return
+        if self.read_only:
+            raise ValueError(f"集合不存在: {name}")
+        collection_dir = self._collection_dir(name)
+        os.makedirs(collection_dir, exist_ok=True)
+        marker = os.path.join(collection_dir, _DELETED_MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+        self.collection = None
+        self._write_snapshot(name, str(uuid.uuid4()), 1, [], [], [], [])
+        print(f"向量集合创建成功: {name}")
+
+    def get_or_create_collection(self, name: str = "student_knowledge", **index_params):
+        """获取或创建集合（index_params同create_collection，忽略）"""
+        if self.collection is not None and self.collection.name == name:
+            self._refresh()
+            return
+        self.create_collection(name)
+
+    def add_records(self,
+                    records: Iterable[Tuple[str, str, Any, Optional[Dict]]],
+                    batch_size: Optional[int] = None) -> Dict:
+        """
+        流式写入 (ID, 文本, 向量, 元数据) 记录
+
+        新向量逐批归一化后追加到暂存文件，全部写完后整体作为一个增量段提交，
+        不拷贝现有向量，内存中只保留一个批次的向量。已存在的ID会被跳过（与ChromaDB一致）。
+
+        Args:
+            records: 记录迭代器，可以是生成器
+            batch_size: 每批处理的记录数
+
+        Returns:
+            写入统计：added、skipped、batches、seconds、docs_per_second
+        """
+        self._check_writable()
+        collection = self.collection
+        seen = set(collection.id_to_index)
+        new_ids, new_documents, new_metadatas = [], [], []
+        skipped = 0
+        dim = None
+
+        staging_path = os.path.join(self._collection_dir(collection.name), "staging.f32")
+        progress = IngestProgress()
+        try:
+            with open(staging_path, 'wb') as staging:
+                for ids, documents, embeddings, metadatas in iter_record_batches(
+                        records, batch_size or self.batch_size):
+                    keep = [i for i, doc_id in enumerate(ids) if doc_id not in seen]
+                    skipped += len(ids) - len(keep)
+                    if keep:
+                        vectors = self._normalize(embeddings[keep])
+                        dim = vectors.shape[1]
+                        vectors.tofile(staging)
+                        for i in keep:
+                            seen.add(ids[i])
+                            new_ids.append(ids[i])
+                            new_documents.append(documents[i])
+                            new_metadatas.append(metadatas[i])
+                    progress.update(len(keep))
+
+            if skipped:
+                print(f"跳过 {skipped} 个已存在的文档ID")
+            if new_ids:
+                self._append_segment((staging_path, dim), new_ids, new_documents, new_metadatas)
+        finally:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+
+        stats = progress.finish()
+        stats["skipped"] = skipped
+        print(f"成功添加 {stats['added']} 个文档到向量数据库（{stats['docs_per_second']:.0f} 文档/秒）")
+        return stats
+
+    def _write_batch(self,
+                     ids: List[str],
+                     documents: List[str],
+                     embeddings: np.ndarray,
+                     metadatas: List[Dict]) -> None:
+        """写入一个批次（一个增量段）"""
+        self._check_writable()
+        self._append_segment(self._normalize(embeddings), ids, documents, metadatas)
+
+    def search(self,
+               query_embedding: np.ndarray,
+               n_results: int = 5,
+               where: Optional[Dict] = None,
+               collection: Optional[NumpyCollection] = None) -> Dict:
+        """
+        搜索相似文档（精确余弦相似度）
+
+        Args:
+            query_embedding: 查询向量
+            n_results: 返回结果数量
+            where: 元数据过滤条件
+            collection: 集合句柄（见open_collection），None表示当前集合
+
+        Returns:
+            与ChromaDB query结构一致的搜索结果字典
+        """
+        if collection is None:
+            if not self.collection:
+                raise ValueError("向量集合未初始化")
+            self._refresh()
+            collection = self.collection
+
+        if collection.count() == 0:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+        query = self._normalize(query_embedding)[0]
+        scores = np.concatenate([part @ query for part in collection.parts if len(part)])
+        valid = collection.live
+        if where:
+            valid = valid & np.array([_match_where(metadata, where) for metadata in collection.metadatas])
+        if not valid.all():
+            scores = np.where(valid, scores, -np.inf)
+        n_results = min(n_results, int(valid.sum()))
+
+        if n_results <= 0:
+            top = np.array([], dtype=np.int64)
+        elif n_results < len(scores):
+            top = np.argpartition(-scores, n_results - 1)[:n_results]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+
+        return {
+            "ids": [[collection.ids[i] for i in top]],
+            "documents": [[collection.documents[i] for i in top]],
+            "metadatas": [[collection.metadatas[i] for i in top]],
+            "distances": [[float(1.0 - scores[i]) for i in top]]
+        }
+
+    def get_all(self, include_embeddings: bool = True) -> Dict:
+        """获取当前集合的全部有效数据；没有失效行且只有一段时embeddings为内存映射矩阵"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        self._refresh()
+        collection = self.collection
+        keep = np.flatnonzero(collection.live)
+        data = {
+            "ids": [collection.ids[i] for i in keep],
+            "documents": [collection.documents[i] for i in keep],
+            "metadatas": [collection.metadatas[i] for i in keep]
+        }
+        if include_embeddings:
+            runs = collection.live_runs()
+            if len(runs) == 1:
+                data["embeddings"] = runs[0]
+            elif runs:
+                data["embeddings"] = np.concatenate(runs)
+            else:
+                data["embeddings"] = np.zeros((0, 0), dtype=np.float32)
+        return data
+
+    def iter_documents(self, batch_size: Optional[int] = None) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        """分批读取当前集合的有效文档"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        self._refresh()
+        collection = self.collection
+        keep = np.flatnonzero(collection.live)
+        batch_size = batch_size or self.batch_size
+        for start in range(0, len(keep), batch_size):
+            rows = keep[start:start + batch_size]
+            yield ([collection.ids[i] for i in rows],
+                   [collection.documents[i] for i in rows],
+                   [collection.metadatas[i] for i in rows])
+
+    def list_ids(self) -> List[str]:
+        """获取当前集合的全部文档ID"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        self._refresh()
+        return list(self.collection.id_to_index)
+
+    def get_metadatas(self, ids: List[str]) -> Dict[str, Dict]:
+        """获取指定文档的元数据"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        self._refresh()
+        collection = self.collection
+        return {doc_id: collection.metadatas[collection.id_to_index[doc_id]]
+                for doc_id in ids if doc_id in collection.id_to_index}
+
+    def get_collection_info(self) -> Dict:
+        """获取集合信息"""
+        if not self.collection:
+            return {"error": "集合未初始化"}
+        self._refresh()
+        return {
+            "name": self.collection.name,
+            "document_count": self.collection.count(),
+            "metadata": self.collection.metadata,
+            "version": self.collection.version,
+            "segments": len(self.collection.segments),
+            "dead_rows": self.collection.rows - self.collection.count()
+        }
+
+    def update_document(self,
+                        id: str,
+                        document: str,
+                        embedding: np.ndarray,
+                        metadata: Optional[Dict] = None) -> None:
+        """
+        更新文档（写入只含该文档的增量段，覆盖旧行）
+
+        Args:
+            id: 文档ID
+            document: 新文档内容
+            embedding: 新向量
+            metadata: 新元数据
+        """
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        self._check_writable()
+        collection = self.collection
+        index = collection.id_to_index.get(id)
+        if index is None:
+            raise ValueError(f"文档不存在: {id}")
+
+        self._append_segment(self._normalize(embedding), [id], [document],
+                             [metadata or collection.metadatas[index]])
+        print(f"文档更新成功: {id}")
+
+    def delete_documents(self, ids: List[str]) -> None:
+        """
+        删除文档（写入只含墓碑的增量段）
+
+        Args:
+            ids: 要删除的文档ID列表
+        """
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        self._check_writable()
+        collection = self.collection
+        removed = list(dict.fromkeys(doc_id for doc_id in ids if doc_id in collection.id_to_index))
+        if removed:
+            self._append_segment(np.zeros((0, 0), dtype=np.float32), [], [], [], removed)
+        print(f"成功删除 {len(removed)} 个文档")
+
+    def delete_collection(self, name: str) -> None:
+        """
+        删除集合
+
+        先删除CURRENT使集合立即不可见，再删除目录；文件仍被占用（Windows上的内存映射）
+        无法删除时留下标记，之后打开可写向量库时重试。
+        """
+        if self.read_only:
+            raise ValueError("向量库以只读模式打开")
+        with self._lock:
+            self._handles.pop(name, None)
+        if self.collection is not None and self.collection.name == name:
+            self.collection = None
+        collection_dir = self._collection_dir(name)
+        try:
+            os.remove(self._current_path(name))
+        except FileNotFoundError:
+            pass
+        if os.path.isdir(collection_dir) and not _remove_tree(collection_dir):
+            with open(os.path.join(collection_dir, _DELETED_MARKER), 'w', encoding='utf-8'):
+                pass
+        print(f"集合删除成功: {name}")
+
+    def list_collections(self) -> List[str]:
+        """列出所有集合"""
+        return sorted(entry for entry in os.listdir(self.root)
+                      if os.path.exists(self._current_path(entry)))
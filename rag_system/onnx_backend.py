@@ -0,0 +1,230 @@
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 支持的推理后端
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+DEFAULT_ONNX_DIR = "./onnx_models"
+
+def _require_onnxruntime():
+    """导入onnxruntime，未安装时给出明确提示"""
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError("ONNX后端需要onnxruntime，请先安装: pip install onnxruntime")
+    return onnxruntime
+
+def _export_dir(model_name: str, onnx_dir: str) -> str:
+    """模型对应的ONNX导出目录"""
+    safe_name = re.sub(r'[^\w.-]+', '_', model_name.strip('/\\'))
+    return os.path.join(onnx_dir, safe_name)
+
+def export_to_onnx(model_name: str,
+                   kind: str,
+                   onnx_dir: str = DEFAULT_ONNX_DIR,
+                   quantize: bool = False) -> str:
+    """
+    导出模型为ONNX，可选动态int8量化；已导出的模型直接复用
+
+    Args:
+        model_name: 模型名称或本地模型路径
+        kind: "bi_encoder" 或 "cross_encoder"
+        onnx_dir: ONNX模型存储目录
+        quantize: 是否进行动态int8量化
+
+    Returns:
+        ONNX模型文件路径
+    """
+    export_dir = _export_dir(model_name, onnx_dir)
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    int8_path = os.path.join(export_dir, "model_int8.onnx")
+    target_path = int8_path if quantize else fp32_path
+    if os.path.exists(target_path):
+        return target_path
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+        print(f"🔄 正在导出ONNX模型: {model_name}")
+        os.makedirs(export_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if kind == "bi_encoder":
+            model = AutoModel.from_pretrained(model_name)
+            output_names = ["last_hidden_state"]
+        elif kind == "cross_encoder":
+            model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            output_names = ["logits"]
+        else:
+            raise ValueError(f"未知的模型类型: {kind}")
+        model.eval()
+
+        sample = tokenizer(["示例文本"], ["示例文本"] if kind == "cross_encoder" else None,
+                           return_tensors="pt")
+        input_names = list(sample.keys())
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes[output_names[0]] = {0: "batch"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        tokenizer.save_pretrained(export_dir)
+
+        # sentence-transformers的池化配置（bge默认使用CLS池化）
+        pooling = {"pooling_mode_cls_token": True}
+        pooling_config = os.path.join(model_name, "1_Pooling", "config.json")
+        if os.path.exists(pooling_config):
+            with open(pooling_config, "r", encoding="utf-8") as f:
+                pooling = json.load(f)
+        with open(os.path.join(export_dir, "backend_config.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "source_model": model_name,
+                "kind": kind,
+                "pooling": pooling,
+                "max_length": getattr(tokenizer, "model_max_length", 512),
+                "num_labels": getattr(model.config, "num_labels", 1)
+            }, f, ensure_ascii=False, indent=2)
+        print(f"✅ ONNX模型导出完成: {fp32_path}")
+
+    if quantize:
+        _require_onnxruntime()
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"🔄 正在进行动态int8量化: {fp32_path}")
+        # 超过2GB的模型（如bge-reranker-v2-m3）需要外部数据格式
+        large_model = os.path.getsize(fp32_path) > 1.8 * 1024 ** 3 or any(
+            name.endswith(".data") for name in os.listdir(export_dir)
+        )
+        quantize_dynamic(
+            fp32_path,
+            int8_path,
+            weight_type=QuantType.QInt8,
+            use_external_data_format=large_model
+        )
+        print(f"✅ 量化完成: {int8_path}")
+
+    return target_path
+
+class _OnnxModelBase:
+    """ONNX Runtime推理会话的公共部分"""
+
+    def __init__(self, model_name: str, kind: str, quantize: bool,
+                 onnx_dir: str, num_threads: Optional[int]):
+        ort = _require_onnxruntime()
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_path = export_to_onnx(model_name, kind, onnx_dir, quantize)
+        export_dir = os.path.dirname(self.model_path)
+        with open(os.path.join(export_dir, "backend_config.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {inp.name for inp in self.session.get_inputs()}
+
+    def _run(self, encoded: Dict) -> np.ndarray:
+        feeds = {name: np.asarray(value, dtype=np.int64)
+                 for name, value in encoded.items() if name in self.input_names}
+        return self.session.run(None, feeds)[0]
+
+class OnnxSentenceEncoder(_OnnxModelBase):
+    """ONNX Runtime版Bi-Encoder，接口与SentenceTransformer.encode保持一致"""
+
+    def __init__(self, model_name: str, quantize: bool = False,
+                 onnx_dir: str = DEFAULT_ONNX_DIR, num_threads: Optional[int] = None):
+        super().__init__(model_name, "bi_encoder", quantize, onnx_dir, num_threads)
+        self.max_seq_length = min(int(self.config.get("max_length", 512)), 512)
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        """
+        编码文本，返回numpy数组（convert_to_tensor等参数被忽略）
+        
+        与SentenceTransformer.encode一致，先按文本长度排序再组批以减少padding，输出保持原始顺序
+
+        Args:
+            sentences: 文本或文本列表
+            batch_size: 批处理大小
+            normalize_embeddings: 是否L2归一化
+
+        Returns:
+            向量数组；输入为单个文本时返回一维向量
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        pooling = self.config.get("pooling", {})
+
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            hidden = self._run(encoded)
+            if pooling.get("pooling_mode_mean_tokens"):
+                mask = encoded["attention_mask"][..., None].astype(np.float32)
+                embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            else:
+                embeddings = hidden[:, 0]
+            outputs.append(embeddings.astype(np.float32))
+
+        if outputs:
+            embeddings = np.empty((len(texts), outputs[0].shape[1]), dtype=np.float32)
+            embeddings[order] = np.vstack(outputs)
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+class OnnxCrossEncoder(_OnnxModelBase):
+    """ONNX Runtime版Cross-Encoder，接口与CrossEncoder.predict保持一致"""
+
+    def __init__(self, model_name: str, quantize: bool = False,
+                 onnx_dir: str = DEFAULT_ONNX_DIR, num_threads: Optional[int] = None):
+        super().__init__(model_name, "cross_encoder", quantize, onnx_dir, num_threads)
+        self.max_length = min(int(self.config.get("max_length", 512)), 512)
+
+    def predict(self, sentences: List[Tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        对查询-文档对打分
+
+        Args:
+            sentences: 查询-文档对列表
+            batch_size: 批处理大小
+
+        Returns:
+            分数数组（单标签模型与CrossEncoder一致，经过sigmoid）
+        """
+        scores = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            encoded = self.tokenizer([q for q, _ in batch], [d for _, d in batch],
+                                     padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="np")
+            logits = self._run(encoded)
+            if self.config.get("num_labels", 1) == 1:
+                scores.append(1.0 / (1.0 + np.exp(-logits[:, 0])))
+            else:
+                scores.append(logits)
+        if not scores:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(scores).astype(np.float32)
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from .build_manifest import BuildManifest
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self,
+                 name: str,
+                 fn: Callable[..., Any],
+                 deps: Optional[List[str]] = None,
+                 files: Optional[Callable[[], List[str]]] = None,
+                 params: Optional[Dict] = None,
+                 check: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            name: 阶段名称
+            fn: 阶段函数，按deps顺序接收上游阶段的产物，返回本阶段产物（需可pickle）
+            deps: 依赖的上游阶段名称
+            files: 返回本阶段读取的外部文件列表的函数（文件内容参与缓存键）
+            params: 影响产物的参数（参与缓存键）
+            check: 命中缓存时额外检查外部副作用是否仍然有效（如索引文件是否存在）
+        """
+        self.name = name
+        self.fn = fn
+        self.deps = deps or []
+        self.files = files
+        self.params = params or {}
+        self.check = check
+
+
+class ArtifactStore:
+    """
+    内容寻址的产物存储
+
+    objects/<产物哈希>.pkl 保存产物本身，同样的内容只存一份；
+    index/<阶段键>.json 记录某个阶段在给定输入下产出的产物哈希。
+    两者都先写临时文件再原子替换，中断时不会留下半写的产物。
+    """
+
+    def __init__(self, root: str = "./pipeline_cache"):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "index"), exist_ok=True)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", f"{digest}.pkl")
+
+    def _index_path(self, stage_key: str) -> str:
+        return os.path.join(self.root, "index", f"{stage_key}.json")
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, stage_key: str) -> Optional[str]:
+        """查找阶段键对应的产物哈希，产物文件缺失时视为未命中"""
+        try:
+            with open(self._index_path(stage_key), 'r', encoding='utf-8') as f:
+                digest = json.load(f)["artifact"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return digest if os.path.exists(self._object_path(digest)) else None
+
+    def load(self, digest: str) -> Any:
+        with open(self._object_path(digest), 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, stage_key: str, stage_name: str, value: Any) -> str:
+        """保存产物并记录阶段键，返回产物哈希"""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(data).hexdigest()[:24]
+        if not os.path.exists(self._object_path(digest)):
+            self._atomic_write(self._object_path(digest), data)
+        record = {"artifact": digest, "stage": stage_name, "created_at": time.time()}
+        self._atomic_write(self._index_path(stage_key), json.dumps(record).encode('utf-8'))
+        return digest
+
+
+class Pipeline:
+    """
+    分阶段、可缓存的构建流水线
+
+    阶段键由阶段名、参数、外部文件内容哈希和上游产物哈希共同决定：
+    上游重新执行但产物不变时，下游仍然命中缓存。依赖都已完成的阶段在线程池中并发执行，
+    每个阶段完成后立即持久化，中断后重新运行只会执行尚未完成的阶段。
+    """
+
+    def __init__(self, stages: List[Stage], cache_dir: str = "./pipeline_cache", max_workers: int = 4):
+        """
+        Args:
+            stages: 阶段列表
+            cache_dir: 产物缓存目录
+            max_workers: 最大并发阶段数
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖未知阶段 {dep}")
+        self.store = ArtifactStore(cache_dir)
+        self.file_hashes = BuildManifest(os.path.join(cache_dir, "file_hashes.json"))
+        self.max_workers = max_workers
+        self._artifacts: Dict[str, str] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _stage_key(self, stage: Stage) -> str:
+        files = stage.files() if stage.files else []
+        payload = {
+            "stage": stage.name,
+            "params": stage.params,
+            "files": {os.path.normpath(path): self.file_hashes.file_hash(path) for path in files},
+            "deps": [self._artifacts[dep] for dep in stage.deps]
+        }
+        return hashlib.sha256(
+            json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()[:24]
+
+    def _artifact(self, name: str) -> Any:
+        """按需加载上游产物（同一产物只加载一次）"""
+        with self._lock:
+            if name not in self._loaded:
+                self._loaded[name] = self.store.load(self._artifacts[name])
+            return self._loaded[name]
+
+    def _run_stage(self, stage: Stage, force: bool) -> Dict:
+        start = time.perf_counter()
+        stage_key = self._stage_key(stage)
+        digest = None if force else self.store.lookup(stage_key)
+        if digest is not None and (stage.check is None or stage.check()):
+            self._artifacts[stage.name] = digest
+            return {"stage": stage.name, "status": "cached", "seconds": time.perf_counter() - start}
+
+        inputs = [self._artifact(dep) for dep in stage.deps]
+        value = stage.fn(*inputs)
+        digest = self.store.save(stage_key, stage.name, value)
+        with self._lock:
+            self._loaded[stage.name] = value
+        self._artifacts[stage.name] = digest
+        return {"stage": stage.name, "status": "ran", "seconds": time.perf_counter() - start}
+
+    def run(self, force: Optional[List[str]] = None) -> List[Dict]:
+        """
+        执行流水线
+
+        Args:
+            force: 忽略缓存强制执行的阶段名称
+
+        Returns:
+            每个阶段的执行记录：stage、status（cached/ran）、seconds
+        """
+        force = set(force or [])
+        pending = dict(self.stages)
+        done = set()
+        report = []
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline") as pool:
+            running = {}
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in done for dep in stage.deps):
+                        print(f"▶️ 阶段开始: {name}")
+                        running[pool.submit(self._run_stage, stage, name in force)] = name
+                        del pending[name]
+                if not running:
+                    raise RuntimeError(f"存在循环依赖: {sorted(pending)}")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    result = future.result()
+                    done.add(name)
+                    report.append(result)
+                    label = "命中缓存" if result["status"] == "cached" else "完成"
+                    print(f"✅ 阶段{label}: {name}，耗时 {result['seconds']:.2f} 秒")
+
+        self.file_hashes.save()
+        report.append({"stage": "total", "status": "-", "seconds": time.perf_counter() - started})
+        return report
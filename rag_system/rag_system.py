@@ -1,7 +1,14 @@
 from .vectorizer import AdvancedRAGVectorizer
-from .vector_db import ChromaVectorDB
-from .data_processor import DataProcessor
+from .semantic_cache import SemanticCache
+from .bm25_index import BM25Index, bm25_index_path, reciprocal_rank_fusion
+from .document_ids import iter_document_ids
+from .collection_aliases import CollectionAliases, versioned_collection_name
+from .vector_db import CollectionNotFoundError
 import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 
 class RAGSystem:
@@ -10,7 +17,21 @@ class RAGSystem:
     def __init__(self, 
                  bi_encoder_model="BAAI/bge-small-zh-v1.5",
                  cross_encoder_model="BAAI/bge-reranker-v2-m3",
-                 persist_directory="./vector_db"):
+                 persist_directory="./vector_db",
+                 embedding_cache_dir="./embedding_cache",
+                 micro_batching=False,
+                 max_batch_size=32,
+                 max_batch_wait_ms=5.0,
+                 inference_backend="torch",
+                 semantic_cache=False,
+                 semantic_cache_threshold=0.98,
+                 semantic_cache_size=1000,
+                 semantic_cache_ttl=3600,
+                 hybrid_retrieval=False,
+                 rerank_candidates=10,
+                 rrf_k=60,
+                 vector_backend="chroma",
+                 index_params: Optional[Dict] = None):
         """
         初始化RAG系统
         
@@ -18,43 +39,282 @@ class RAGSystem:
             bi_encoder_model: Bi-Encoder模型名称
             cross_encoder_model: Cross-Encoder模型名称
             persist_directory: 向量数据库存储目录
+            embedding_cache_dir: 文档向量缓存目录，为None时不启用缓存
+            micro_batching: 是否合并并发查询的编码和重排调用
+            max_batch_size: 微批最大条目数
+            max_batch_wait_ms: 微批收集的最长等待时间（毫秒）
+            inference_backend: 推理后端，"torch"（PyTorch fp32）、"onnx"（ONNX Runtime fp32）
+                或 "onnx-int8"（ONNX Runtime动态int8量化）
+            semantic_cache: 是否启用语义查询缓存；默认关闭，措辞相近但含义不同的问题
+                （如不同专业、不同年份）可能命中同一条缓存
+            semantic_cache_threshold: 语义缓存命中所需的最小余弦相似度
+            semantic_cache_size: 语义缓存最大条目数
+            semantic_cache_ttl: 语义缓存条目存活时间（秒），None表示不过期
+            hybrid_retrieval: 是否并行执行向量检索和BM25检索并用RRF融合；默认关闭，
+                启用前先用 scripts/hybrid_recall_check.py 确认召回不低于纯向量检索
+            rerank_candidates: 混合检索时交给Cross-Encoder重排的候选数量上限
+            rrf_k: 倒数排名融合的平滑常数
+            vector_backend: 向量存储后端，"chroma"（ChromaDB）或 "numpy"（内存映射的NumPy扁平索引）
+            index_params: 创建集合时的HNSW参数，如 {"M": 32, "ef_construction": 200, "ef_search": 64}
         """
-        self.vectorizer = AdvancedRAGVectorizer(bi_encoder_model, cross_encoder_model)
-        self.vector_db = ChromaVectorDB(persist_directory)
-        self.data_processor = DataProcessor()
+        self.vectorizer = AdvancedRAGVectorizer(
+            bi_encoder_model,
+            cross_encoder_model,
+            embedding_cache_dir=embedding_cache_dir,
+            inference_backend=inference_backend
+        )
+        if micro_batching:
+            self.vectorizer.bi_encoder.enable_micro_batching(max_batch_size, max_batch_wait_ms)
+            self.vectorizer.cross_encoder.enable_micro_batching(max_batch_size * 2, max_batch_wait_ms)
+        
+        self.semantic_cache = None
+        if semantic_cache:
+            self.semantic_cache = SemanticCache(
+                similarity_threshold=semantic_cache_threshold,
+                max_entries=semantic_cache_size,
+                ttl_seconds=semantic_cache_ttl
+            )
+        
+        self.hybrid_retrieval = hybrid_retrieval
+        self.rerank_candidates = rerank_candidates
+        self.rrf_k = rrf_k
+        # 集合名 -> (索引文件修改时间, BM25索引)
+        self._bm25_indexes: Dict[str, tuple] = {}
+        self._bm25_lock = threading.Lock()
+        self._retrieval_pool = None
+        
+        # 向量数据库和数据处理器在首次使用时才创建（chromadb、pandas导入较慢）
+        self.persist_directory = persist_directory
+        self.vector_backend = vector_backend
+        self.index_params = index_params or {}
+        # 查询使用的集合名可以是别名，指向零停机重建生成的版本集合
+        self.aliases = CollectionAliases(persist_directory)
+        self._vector_db = None
+        self._data_processor = None
+        self._init_lock = threading.Lock()
+        
+        self.created_at = time.time()
+        self.ready_at = None
+        self.warm_up_error = None
+        self._warm_up_thread = None
         print("RAG系统初始化完成")
     
+    @property
+    def vector_db(self):
+        """向量数据库，首次访问时创建"""
+        if self._vector_db is None:
+            with self._init_lock:
+                if self._vector_db is None:
+                    from .vector_db import create_vector_db
+                    self._vector_db = create_vector_db(self.vector_backend, self.persist_directory)
+        return self._vector_db
+    
+    @property
+    def data_processor(self):
+        """数据处理器，首次访问时创建"""
+        if self._data_processor is None:
+            with self._init_lock:
+                if self._data_processor is None:
+                    from .data_processor import DataProcessor
+                    self._data_processor = DataProcessor()
+        return self._data_processor
+    
+    @property
+    def is_ready(self) -> bool:
+        """模型和向量数据库是否均已加载"""
+        return (self.vectorizer.bi_encoder.is_loaded
+                and self.vectorizer.cross_encoder.is_loaded
+                and self._vector_db is not None)
+    
+    def warm_up(self, background: bool = True) -> None:
+        """
+        预加载模型和向量数据库
+        
+        Args:
+            background: 是否在后台线程中执行，不阻塞服务启动
+        """
+        if background:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(
+                    target=self._warm_up, name="rag-warm-up", daemon=True
+                )
+                self._warm_up_thread.start()
+            return
+        self._warm_up()
+    
+    def _warm_up(self) -> None:
+        """依次加载各组件并记录就绪时间"""
+        try:
+            print("开始预热RAG系统...")
+            self.vectorizer.bi_encoder.load()
+            self.vectorizer.cross_encoder.load()
+            _ = self.vector_db
+            self.ready_at = time.time()
+            print(f"RAG系统预热完成，耗时 {self.ready_at - self.created_at:.2f} 秒")
+        except Exception as e:
+            self.warm_up_error = str(e)
+            print(f"RAG系统预热失败: {e}")
+    
+    def get_readiness(self) -> Dict:
+        """获取就绪状态和各组件加载耗时"""
+        bi_encoder = self.vectorizer.bi_encoder
+        cross_encoder = self.vectorizer.cross_encoder
+        return {
+            "ready": self.is_ready,
+            "components": {
+                "bi_encoder": {"loaded": bi_encoder.is_loaded, "load_seconds": bi_encoder.load_seconds},
+                "cross_encoder": {"loaded": cross_encoder.is_loaded, "load_seconds": cross_encoder.load_seconds},
+                "vector_db": {"loaded": self._vector_db is not None}
+            },
+            "init_to_ready_seconds": self.ready_at - self.created_at if self.ready_at else None,
+            "error": self.warm_up_error
+        }
+    
     def build_knowledge_base(self, 
                            student_csv: str = None, 
                            plan_txt: str = None,
-                           collection_name: str = "student_knowledge") -> None:
+                           collection_name: str = "student_knowledge",
+                           encode_workers: Optional[int] = None) -> Optional[Dict]:
         """
-        构建知识库
+        构建知识库（增量、流水线式）
+        
+        文档ID由 (来源文件, 行/章节键, 内容哈希) 确定，重复构建时只编码写入
+        新增或修改过的文档，并删除源数据中已不存在的文档。分块、编码和写入
+        在不同线程中并发执行（见VectorDB.sync_records），总耗时接近最慢的阶段。
         
         Args:
             student_csv: 学生数据CSV文件路径
             plan_txt: 培养方案文本文件路径
             collection_name: 集合名称
+            encode_workers: 多进程编码的进程数，None或1表示在当前进程编码
+            
+        Returns:
+            构建报告：added、updated、unchanged、removed、total、seconds、stages
         """
         print("开始构建知识库...")
         
-        # 处理数据
-        documents, metadatas = self.data_processor.process_mixed_data(student_csv, plan_txt)
+        # 边分块边编码边写入，只有变化的文档会被编码，在途数据量只与批量大小有关
+        print("开始增量向量化并存储到向量数据库...")
+        collection_name = self.resolve_collection(collection_name)
+        self.vector_db.get_or_create_collection(collection_name, **self.index_params)
+        records = iter_document_ids(self.data_processor.iter_mixed_data(student_csv, plan_txt))
+        with self._build_encoder(encode_workers) as encode_batch_size:
+            report = self.vector_db.sync_records(records, self.vectorizer.bi_encoder.encode_texts,
+                                                 encode_batch_size=encode_batch_size)
         
-        if not documents:
+        if not report["total"]:
             print("没有找到有效数据")
             return
         
-        # 向量化文档
-        print("开始向量化文档...")
-        embeddings = self.vectorizer.bi_encoder.encode_texts(documents)
+        changed = report["added"] + report["updated"] + report["removed"]
+        if changed or self._get_bm25_index(collection_name) is None:
+            self._rebuild_bm25_index(collection_name)
+        if changed:
+            self._invalidate_semantic_cache(collection_name)
+        
+        print(f"知识库构建完成，共 {report['total']} 个文档")
+        return report
+    
+    def build_knowledge_base_version(self,
+                                     student_csv: str = None,
+                                     plan_txt: str = None,
+                                     collection_name: str = "student_knowledge",
+                                     encode_workers: Optional[int] = None,
+                                     job=None,
+                                     keep_previous: int = 1) -> Dict:
+        """
+        在新的版本集合中完整构建知识库，完成后原子切换别名（零停机重建）
+        
+        构建期间查询继续读取别名指向的旧版本；新版本写完并建好BM25索引后才切换别名，
+        失败或取消时删除未完成的新版本。向量来自向量缓存，未变化的文档不会重新编码。
+        
+        Args:
+            student_csv: 学生数据CSV文件路径
+            plan_txt: 培养方案文本文件路径
+            collection_name: 别名（查询使用的集合名）
+            encode_workers: 多进程编码的进程数
+            job: 后台任务（build_jobs.BuildJob），用于回报进度和响应取消
+            keep_previous: 切换后保留的旧版本数量
+            
+        Returns:
+            构建报告，另含collection（新版本）、previous（旧版本）和expired（已删除的版本）
+        """
+        from .vector_db import create_vector_db
+        
+        version = versioned_collection_name(collection_name)
+        previous = self.resolve_collection(collection_name)
+        progress = job.update_progress if job is not None else (lambda **_: None)
+        check_cancelled = job.check_cancelled if job is not None else (lambda: None)
+        counts = {"documents": 0, "encoded": 0}
+        
+        def records():
+            for record in iter_document_ids(self.data_processor.iter_mixed_data(student_csv, plan_txt)):
+                check_cancelled()
+                counts["documents"] += 1
+                if counts["documents"] % 100 == 0:
+                    progress(documents=counts["documents"])
+                yield record
         
-        # 存储到向量数据库
-        print("存储到向量数据库...")
-        self.vector_db.get_or_create_collection(collection_name)
-        self.vector_db.add_documents(documents, embeddings, metadatas)
+        def encode(texts):
+            check_cancelled()
+            embeddings = self.vectorizer.bi_encoder.encode_texts(texts)
+            counts["encoded"] += len(texts)
+            progress(encoded=counts["encoded"])
+            return embeddings
         
-        print(f"知识库构建完成，共 {len(documents)} 个文档")
+        # 独立的向量库实例，不改变查询所用实例的当前集合
+        print(f"开始构建新版本集合: {version}（当前版本: {previous}）")
+        build_db = create_vector_db(self.vector_backend, self.persist_directory)
+        try:
+            build_db.create_collection(version, **self.index_params)
+            progress(stage="encoding", collection=version, previous=previous)
+            with self._build_encoder(encode_workers) as encode_batch_size:
+                report = build_db.sync_records(records(), encode, encode_batch_size=encode_batch_size)
+            progress(documents=counts["documents"])
+            if not report["total"]:
+                raise ValueError("没有找到有效数据")
+            
+            check_cancelled()
+            progress(stage="indexing")
+            self._rebuild_bm25_index(version, build_db)
+            
+            check_cancelled()
+            progress(stage="swapping")
+            expired = self.aliases.swap(collection_name, version, keep_previous)
+        except BaseException:
+            print(f"构建未完成，删除新版本集合: {version}")
+            self._drop_collection(build_db, version)
+            raise
+        
+        print(f"别名 {collection_name} 已切换到 {version}")
+        self._invalidate_semantic_cache(previous)
+        for name in expired:
+            self._drop_collection(build_db, name)
+        progress(stage="done")
+        report.update(collection=version, previous=previous, expired=expired)
+        return report
+    
+    @contextmanager
+    def _build_encoder(self, encode_workers: Optional[int]):
+        """构建期间按需启用多进程编码，产出每次编码的文本数（None表示使用写入批量）"""
+        if encode_workers and encode_workers > 1:
+            with self.vectorizer.bi_encoder.multiprocess(encode_workers) as encoder:
+                # 每次编码的文本数足以让所有工作进程各拿到两个分片
+                yield encoder.num_workers * encoder.shard_size * 2 if encoder else None
+        else:
+            yield None
+    
+    def _drop_collection(self, vector_db, collection_name: str) -> None:
+        """删除版本集合及其BM25索引，集合不存在时忽略"""
+        try:
+            vector_db.delete_collection(collection_name)
+        except Exception as e:
+            print(f"删除集合 {collection_name} 失败: {e}")
+        self._remove_bm25_index(collection_name)
+    
+    def resolve_collection(self, collection_name: str) -> str:
+        """把别名解析为实际提供服务的集合名"""
+        return self.aliases.resolve(collection_name)
     
     def query(self, 
               question: str, 
@@ -74,19 +334,58 @@ class RAGSystem:
             查询结果字典
         """
         print(f"执行RAG查询: {question}")
+        start_time = time.perf_counter()
         
-        # 确保集合存在
-        self.vector_db.get_or_create_collection(collection_name)
+        # 别名在查询开始时解析一次，重建切换别名不影响进行中的查询
+        alias = collection_name
+        collection_name = self.resolve_collection(alias)
         
-        # 第一步：从向量数据库检索候选文档
-        print("第一步：向量数据库检索...")
-        search_results = self.vector_db.search_by_text(
-            question, 
-            self.vectorizer.bi_encoder, 
-            top_k_retrieve
+        # 每次查询使用自己的只读集合句柄，不切换共享的当前集合，也不会重新创建已被删除的版本
+        collection_name, collection = self._open_query_collection(alias, collection_name)
+        if collection is None:
+            return {
+                "question": question,
+                "answer": "抱歉，没有找到相关信息。",
+                "relevant_docs": [],
+                "scores": []
+            }
+        
+        # 查询向量只编码一次，同时用于语义缓存和向量检索
+        query_embedding = self.vectorizer.bi_encoder.encode_single(question)
+        
+        bm25_index = self._get_bm25_index(collection_name, collection) if self.hybrid_retrieval else None
+        
+        # 集合ID在集合被删除重建后会变化，旧缓存自然不再命中
+        cache_namespace = (
+            collection_name,
+            getattr(collection, 'id', None),
+            top_k_retrieve,
+            top_k_final,
+            bm25_index is not None
         )
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(query_embedding, cache_namespace)
+            if cached is not None:
+                print(f"语义缓存命中，相似度 {cached['cache_similarity']:.4f}")
+                cached["question"] = question
+                cached["answer"] = self.generate_answer(question, cached["context"])
+                cached["cache_hit"] = True
+                return cached
+        
+        # 第一步：检索候选文档
+        if bm25_index is None:
+            print("第一步：向量数据库检索...")
+            search_results = self.vector_db.search(
+                query_embedding, top_k_retrieve, collection=collection
+            )
+            candidate_docs = search_results['documents'][0] if search_results['documents'] else []
+        else:
+            print("第一步：向量检索 + BM25检索（RRF融合）...")
+            candidate_docs = self._hybrid_retrieve(
+                question, query_embedding, bm25_index, top_k_retrieve, top_k_final, collection
+            )
         
-        if not search_results['documents']:
+        if not candidate_docs:
             return {
                 "question": question,
                 "answer": "抱歉，没有找到相关信息。",
@@ -94,8 +393,6 @@ class RAGSystem:
                 "scores": []
             }
         
-        candidate_docs = search_results['documents'][0]
-        
         # 第二步：Cross-Encoder重排
         print("第二步：Cross-Encoder重排...")
         final_results = self.vectorizer.cross_encoder.rerank(
@@ -110,13 +407,165 @@ class RAGSystem:
         # 生成回答（这里可以集成LLM）
         answer = self.generate_answer(question, context)
         
-        return {
+        result = {
             "question": question,
             "answer": answer,
             "relevant_docs": [result['document'] for result in final_results],
             "scores": [result['score'] for result in final_results],
             "context": context
         }
+        
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(
+                query_embedding, cache_namespace, result, time.perf_counter() - start_time
+            )
+        return result
+    
+    def _open_query_collection(self, alias: str, collection_name: str):
+        """
+        只读地打开查询使用的集合
+        
+        解析出的版本在解析后被重建清理删除时，重新解析一次别名；仍不存在则放弃，
+        绝不在查询路径上创建集合。
+        
+        Args:
+            alias: 查询传入的集合名或别名
+            collection_name: 已解析的集合名
+            
+        Returns:
+            (集合名, 集合句柄)，集合不存在时句柄为None
+        """
+        try:
+            return collection_name, self.vector_db.open_collection(collection_name)
+        except CollectionNotFoundError:
+            pass
+        resolved = self.resolve_collection(alias)
+        if resolved != collection_name:
+            try:
+                return resolved, self.vector_db.open_collection(resolved)
+            except CollectionNotFoundError:
+                pass
+        print(f"集合不存在: {resolved}")
+        return resolved, None
+    
+    def _hybrid_retrieve(self,
+                         question: str,
+                         query_embedding,
+                         bm25_index: BM25Index,
+                         top_k_retrieve: int,
+                         top_k_final: int,
+                         collection=None) -> List[str]:
+        """
+        并行执行向量检索和BM25检索，按倒数排名融合后截取重排候选
+        
+        Args:
+            question: 用户问题
+            query_embedding: 查询向量
+            bm25_index: 集合对应的BM25索引
+            top_k_retrieve: 每个检索器返回的候选数量
+            top_k_final: 最终结果数量，交给重排的候选不少于该数量
+            collection: 集合句柄，None表示当前集合
+            
+        Returns:
+            融合后的候选文档列表
+        """
+        if self._retrieval_pool is None:
+            with self._init_lock:
+                if self._retrieval_pool is None:
+                    self._retrieval_pool = ThreadPoolExecutor(
+                        max_workers=4, thread_name_prefix="rag-dense-retrieve"
+                    )
+        dense_future = self._retrieval_pool.submit(
+            self.vector_db.search, query_embedding, top_k_retrieve, collection=collection
+        )
+        sparse_hits = bm25_index.search(question, top_k_retrieve)
+        dense_results = dense_future.result()
+        
+        documents = {hit["id"]: hit["document"] for hit in sparse_hits}
+        dense_ids = []
+        if dense_results['ids']:
+            dense_ids = dense_results['ids'][0]
+            documents.update(zip(dense_ids, dense_results['documents'][0]))
+        
+        fused = reciprocal_rank_fusion(
+            [dense_ids, [hit["id"] for hit in sparse_hits]], k=self.rrf_k
+        )
+        limit = max(top_k_final, min(top_k_retrieve, self.rerank_candidates))
+        return [documents[doc_id] for doc_id, _ in fused[:limit]]
+    
+    def _get_bm25_index(self, collection_name: str, collection=None) -> Optional[BM25Index]:
+        """
+        获取集合对应的BM25索引
+        
+        索引文件被其他进程重建后按修改时间重新加载；索引记录的集合ID
+        与集合句柄（None表示当前集合）不一致（集合在别处被重建）时视为过期，退回纯向量检索。
+        """
+        path = bm25_index_path(self.persist_directory, collection_name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        
+        with self._bm25_lock:
+            cached = self._bm25_indexes.get(collection_name)
+            if cached is None or cached[0] != mtime:
+                try:
+                    cached = (mtime, BM25Index.load(path))
+                except Exception as e:
+                    print(f"加载BM25索引失败: {e}")
+                    return None
+                self._bm25_indexes[collection_name] = cached
+        
+        index = cached[1]
+        if collection is None:
+            collection = self.vector_db.collection
+        collection_id = getattr(collection, 'id', None)
+        if index.collection_id is not None and index.collection_id != str(collection_id):
+            return None
+        return index
+    
+    def _rebuild_bm25_index(self, collection_name: str, vector_db=None) -> None:
+        """
+        根据向量数据库集合的当前内容重建并保存BM25索引（vector_db默认为查询所用实例）
+        
+        无论是否开启混合检索都会构建，hybrid_retrieval只控制查询时是否融合；
+        文档按批读取，不一次性加载整个集合。
+        """
+        vector_db = vector_db or self.vector_db
+        index = BM25Index()
+        index.collection_id = str(vector_db.collection.id)
+        for ids, documents, metadatas in vector_db.iter_documents():
+            index.add_documents(ids, documents, metadatas)
+        path = bm25_index_path(self.persist_directory, collection_name)
+        index.save(path)
+        with self._bm25_lock:
+            self._bm25_indexes[collection_name] = (os.path.getmtime(path), index)
+    
+    def _remove_bm25_index(self, collection_name: str) -> None:
+        """删除集合对应的BM25索引"""
+        with self._bm25_lock:
+            self._bm25_indexes.pop(collection_name, None)
+        path = bm25_index_path(self.persist_directory, collection_name)
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def _invalidate_semantic_cache(self, collection_name: Optional[str] = None) -> None:
+        """集合内容变化后清除对应的语义缓存"""
+        if self.semantic_cache is None:
+            return
+        removed = self.semantic_cache.invalidate(
+            None if collection_name is None else lambda namespace: namespace[0] == collection_name
+        )
+        if removed:
+            print(f"已清除 {removed} 条语义缓存")
+    
+    def get_semantic_cache_stats(self) -> Dict:
+        """获取语义缓存命中率和节省的延迟"""
+        if self.semantic_cache is None:
+            return {"enabled": False}
+        stats = self.semantic_cache.get_stats()
+        stats["enabled"] = True
+        return stats
     
     def generate_answer(self, question: str, context: str) -> str:
         """
@@ -133,9 +582,18 @@ class RAGSystem:
         # 目前返回简化版本
         return f"基于检索到的信息，我可以为您提供以下回答：\n\n{context}\n\n这些信息应该能够回答您的问题：{question}"
     
+    def get_batching_stats(self) -> Dict:
+        """获取微批调度器的批大小和排队等待时间直方图"""
+        stats = {}
+        for name, component in (("bi_encoder", self.vectorizer.bi_encoder),
+                                ("cross_encoder", self.vectorizer.cross_encoder)):
+            if component.batcher is not None:
+                stats[name] = component.batcher.get_stats()
+        return stats
+    
     def get_knowledge_base_info(self, collection_name: str = "student_knowledge") -> Dict:
         """获取知识库信息"""
-        self.vector_db.get_or_create_collection(collection_name)
+        self.vector_db.get_or_create_collection(self.resolve_collection(collection_name), **self.index_params)
         return self.vector_db.get_collection_info()
     
     def search_similar_documents(self, 
@@ -143,7 +601,7 @@ class RAGSystem:
                                 n_results: int = 5,
                                 collection_name: str = "student_knowledge") -> Dict:
         """搜索相似文档"""
-        self.vector_db.get_or_create_collection(collection_name)
+        self.vector_db.get_or_create_collection(self.resolve_collection(collection_name), **self.index_params)
         return self.vector_db.search_by_text(
             query, 
             self.vectorizer.bi_encoder, 
@@ -154,17 +612,32 @@ class RAGSystem:
                              export_path: str, 
                              collection_name: str = "student_knowledge") -> None:
         """导出知识库"""
-        self.vector_db.get_or_create_collection(collection_name)
+        self.vector_db.get_or_create_collection(self.resolve_collection(collection_name), **self.index_params)
         self.vector_db.export_collection(export_path)
     
     def import_knowledge_base(self, import_path: str) -> None:
         """导入知识库"""
         self.vector_db.import_collection(import_path)
+        self._rebuild_bm25_index(self.vector_db.collection.name)
+        self._invalidate_semantic_cache()
     
     def delete_knowledge_base(self, collection_name: str) -> None:
-        """删除知识库"""
-        self.vector_db.delete_collection(collection_name)
+        """删除知识库（别名连同其指向的各版本集合一起删除）"""
+        names = [collection_name]
+        if collection_name in self.aliases.get_all():
+            # 别名同名的未版本化集合不在历史中，一并删除
+            names += self.aliases.remove(collection_name)
+        for name in names:
+            self._drop_collection(self.vector_db, name)
+            self._invalidate_semantic_cache(name)
     
     def list_knowledge_bases(self) -> List[str]:
         """列出所有知识库"""
-        return self.vector_db.list_collections() 
\ No newline at end of file
+        return self.vector_db.list_collections()
+    
+    def close(self) -> None:
+        """释放模型引用和后台线程，共享模型在没有其他使用者时才会被淘汰"""
+        self.vectorizer.close()
+        if self._retrieval_pool is not None:
+            self._retrieval_pool.shutdown(wait=False)
+            self._retrieval_pool = None
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_question(question: str) -> str:
+    """问题归一化：全角转半角、合并空白、忽略大小写，用于判断两个请求是否相同"""
+    return " ".join(unicodedata.normalize("NFKC", question).split()).lower()
+
+
+class SingleFlight:
+    """
+    并发请求合并（single-flight）
+
+    同一个键同时只执行一次调用：第一个请求发起调用，调用结束前到达的相同请求
+    等待并共享同一个结果（或同一个异常）。调用在独立的任务中执行，
+    发起者断开连接不会取消其他等待者依赖的调用。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行调用或加入正在进行的相同调用
+
+        Args:
+            key: 请求键
+            fn: 无参数的协程函数
+
+        Returns:
+            调用结果（所有等待者共享同一个对象，需要修改时由调用方复制）
+        """
+        return (await self.run(key, fn))[0]
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        同do，另外返回本次调用是否加入了其他请求发起的调用
+
+        Returns:
+            (调用结果, 是否为共享结果)
+        """
+        with self._lock:
+            task = self._calls.get(key)
+            shared = task is not None
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._calls[key] = task
+                task.add_done_callback(lambda done, key=key: self._finished(key, done))
+                self.executed += 1
+            else:
+                self.shared += 1
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+        # 所有等待者都已取消时，避免"异常未被获取"的警告
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total = self.executed + self.shared
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "shared": self.shared,
+                "shared_rate": self.shared / total if total else 0.0
+            }
+
+
+class ResponseCache:
+    """
+    有界TTL响应缓存
+
+    按精确的请求键缓存完整响应，按LRU和TTL淘汰。只应缓存确定性（低温度）的生成结果。
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 300.0):
+        """
+        Args:
+            max_entries: 最大缓存条目数
+            ttl_seconds: 条目存活时间（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.purged = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        查找缓存
+
+        Returns:
+            未过期的缓存值，否则返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def purge(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        清除缓存
+
+        Args:
+            predicate: 键过滤函数，返回True的条目被清除；None表示全部清除
+
+        Returns:
+            清除的条目数
+        """
+        with self._lock:
+            targets = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in targets:
+                del self._entries[key]
+            self.purged += len(targets)
+        return len(targets)
+
+    def get_stats(self) -> Dict:
+        """获取命中率和淘汰统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "purged": self.purged
+            }
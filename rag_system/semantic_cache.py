@@ -0,0 +1,174 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    语义查询缓存
+
+    以查询向量为键：新问题与某个已缓存问题的余弦相似度不低于阈值时，
+    直接返回缓存的重排结果，跳过向量检索和Cross-Encoder重排。
+    缓存条目按命名空间（集合、检索参数等）隔离，按LRU和TTL淘汰。
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = 0.98,
+                 max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = 3600):
+        """
+        初始化语义缓存
+
+        Args:
+            similarity_threshold: 命中所需的最小余弦相似度
+            max_entries: 最大缓存条目数
+            ttl_seconds: 条目存活时间（秒），None表示不过期
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        # 按命名空间缓存的向量矩阵，条目变化时置空重建
+        self._matrices: Dict[Hashable, tuple] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _expire(self, now: float) -> None:
+        """移除过期条目（调用方持有锁）"""
+        if self.ttl_seconds is None:
+            return
+        expired = [entry_id for entry_id, entry in self._entries.items()
+                   if now - entry["created_at"] > self.ttl_seconds]
+        for entry_id in expired:
+            self._remove(entry_id)
+            self.evictions += 1
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._matrices.pop(entry["namespace"], None)
+
+    def _matrix(self, namespace: Hashable):
+        """获取命名空间的 (条目ID列表, 向量矩阵)"""
+        cached = self._matrices.get(namespace)
+        if cached is None:
+            ids = [entry_id for entry_id, entry in self._entries.items()
+                   if entry["namespace"] == namespace]
+            matrix = (np.vstack([self._entries[entry_id]["embedding"] for entry_id in ids])
+                      if ids else None)
+            cached = (ids, matrix)
+            self._matrices[namespace] = cached
+        return cached
+
+    def lookup(self, query_embedding: np.ndarray, namespace: Hashable) -> Optional[Dict]:
+        """
+        查找语义相近的缓存结果
+
+        Args:
+            query_embedding: 查询向量
+            namespace: 命名空间，只在同一命名空间内匹配
+
+        Returns:
+            命中时返回缓存结果的副本（附带cache_similarity），否则返回None
+        """
+        embedding = self._normalize(query_embedding)
+        with self._lock:
+            self._expire(time.time())
+            ids, matrix = self._matrix(namespace)
+            if matrix is None or matrix.shape[1] != embedding.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id = ids[best]
+            entry = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            self.latency_saved += entry["latency"]
+            result = copy.deepcopy(entry["result"])
+            result["cache_similarity"] = float(similarities[best])
+            return result
+
+    def store(self,
+              query_embedding: np.ndarray,
+              namespace: Hashable,
+              result: Dict,
+              latency: float) -> None:
+        """
+        写入缓存
+
+        Args:
+            query_embedding: 查询向量
+            namespace: 命名空间
+            result: 查询结果
+            latency: 产生该结果的耗时（秒），用于统计节省的时间
+        """
+        with self._lock:
+            self._entries[self._next_id] = {
+                "embedding": self._normalize(query_embedding),
+                "namespace": namespace,
+                "result": copy.deepcopy(result),
+                "latency": latency,
+                "created_at": time.time()
+            }
+            self._next_id += 1
+            self._matrices.pop(namespace, None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, predicate=None) -> int:
+        """
+        使缓存失效
+
+        Args:
+            predicate: 命名空间过滤函数，返回True的命名空间被清除；None表示全部清除
+
+        Returns:
+            清除的条目数
+        """
+        with self._lock:
+            targets = [entry_id for entry_id, entry in self._entries.items()
+                       if predicate is None or predicate(entry["namespace"])]
+            for entry_id in targets:
+                self._remove(entry_id)
+            self.invalidations += 1
+        return len(targets)
+
+    def get_stats(self) -> Dict:
+        """获取命中率和节省的延迟"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "latency_saved_seconds": self.latency_saved
+            }
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from .batching import Histogram
+
+
+class InferenceExecutor:
+    """
+    有界推理线程池
+
+    FastAPI的async接口通过它把同步的编码、向量检索和重排放到工作线程执行，
+    事件循环只负责等待结果；max_in_flight限制同时进行的推理调用数量，
+    多出的请求在池内排队。
+    """
+
+    def __init__(self, max_in_flight: int = 4, name: str = "rag-inference"):
+        """
+        初始化推理线程池
+
+        Args:
+            max_in_flight: 同时执行的推理调用上限
+            name: 线程名前缀
+        """
+        self.max_in_flight = max_in_flight
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_wait_ms = Histogram([1, 5, 10, 50, 100, 500, 1000, 5000])
+        self.run_ms = Histogram([10, 50, 100, 200, 500, 1000, 2000, 5000, 10000])
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        在线程池中执行同步函数并等待结果
+
+        Args:
+            fn: 同步函数
+            *args, **kwargs: 传给fn的参数
+
+        Returns:
+            fn的返回值
+        """
+        submitted = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self.waiting -= 1
+                self.in_flight += 1
+                self.queue_wait_ms.observe((started - submitted) * 1000.0)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.run_ms.observe((time.perf_counter() - started) * 1000.0)
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._pool, call)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def get_stats(self) -> Dict:
+        """获取线程池统计信息"""
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_wait_ms": self.queue_wait_ms.to_dict(),
+                "run_ms": self.run_ms.to_dict()
+            }
+
+    def shutdown(self) -> None:
+        """关闭线程池"""
+        self._pool.shutdown(wait=False)
+
+
+class EventLoopLagMonitor:
+    """
+    事件循环延迟监控
+
+    定期sleep固定间隔，实际唤醒时间超出间隔的部分即为事件循环被阻塞的时长。
+    """
+
+    def __init__(self, interval: float = 0.1):
+        """
+        Args:
+            interval: 采样间隔（秒）
+        """
+        self.interval = interval
+        self.lag_ms = Histogram([1, 5, 10, 50, 100, 500, 1000, 5000])
+        self.last_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """在当前事件循环中启动监控任务"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag_ms = max(0.0, (time.perf_counter() - expected) * 1000.0)
+            self.lag_ms.observe(self.last_lag_ms)
+
+    def stop(self) -> None:
+        """停止监控任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        """获取事件循环延迟统计"""
+        stats = self.lag_ms.to_dict()
+        stats["interval_ms"] = self.interval * 1000.0
+        stats["last_ms"] = self.last_lag_ms
+        return stats
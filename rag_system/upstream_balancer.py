@@ -0,0 +1,311 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from .batching import Histogram
+from .upstream_client import PooledHttpClient
+from .upstream_health import CircuitBreaker, HealthPoller
+
+# 负载均衡策略
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+
+
+class NoUpstreamAvailable(Exception):
+    """所有上游都已熔断"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def percentile(values: Sequence[float], p: float) -> Optional[float]:
+    """第p百分位数（最近秩），空序列返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+class Upstream:
+    """一个上游实例：独立的连接池、熔断器，以及在途请求数和延迟统计"""
+
+    def __init__(self, http: PooledHttpClient, breaker: CircuitBreaker,
+                 ewma_alpha: float = 0.2, window: int = 512):
+        """
+        Args:
+            http: 该上游的连接池
+            breaker: 该上游的熔断器
+            ewma_alpha: 延迟EWMA的平滑系数，越大越偏向最近的请求
+            window: 计算分位数的最近成功请求数
+        """
+        self.http = http
+        self.breaker = breaker
+        self.health: Optional[HealthPoller] = None
+        self.ewma_alpha = ewma_alpha
+        self.outstanding = 0
+        self.ewma_ms: Optional[float] = None
+        self.recent_ms = deque(maxlen=window)
+        self.latency_ms = Histogram([100, 200, 500, 1000, 2000, 5000, 10000, 30000])
+        self.requests = 0
+        self.successes = 0
+        self.errors: Dict[str, int] = {}
+        self.cancelled = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def base_url(self) -> str:
+        return self.http.base_url
+
+    def finished(self, success: Optional[bool], reason: str = "", latency_ms: Optional[float] = None) -> None:
+        """
+        记录一次调用的结果
+
+        Args:
+            success: True成功，False上游故障（计入熔断），None无结论（被取消、连接池已满等）
+            reason: 失败原因
+            latency_ms: 成功请求的耗时，None表示不计入延迟统计（如流式请求）
+        """
+        if success is None:
+            self.breaker.release()
+        elif success:
+            self.successes += 1
+            self.breaker.record_success()
+            if latency_ms is not None:
+                self.recent_ms.append(latency_ms)
+                self.latency_ms.observe(latency_ms)
+                self.ewma_ms = (latency_ms if self.ewma_ms is None
+                                else self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * self.ewma_ms)
+        else:
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+            self.breaker.record_failure(reason)
+
+    def get_stats(self) -> Dict:
+        recent = list(self.recent_ms)
+        return {
+            "base_url": self.base_url,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "successes": self.successes,
+            "errors": dict(self.errors),
+            "cancelled": self.cancelled,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "ewma_ms": self.ewma_ms,
+            "p50_ms": percentile(recent, 50),
+            "p95_ms": percentile(recent, 95),
+            "p99_ms": percentile(recent, 99),
+            "latency_ms": self.latency_ms.to_dict(),
+            "circuit_breaker": self.breaker.get_stats(),
+            "health": self.health.get_state() if self.health is not None else None,
+            "connection_pool": self.http.get_stats()
+        }
+
+
+class UpstreamBalancer:
+    """
+    多上游负载均衡
+
+    每个请求选择当前最空闲的上游：least_outstanding按在途请求数，ewma按
+    延迟EWMA ×（在途请求数 + 1）；已熔断的上游被跳过。
+    启用对冲（hedge）时，若请求在近期成功延迟的第hedge_percentile百分位数内仍未返回，
+    向另一个上游发送相同请求，采用先成功返回的结果并取消另一个。
+    """
+
+    def __init__(self,
+                 upstreams: List[Upstream],
+                 strategy: str = LEAST_OUTSTANDING,
+                 hedge: bool = False,
+                 hedge_percentile: float = 95.0,
+                 hedge_min_delay_ms: float = 100.0,
+                 hedge_min_samples: int = 20,
+                 window: int = 512):
+        """
+        Args:
+            upstreams: 上游列表
+            strategy: "least_outstanding" 或 "ewma"
+            hedge: 是否启用对冲请求
+            hedge_percentile: 对冲延迟取近期成功延迟的哪个百分位数
+            hedge_min_delay_ms: 对冲延迟下限（毫秒）
+            hedge_min_samples: 样本少于该数量时不对冲
+            window: 计算对冲延迟的最近成功请求数
+        """
+        if not upstreams:
+            raise ValueError("至少需要一个上游")
+        if strategy not in (LEAST_OUTSTANDING, EWMA):
+            raise ValueError(f"未知的负载均衡策略: {strategy}")
+        self.upstreams = upstreams
+        self.strategy = strategy
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.recent_ms = deque(maxlen=window)
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+
+    def start(self) -> None:
+        for upstream in self.upstreams:
+            upstream.http.start()
+
+    async def close(self) -> None:
+        for upstream in self.upstreams:
+            await upstream.http.close()
+
+    def _score(self, upstream: Upstream) -> Tuple:
+        if self.strategy == EWMA:
+            return ((upstream.ewma_ms or 0.0) * (upstream.outstanding + 1), upstream.outstanding)
+        return (upstream.outstanding, upstream.ewma_ms or 0.0)
+
+    def pick(self, exclude: Optional[Upstream] = None) -> Upstream:
+        """
+        选择一个上游（得分相同时随机）
+
+        Raises:
+            NoUpstreamAvailable: 所有候选上游都已熔断
+        """
+        candidates = [upstream for upstream in self.upstreams if upstream is not exclude]
+        random.shuffle(candidates)
+        candidates.sort(key=self._score)
+        for upstream in candidates:
+            if upstream.breaker.allow():
+                return upstream
+        retry_after = min((upstream.breaker.retry_after() for upstream in candidates), default=0.0)
+        raise NoUpstreamAvailable("所有RAGflow上游均已熔断", retry_after)
+
+    def hedge_delay(self) -> Optional[float]:
+        """当前的对冲延迟（秒）；未启用、上游不足或样本不足时返回None"""
+        if not self.hedge or len(self.upstreams) < 2 or len(self.recent_ms) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay_ms, percentile(list(self.recent_ms), self.hedge_percentile)) / 1000.0
+
+    async def _call(self, upstream: Upstream, method: str, path: str, **kwargs) -> httpx.Response:
+        upstream.outstanding += 1
+        upstream.requests += 1
+        start = time.perf_counter()
+        success, reason = None, ""
+        try:
+            response = await upstream.http.request(method, path, **kwargs)
+            success = response.status_code < 500
+            reason = "" if success else f"HTTP {response.status_code}"
+            return response
+        except asyncio.CancelledError:
+            upstream.cancelled += 1
+            raise
+        except httpx.PoolTimeout:
+            # 本地连接池已满，与上游健康无关
+            raise
+        except Exception as e:
+            success, reason = False, type(e).__name__
+            raise
+        finally:
+            upstream.outstanding -= 1
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            upstream.finished(success, reason, latency_ms)
+            if success:
+                self.recent_ms.append(latency_ms)
+
+    async def request(self, method: str, path: str, hedge: bool = True, **kwargs) -> Tuple[httpx.Response, Upstream]:
+        """
+        发送请求，必要时对冲到第二个上游
+
+        Args:
+            method: HTTP方法
+            path: 相对上游地址的路径
+            hedge: 本请求是否允许对冲（非幂等请求应传False）
+            **kwargs: 传给httpx的其他参数
+
+        Returns:
+            (响应, 返回该响应的上游)；所有尝试都失败时返回最后一个5xx响应或抛出最后一个异常
+
+        Raises:
+            NoUpstreamAvailable: 所有上游都已熔断
+        """
+        primary = self.pick()
+        first = asyncio.ensure_future(self._call(primary, method, path, **kwargs))
+        tasks = {first: primary}
+        try:
+            delay = self.hedge_delay() if hedge else None
+            if delay is not None:
+                done, _ = await asyncio.wait({first}, timeout=delay)
+                if not done:
+                    try:
+                        secondary = self.pick(exclude=primary)
+                    except NoUpstreamAvailable:
+                        secondary = None
+                    if secondary is not None:
+                        self.hedged_requests += 1
+                        secondary.hedges += 1
+                        tasks[asyncio.ensure_future(self._call(secondary, method, path, **kwargs))] = secondary
+
+            pending = set(tasks)
+            last_task = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last_task = task
+                    if task.exception() is None and task.result().status_code < 500:
+                        upstream = tasks[task]
+                        if upstream is not primary:
+                            self.hedge_wins += 1
+                            upstream.hedge_wins += 1
+                        return task.result(), upstream
+            return last_task.result(), tasks[last_task]
+        finally:
+            # 取消落败或调用方已放弃的请求
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs) -> AsyncIterator[Tuple[httpx.Response, Upstream]]:
+        """
+        选择一个上游发送流式请求（不对冲）
+
+        Returns:
+            异步上下文管理器，产出 (未读取响应体的响应, 上游)
+
+        Raises:
+            NoUpstreamAvailable: 所有上游都已熔断
+        """
+        upstream = self.pick()
+        upstream.outstanding += 1
+        upstream.requests += 1
+        success, reason = None, ""
+        try:
+            async with upstream.http.stream(method, path, **kwargs) as response:
+                success = response.status_code < 500
+                reason = "" if success else f"HTTP {response.status_code}"
+                yield response, upstream
+        except httpx.PoolTimeout:
+            raise
+        except Exception as e:
+            success, reason = False, type(e).__name__
+            raise
+        finally:
+            upstream.outstanding -= 1
+            upstream.finished(success, reason)
+
+    def get_stats(self) -> Dict:
+        """各上游的在途请求、延迟分位数、错误和熔断状态，以及对冲统计"""
+        delay = self.hedge_delay()
+        return {
+            "strategy": self.strategy,
+            "hedging": {
+                "enabled": self.hedge,
+                "percentile": self.hedge_percentile,
+                "current_delay_ms": delay * 1000.0 if delay is not None else None,
+                "hedged_requests": self.hedged_requests,
+                "hedge_wins": self.hedge_wins
+            },
+            "p50_ms": percentile(list(self.recent_ms), 50),
+            "p95_ms": percentile(list(self.recent_ms), 95),
+            "p99_ms": percentile(list(self.recent_ms), 99),
+            "upstreams": [upstream.get_stats() for upstream in self.upstreams]
+        }
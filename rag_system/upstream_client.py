@@ -0,0 +1,260 @@
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from .batching import Histogram
+
+# 连接已就绪、开始发送请求的trace事件：此前的时间都花在等待连接池
+_SEND_EVENTS = ("http11.send_request_headers.started", "http2.send_request_headers.started")
+_CONNECT_STARTED = "connection.connect_tcp.started"
+_CONNECT_DONE = ("connection.connect_tcp.complete", "connection.start_tls.complete")
+_HEADERS_RECEIVED = ("http11.receive_response_headers.complete", "http2.receive_response_headers.complete")
+
+
+class UpstreamMetrics:
+    """上游请求的分阶段耗时统计：连接池等待、建连、上游首字节、总耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.errors: Dict[str, int] = {}
+        self.pool_wait_ms = Histogram([0.1, 1, 5, 10, 50, 100, 500, 1000, 5000])
+        self.connect_ms = Histogram([1, 5, 10, 50, 100, 500, 1000, 5000])
+        self.upstream_ms = Histogram([10, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000])
+        self.total_ms = Histogram([10, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000])
+
+    def started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def finished(self, timings: Dict[str, float], error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if "pool_wait" in timings:
+                self.pool_wait_ms.observe(timings["pool_wait"] * 1000.0)
+            if "connect" in timings:
+                self.new_connections += 1
+                self.connect_ms.observe(timings["connect"] * 1000.0)
+            elif "pool_wait" in timings:
+                self.reused_connections += 1
+            if "upstream" in timings:
+                self.upstream_ms.observe(timings["upstream"] * 1000.0)
+            if "total" in timings:
+                self.total_ms.observe(timings["total"] * 1000.0)
+            if error is not None:
+                name = type(error).__name__
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "errors": dict(self.errors),
+                "pool_wait_ms": self.pool_wait_ms.to_dict(),
+                "connect_ms": self.connect_ms.to_dict(),
+                "upstream_ms": self.upstream_ms.to_dict(),
+                "total_ms": self.total_ms.to_dict()
+            }
+
+
+class PooledHttpClient:
+    """
+    应用级共享的异步HTTP客户端
+
+    整个应用复用一个httpx.AsyncClient，TCP/TLS连接在请求之间保持并复用；
+    连接池上限、keep-alive过期时间和连接/读/写/取连接各阶段超时均可配置。
+    通过httpx的trace扩展记录每个请求在连接池等待、建连和等待上游响应上的耗时。
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 headers: Optional[Dict[str, str]] = None,
+                 max_connections: int = 100,
+                 max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 30.0,
+                 write_timeout: float = 10.0,
+                 pool_timeout: float = 5.0,
+                 http2: bool = False):
+        """
+        Args:
+            base_url: 上游服务地址
+            headers: 默认请求头
+            max_connections: 最大连接数（含正在使用的连接）
+            max_keepalive_connections: 最多保留的空闲连接数
+            keepalive_expiry: 空闲连接的保留时间（秒）
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取响应超时（秒）
+            write_timeout: 发送请求超时（秒）
+            pool_timeout: 从连接池获取连接的超时（秒）
+            http2: 是否启用HTTP/2（需要安装h2）
+        """
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout
+        )
+        self.http2 = http2
+        self.metrics = UpstreamMetrics()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_env(cls, prefix: str, base_url: str, headers: Optional[Dict[str, str]] = None,
+                 read_timeout: float = 30.0) -> "PooledHttpClient":
+        """
+        从环境变量读取连接池配置，如 RAGFLOW_MAX_CONNECTIONS、RAGFLOW_POOL_TIMEOUT
+
+        Args:
+            prefix: 环境变量前缀
+            base_url: 上游服务地址
+            headers: 默认请求头
+            read_timeout: 未配置 <prefix>_READ_TIMEOUT 时的读超时
+        """
+        def env(name, default):
+            return os.getenv(f"{prefix}_{name}", default)
+
+        return cls(
+            base_url,
+            headers,
+            max_connections=int(env("MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(env("MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(env("KEEPALIVE_EXPIRY", "30")),
+            connect_timeout=float(env("CONNECT_TIMEOUT", "5")),
+            read_timeout=float(env("READ_TIMEOUT", str(read_timeout))),
+            write_timeout=float(env("WRITE_TIMEOUT", "10")),
+            pool_timeout=float(env("POOL_TIMEOUT", "5")),
+            http2=env("HTTP2", "0") == "1"
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """底层客户端，未显式启动时首次使用创建"""
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self) -> None:
+        """创建共享客户端（应用启动时调用）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2
+            )
+
+    async def close(self) -> None:
+        """关闭共享客户端及其连接（应用关闭时调用）"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    def _tracer(self, timings: Dict[str, float], started: float):
+        marks: Dict[str, float] = {}
+
+        async def trace(event_name: str, info: Dict) -> None:
+            now = time.perf_counter()
+            if event_name == _CONNECT_STARTED or event_name in _SEND_EVENTS:
+                timings.setdefault("pool_wait", now - started)
+            if event_name == _CONNECT_STARTED:
+                marks["connect"] = now
+            elif event_name in _CONNECT_DONE and "connect" in marks:
+                timings["connect"] = now - marks["connect"]
+            elif event_name in _SEND_EVENTS:
+                marks["send"] = now
+            elif event_name in _HEADERS_RECEIVED and "send" in marks:
+                timings["upstream"] = now - marks["send"]
+
+        return trace
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        发送请求并读取完整响应
+
+        Args:
+            method: HTTP方法
+            path: 相对base_url的路径
+            **kwargs: 传给httpx的其他参数（json、params、headers等）
+
+        Returns:
+            httpx.Response
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = self._tracer(timings, started)
+        self.metrics.started()
+        error = None
+        try:
+            return await self.client.request(method, path, extensions=extensions, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            timings["total"] = time.perf_counter() - started
+            self.metrics.finished(timings, error)
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        发送请求并以流的形式读取响应体（用于转发上游的流式输出）
+
+        响应头到达后即返回，响应体由调用方通过aiter_lines/aiter_bytes逐块读取；
+        总耗时统计到流关闭为止。
+
+        Args:
+            method: HTTP方法
+            path: 相对base_url的路径
+            **kwargs: 传给httpx的其他参数
+
+        Returns:
+            异步上下文管理器，产出未读取响应体的httpx.Response
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = self._tracer(timings, started)
+        self.metrics.started()
+        error = None
+        try:
+            async with self.client.stream(method, path, extensions=extensions, **kwargs) as response:
+                yield response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            timings["total"] = time.perf_counter() - started
+            self.metrics.finished(timings, error)
+
+    def get_stats(self) -> Dict:
+        """连接池配置和分阶段耗时统计"""
+        stats = self.metrics.get_stats()
+        stats["config"] = {
+            "base_url": self.base_url,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "timeouts": {"connect": self.timeout.connect, "read": self.timeout.read,
+                         "write": self.timeout.write, "pool": self.timeout.pool},
+            "http2": self.http2
+        }
+        stats["started"] = self._client is not None
+        return stats
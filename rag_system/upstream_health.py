@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    上游调用熔断器
+
+    closed：正常放行，连续失败达到failure_threshold次后熔断（open）。
+    open：直接拒绝，recovery_timeout秒后（或健康检查恢复时）进入half_open。
+    half_open：只放行half_open_max_calls个探测请求，成功则恢复closed，失败则重新熔断。
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            recovery_timeout: 熔断后等待多久开始探测（秒）
+            half_open_max_calls: 半开状态下同时放行的探测请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._probes = 0
+
+        self.trips = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def _open(self, reason: str) -> None:
+        """熔断（调用方持有锁）"""
+        if self.state != OPEN:
+            self.trips += 1
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.last_error = reason
+        self._probes = 0
+
+    def allow(self) -> bool:
+        """
+        是否放行一次调用；放行后必须以record_success、record_failure或release之一结束
+
+        Returns:
+            True表示放行，False表示应立即失败
+        """
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.opened_at = None
+                self._probes = 0
+
+    def record_failure(self, reason: str = "") -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = reason
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open(reason)
+
+    def release(self) -> None:
+        """放行的调用未产生结论（如客户端断开、请求本身有误），归还探测名额"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def trip(self, reason: str) -> None:
+        """外部判定上游不可用（如健康检查失败）时立即熔断；已熔断时重新计时"""
+        with self._lock:
+            self._open(reason)
+
+    def probe_ok(self) -> None:
+        """健康检查恢复：熔断中的断路器提前进入半开，由下一个真实请求确认"""
+        with self._lock:
+            if self.state == OPEN:
+                self.state = HALF_OPEN
+                self._probes = 0
+
+    def retry_after(self) -> float:
+        """距离下一次允许探测的秒数"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.time() - self.opened_at))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "opened_at": self.opened_at,
+                "last_error": self.last_error,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures
+            }
+
+
+class HealthPoller:
+    """
+    后台健康检查
+
+    按固定间隔调用check，缓存最近一次结果；健康接口直接读取缓存状态，
+    负载均衡器的探测不会转发到上游。连续失败达到熔断器的failure_threshold次时熔断
+    （单次超时不会摘除上游），恢复时让熔断器进入半开。
+    """
+
+    def __init__(self,
+                 check: Callable[[], Awaitable[Any]],
+                 interval: float = 10.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            check: 健康检查协程函数，失败时抛出异常，成功时返回上游的健康信息
+            interval: 检查间隔（秒）
+            breaker: 需要联动的熔断器
+        """
+        self.check = check
+        self.interval = interval
+        self.breaker = breaker
+        self.status = "unknown"
+        self.detail: Any = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.last_healthy_at: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.checks = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll_once(self) -> None:
+        """执行一次健康检查并更新缓存状态"""
+        start = time.perf_counter()
+        try:
+            detail = await self.check()
+        except Exception as e:
+            self.status = "unhealthy"
+            self.error = f"{type(e).__name__}: {e}"
+            self.consecutive_failures += 1
+            if self.breaker is not None and self.consecutive_failures >= self.breaker.failure_threshold:
+                self.breaker.trip(f"健康检查连续失败 {self.consecutive_failures} 次: {self.error}")
+        else:
+            self.status = "healthy"
+            self.detail = detail
+            self.error = None
+            self.consecutive_failures = 0
+            self.last_healthy_at = time.time()
+            if self.breaker is not None:
+                self.breaker.probe_ok()
+        self.latency = time.perf_counter() - start
+        self.checked_at = time.time()
+        self.checks += 1
+
+    async def _run(self) -> None:
+        while True:
+            await self.poll_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台检查"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def get_state(self) -> Dict:
+        return {
+            "status": self.status,
+            "detail": self.detail,
+            "error": self.error,
+            "checked_at": self.checked_at,
+            "age_seconds": time.time() - self.checked_at if self.checked_at else None,
+            "last_healthy_at": self.last_healthy_at,
+            "latency_seconds": self.latency,
+            "consecutive_failures": self.consecutive_failures,
+            "interval": self.interval,
+            "checks": self.checks
+        }
@@ -1,49 +1,585 @@
-import chromadb
-from chromadb.config import Settings
 import os
+import queue
+import threading
+import time
 import numpy as np
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import json
+from abc import ABC, abstractmethod
 
-class ChromaVectorDB:
+# 支持的向量存储后端
+VECTOR_BACKENDS = ("chroma", "numpy")
+
+
+class CollectionNotFoundError(ValueError):
+    """集合不存在"""
+
+
+def create_vector_db(backend: str = "chroma", persist_directory: str = "./vector_db", **kwargs):
+    """
+    按名称创建向量存储后端
+    
+    Args:
+        backend: "chroma"（ChromaDB）或 "numpy"（内存映射的NumPy扁平索引）
+        persist_directory: 数据持久化目录
+        **kwargs: 传给后端构造函数的其他参数
+        
+    Returns:
+        向量数据库实例
+    """
+    if backend == "chroma":
+        return ChromaVectorDB(persist_directory, **kwargs)
+    if backend == "numpy":
+        from .numpy_vector_db import NumpyVectorDB
+        return NumpyVectorDB(persist_directory, **kwargs)
+    raise ValueError(f"未知的向量存储后端: {backend}，可选: {VECTOR_BACKENDS}")
+
+
+class IngestProgress:
+    """批量写入的进度和吞吐量统计"""
+    
+    def __init__(self, log_interval: float = 2.0):
+        """
+        Args:
+            log_interval: 进度输出的最小间隔（秒）
+        """
+        self.log_interval = log_interval
+        self.added = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self._last_log = self.started
+    
+    def update(self, count: int) -> None:
+        """记录一个批次写入完成"""
+        self.added += count
+        self.batches += 1
+        now = time.perf_counter()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            print(f"写入进度: {self.added} 个文档，{self.added / (now - self.started):.0f} 文档/秒")
+    
+    def finish(self) -> Dict:
+        """返回写入统计"""
+        seconds = time.perf_counter() - self.started
+        return {
+            "added": self.added,
+            "batches": self.batches,
+            "seconds": seconds,
+            "docs_per_second": self.added / seconds if seconds > 0 else 0.0
+        }
+
+
+def iter_record_batches(records: Iterable[Tuple[str, str, Any, Optional[Dict]]],
+                        batch_size: int):
+    """
+    把 (ID, 文本, 向量, 元数据) 记录流切分为有界批次
+    
+    Args:
+        records: 记录迭代器，可以是生成器
+        batch_size: 每批记录数
+        
+    Returns:
+        生成 (ID列表, 文本列表, float32向量矩阵, 元数据列表) 的生成器
+    """
+    buffer = []
+    for record in records:
+        buffer.append(record)
+        if len(buffer) >= batch_size:
+            yield _unpack_records(buffer)
+            buffer = []
+    if buffer:
+        yield _unpack_records(buffer)
+
+
+def _unpack_records(buffer: List[Tuple]) -> Tuple[List[str], List[str], np.ndarray, List[Dict]]:
+    ids = [record[0] for record in buffer]
+    documents = [record[1] for record in buffer]
+    embeddings = np.asarray([record[2] for record in buffer], dtype=np.float32)
+    metadatas = [record[3] if len(record) > 3 and record[3] is not None else {"type": "document"}
+                 for record in buffer]
+    return ids, documents, embeddings, metadatas
+
+
+_STAGE_END = object()
+
+
+def iter_in_thread(iterable: Iterable, maxsize: int = 2, name: str = "stage"):
+    """
+    在后台线程中迭代iterable，经有界队列把结果交给调用方
+    
+    队列满时后台线程阻塞（背压），多个iter_in_thread串联即得到各阶段并发执行的流水线。
+    后台异常在调用方重新抛出；调用方提前结束时通知后台线程停止，并关闭上游生成器。
+    
+    Args:
+        iterable: 上游迭代器，可以是生成器
+        maxsize: 队列容量（在途元素数）
+        name: 线程名
+        
+    Returns:
+        按原顺序生成元素的生成器
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def run():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((_STAGE_END, None))
+        except BaseException as e:
+            put((_STAGE_END, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+    
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _STAGE_END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _timed(iterable: Iterable, timings: Dict[str, float], key: str):
+    """累计从iterable取下一个元素所花的时间"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[key] += time.perf_counter() - start
+            return
+        timings[key] += time.perf_counter() - start
+        yield item
+
+
+class VectorDB(ABC):
+    """
+    向量存储后端接口
+    
+    search返回与ChromaDB query一致的结构：
+    {"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}，
+    距离为余弦距离。当前集合对象需提供name和id属性。
+    后端必须实现全部抽象方法；add_documents、add_records、sync_records、search_by_text
+    以及导入导出由基类基于这些方法提供。
+    
+    写入和管理操作作用于当前集合（self.collection）；并发查询应通过open_collection
+    取得各自的集合句柄传给search，不修改共享的当前集合。
+    """
+    
+    collection = None
+    # 流式写入的默认批量
+    batch_size = 1000
+    
+    @abstractmethod
+    def create_collection(self, name: str = "student_knowledge", **index_params) -> None:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_or_create_collection(self, name: str = "student_knowledge", **index_params):
+        raise NotImplementedError
+    
+    @abstractmethod
+    def open_collection(self, name: str):
+        """
+        获取集合句柄（只读取，不创建，也不改变当前集合）
+        
+        Raises:
+            CollectionNotFoundError: 集合不存在
+        """
+        raise NotImplementedError
+    
+    def add_documents(self, 
+                     documents: List[str], 
+                     embeddings: np.ndarray, 
+                     metadatas: Optional[List[Dict]] = None,
+                     ids: Optional[List[str]] = None) -> Dict:
+        """
+        添加文档到向量数据库（按batch_size分批写入）
+        
+        Args:
+            documents: 文档内容列表
+            embeddings: 向量数组
+            metadatas: 元数据列表
+            ids: 文档ID列表
+            
+        Returns:
+            写入统计，见add_records
+        """
+        # 生成文档ID
+        if ids is None:
+            ids = [f"doc_{i}" for i in range(len(documents))]
+        
+        # 准备元数据
+        if metadatas is None:
+            metadatas = [{"type": "document"} for _ in documents]
+        
+        return self.add_records(zip(ids, documents, embeddings, metadatas))
+    
+    def add_records(self, 
+                    records: Iterable[Tuple[str, str, Any, Optional[Dict]]],
+                    batch_size: Optional[int] = None) -> Dict:
+        """
+        流式写入 (ID, 文本, 向量, 元数据) 记录
+        
+        记录可以来自生成器，每次只在内存中保留一个批次，峰值内存与语料规模无关。
+        
+        Args:
+            records: 记录迭代器
+            batch_size: 每批写入的记录数，默认使用self.batch_size
+            
+        Returns:
+            写入统计：added、batches、seconds、docs_per_second
+        """
+        if not self.collection:
+            self.create_collection()
+        
+        progress = IngestProgress()
+        for ids, documents, embeddings, metadatas in iter_record_batches(
+                records, batch_size or self.batch_size):
+            self._write_batch(ids, documents, embeddings, metadatas)
+            progress.update(len(ids))
+        
+        stats = progress.finish()
+        print(f"成功添加 {stats['added']} 个文档到向量数据库（{stats['batches']} 批，"
+              f"{stats['docs_per_second']:.0f} 文档/秒）")
+        return stats
+    
+    @abstractmethod
+    def _write_batch(self, 
+                     ids: List[str], 
+                     documents: List[str], 
+                     embeddings: np.ndarray, 
+                     metadatas: List[Dict]) -> None:
+        """写入一个批次"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def search(self, 
+              query_embedding: np.ndarray, 
+              n_results: int = 5,
+              where: Optional[Dict] = None,
+              collection=None) -> Dict:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def update_document(self, 
+                       id: str, 
+                       document: str, 
+                       embedding: np.ndarray, 
+                       metadata: Optional[Dict] = None) -> None:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete_documents(self, ids: List[str]) -> None:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_all(self, include_embeddings: bool = True) -> Dict:
+        """获取当前集合的全部数据，包含ids、documents、metadatas，以及可选的embeddings"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def iter_documents(self, batch_size: Optional[int] = None) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        """分批读取当前集合的文档（不含向量），逐批生成 (ids, documents, metadatas)"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def list_ids(self) -> List[str]:
+        """获取当前集合的全部文档ID"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_metadatas(self, ids: List[str]) -> Dict[str, Dict]:
+        """获取当前集合中指定文档的元数据（ID -> 元数据），不存在的ID不出现在结果中"""
+        raise NotImplementedError
+    
+    def sync_documents(self, 
+                       ids: List[str], 
+                       documents: List[str], 
+                       metadatas: List[Dict],
+                       embed_fn: Callable[[List[str]], np.ndarray],
+                       batch_size: Optional[int] = None) -> Dict:
+        """
+        增量同步集合内容
+        
+        ID由 (来源, 键, 内容哈希) 确定（见document_ids.assign_document_ids），
+        已存在的ID内容必然相同，直接跳过；只对新增和内容变化的文档调用embed_fn
+        编码并写入，最后删除本次构建中已不存在的旧文档。
+        
+        Args:
+            ids: 本次构建的全部文档ID
+            documents: 文档内容列表
+            metadatas: 元数据列表
+            embed_fn: 编码函数，输入文本列表，返回向量矩阵
+            batch_size: 每批编码和写入的记录数
+            
+        Returns:
+            构建报告，见sync_records
+        """
+        return self.sync_records(zip(ids, documents, metadatas), embed_fn, batch_size)
+    
+    def sync_records(self,
+                     records: Iterable[Tuple[str, str, Dict]],
+                     embed_fn: Callable[[List[str]], np.ndarray],
+                     batch_size: Optional[int] = None,
+                     queue_size: int = 2,
+                     encode_batch_size: Optional[int] = None) -> Dict:
+        """
+        流水线式增量同步：产出文档、批量编码、批量写入三个阶段并发执行
+        
+        文档流在后台线程中产出并过滤掉已存在的ID，编码在另一个线程中进行，
+        当前线程负责写入；阶段之间用容量为queue_size的有界队列连接，下游跟不上时
+        上游阻塞，在途数据量与语料规模无关。全部写入完成后再删除已不存在的旧文档，
+        查询端不会看到内容缺失的中间状态。只删除来源（元数据中的source）在本次
+        文档流中出现过的旧文档，未读取的数据源的文档保持不变；文档流为空时不删除任何文档。
+        
+        Args:
+            records: (ID, 文本, 元数据) 迭代器，可以是生成器
+            embed_fn: 编码函数，输入文本列表，返回向量矩阵
+            batch_size: 每批编码和写入的记录数
+            queue_size: 阶段之间在途的批次数
+            encode_batch_size: 每次调用embed_fn的文本数，默认与batch_size相同
+                （多进程编码时应足够大，以便分片给所有工作进程）
+            
+        Returns:
+            构建报告：added、updated、unchanged、removed、total、seconds，
+            以及各阶段忙碌时间stages（chunk/encode/write）
+        """
+        from .document_ids import plan_sync
+        
+        if not self.collection:
+            self.create_collection()
+        start = time.perf_counter()
+        existing = set(self.list_ids())
+        batch_size = batch_size or self.batch_size
+        encode_batch_size = encode_batch_size or batch_size
+        seen: List[str] = []
+        seen_sources = set()
+        timings = {"chunk": 0.0, "encode": 0.0, "wait": 0.0}
+        
+        def pending_batches():
+            batch = []
+            for doc_id, document, metadata in _timed(records, timings, "chunk"):
+                seen.append(doc_id)
+                seen_sources.add(metadata.get("source"))
+                if doc_id not in existing:
+                    batch.append((doc_id, document, metadata))
+                    if len(batch) >= encode_batch_size:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+        
+        def encoded_batches():
+            for batch in iter_in_thread(pending_batches(), queue_size, "sync-chunk"):
+                encode_start = time.perf_counter()
+                embeddings = embed_fn([document for _, document, _ in batch])
+                timings["encode"] += time.perf_counter() - encode_start
+                yield batch, embeddings
+        
+        def pending_records():
+            encoded = iter_in_thread(encoded_batches(), queue_size, "sync-encode")
+            for batch, embeddings in _timed(encoded, timings, "wait"):
+                for (doc_id, document, metadata), embedding in zip(batch, embeddings):
+                    yield doc_id, document, embedding, metadata
+        
+        write_start = time.perf_counter()
+        self.add_records(pending_records(), batch_size)
+        write_seconds = time.perf_counter() - write_start - timings["wait"]
+        
+        if not seen:
+            print("没有读取到任何文档，保留集合现有内容")
+            existing = set()
+        # 本次没有读取的数据源（如未指定或读取失败）中的文档不能当作已删除
+        candidates = list(existing.difference(seen))
+        if candidates:
+            sources = self.get_metadatas(candidates)
+            other_sources = {doc_id for doc_id in candidates
+                             if sources.get(doc_id, {}).get("source") not in seen_sources}
+            if other_sources:
+                print(f"保留 {len(other_sources)} 个来自本次未读取数据源的文档")
+                existing -= other_sources
+        plan = plan_sync(existing, seen)
+        if plan["delete"]:
+            self.delete_documents(plan["delete"])
+        
+        report = {
+            "added": plan["added"],
+            "updated": plan["updated"],
+            "unchanged": plan["unchanged"],
+            "removed": plan["removed"],
+            "total": len(seen),
+            "seconds": time.perf_counter() - start,
+            "stages": {"chunk": timings["chunk"], "encode": timings["encode"], "write": write_seconds}
+        }
+        print(f"增量构建完成: 新增 {report['added']}，更新 {report['updated']}，"
+              f"未变 {report['unchanged']}，删除 {report['removed']}，耗时 {report['seconds']:.2f} 秒"
+              f"（分块 {timings['chunk']:.2f}s，编码 {timings['encode']:.2f}s，写入 {write_seconds:.2f}s）")
+        return report
+    
+    @abstractmethod
+    def get_collection_info(self) -> Dict:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete_collection(self, name: str) -> None:
+        raise NotImplementedError
+    
+    @abstractmethod
+    def list_collections(self) -> List[str]:
+        raise NotImplementedError
+    
+    def search_by_text(self, 
+                      query_text: str, 
+                      vectorizer,
+                      n_results: int = 5,
+                      where: Optional[Dict] = None) -> Dict:
+        """
+        通过文本搜索
+        
+        Args:
+            query_text: 查询文本
+            vectorizer: 向量化器
+            n_results: 返回结果数量
+            where: 过滤条件
+            
+        Returns:
+            搜索结果字典
+        """
+        # 编码查询文本
+        query_embedding = vectorizer.encode_single(query_text)
+        
+        # 执行搜索
+        return self.search(query_embedding, n_results, where)
+    
+    def export_collection(self, export_path: str) -> None:
+        """
+        导出集合数据
+        
+        Args:
+            export_path: 导出文件路径
+        """
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        
+        # 获取所有数据
+        all_data = self.get_all()
+        embeddings = all_data['embeddings']
+        
+        # 保存到文件
+        export_data = {
+            "documents": all_data['documents'],
+            "embeddings": embeddings.tolist() if isinstance(embeddings, np.ndarray) else embeddings,
+            "metadatas": all_data['metadatas'],
+            "ids": all_data['ids']
+        }
+        
+        with open(export_path, 'w', encoding='utf-8') as f:
+            json.dump(export_data, f, ensure_ascii=False, indent=2)
+        
+        print(f"集合数据导出成功: {export_path}")
+    
+    def import_collection(self, import_path: str) -> None:
+        """
+        导入集合数据
+        
+        Args:
+            import_path: 导入文件路径
+        """
+        with open(import_path, 'r', encoding='utf-8') as f:
+            import_data = json.load(f)
+        
+        self.add_documents(
+            documents=import_data['documents'],
+            embeddings=import_data['embeddings'],
+            metadatas=import_data['metadatas'],
+            ids=import_data['ids']
+        )
+        
+        print(f"集合数据导入成功: {import_path}")
+
+
+class ChromaVectorDB(VectorDB):
     """ChromaDB向量数据库操作类"""
     
-    def __init__(self, persist_directory="./vector_db"):
+    def __init__(self, persist_directory="./vector_db", batch_size: int = 1000):
         """
         初始化ChromaDB向量数据库
         
         Args:
             persist_directory: 数据持久化目录
+            batch_size: 单次collection.add的记录数，不超过ChromaDB的最大批量
         """
         self.persist_directory = persist_directory
         
-        # 使用新的ChromaDB客户端配置
-        try:
-            # 尝试使用新的配置
-            self.client = chromadb.PersistentClient(path=persist_directory)
-            print(f"ChromaDB初始化完成（新配置），数据目录: {persist_directory}")
-        except Exception as e:
-            print(f"新配置失败，尝试旧配置: {e}")
-            # 回退到旧配置
-            self.client = chromadb.Client(Settings(
-                chroma_db_impl="duckdb+parquet",
-                persist_directory=persist_directory
-            ))
-            print(f"ChromaDB初始化完成（旧配置），数据目录: {persist_directory}")
+        # chromadb导入较慢，延迟到真正创建客户端时
+        import chromadb
+        
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        print(f"ChromaDB初始化完成，数据目录: {persist_directory}")
+        
+        max_batch_size = getattr(self.client, 'max_batch_size', None)
+        if max_batch_size is None and hasattr(self.client, 'get_max_batch_size'):
+            max_batch_size = self.client.get_max_batch_size()
+        self.batch_size = min(batch_size, max_batch_size) if max_batch_size else batch_size
+        # 旧版ChromaDB只接受Python列表形式的向量
+        self._embeddings_as_list = False
         
         self.collection = None
     
-    def create_collection(self, name: str = "student_knowledge") -> None:
+    @staticmethod
+    def _hnsw_metadata(M: Optional[int] = None,
+                       ef_construction: Optional[int] = None,
+                       ef_search: Optional[int] = None) -> Dict:
+        """把HNSW参数转换为ChromaDB集合元数据"""
+        metadata = {"hnsw:space": "cosine"}
+        if M is not None:
+            metadata["hnsw:M"] = M
+        if ef_construction is not None:
+            metadata["hnsw:construction_ef"] = ef_construction
+        if ef_search is not None:
+            metadata["hnsw:search_ef"] = ef_search
+        return metadata
+    
+    def create_collection(self, 
+                          name: str = "student_knowledge",
+                          M: Optional[int] = None,
+                          ef_construction: Optional[int] = None,
+                          ef_search: Optional[int] = None) -> None:
         """
         创建向量集合
         
         Args:
             name: 集合名称
+            M: HNSW每个节点的邻居数，越大召回越高、内存越多（ChromaDB默认16）
+            ef_construction: 建图时的候选列表长度，越大图质量越好、写入越慢（默认100）
+            ef_search: 查询时的候选列表长度，越大召回越高、延迟越高（默认10）
         """
         try:
             self.collection = self.client.create_collection(
                 name=name,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self._hnsw_metadata(M, ef_construction, ef_search)
             )
             print(f"向量集合创建成功: {name}")
         except Exception as e:
@@ -52,70 +588,112 @@ class ChromaVectorDB:
             self.collection = self.client.get_collection(name=name)
             print(f"获取已存在的集合: {name}")
     
-    def get_or_create_collection(self, name: str = "student_knowledge"):
-        """获取或创建集合"""
+    def get_or_create_collection(self, 
+                                 name: str = "student_knowledge",
+                                 M: Optional[int] = None,
+                                 ef_construction: Optional[int] = None,
+                                 ef_search: Optional[int] = None):
+        """
+        获取或创建集合
+        
+        M和ef_construction只在创建时生效；已存在的集合与传入参数不一致时给出提示，
+        需要删除重建才能应用。
+        """
         try:
             self.collection = self.client.get_collection(name=name)
             print(f"获取已存在的集合: {name}")
         except:
-            self.create_collection(name)
+            self.create_collection(name, M, ef_construction, ef_search)
+            return
+        
+        existing = self.collection.metadata or {}
+        requested = self._hnsw_metadata(M, ef_construction, None)
+        defaults = {"hnsw:M": 16, "hnsw:construction_ef": 100}
+        mismatched = {key: value for key, value in requested.items()
+                      if existing.get(key, defaults.get(key)) != value}
+        if mismatched:
+            print(f"集合 {name} 的HNSW建图参数与请求不一致 {mismatched}，需重建集合后生效")
+        if ef_search is not None and self.get_search_ef() != ef_search:
+            self.set_search_ef(ef_search)
     
-    def add_documents(self, 
-                     documents: List[str], 
-                     embeddings: np.ndarray, 
-                     metadatas: Optional[List[Dict]] = None,
-                     ids: Optional[List[str]] = None) -> None:
+    def open_collection(self, name: str):
+        """获取集合句柄（只读取，不创建，也不改变当前集合）"""
+        try:
+            return self.client.get_collection(name=name)
+        except Exception as e:
+            raise CollectionNotFoundError(f"集合不存在: {name}（{e}）") from e
+    
+    def set_search_ef(self, ef: int) -> None:
         """
-        添加文档到向量数据库
+        持久化修改当前集合的ef_search（兼容新版configuration接口和旧版元数据接口）
         
-        Args:
-            documents: 文档内容列表
-            embeddings: 向量数组
-            metadatas: 元数据列表
-            ids: 文档ID列表
+        修改对所有打开该集合的进程生效，只应在调参或部署时调用，不应在查询路径上调用。
         """
-        if not self.collection:
-            self.create_collection()
-        
-        # 生成文档ID
-        if ids is None:
-            ids = [f"doc_{i}" for i in range(len(documents))]
-        
-        # 准备元数据
-        if metadatas is None:
-            metadatas = [{"type": "document"} for _ in documents]
-        
-        # 确保向量格式正确
-        if isinstance(embeddings, np.ndarray):
-            embeddings_list = embeddings.tolist()
-        else:
-            embeddings_list = embeddings
+        try:
+            self.collection.modify(configuration={"hnsw": {"ef_search": ef}})
+        except Exception:
+            metadata = dict(self.collection.metadata or {})
+            metadata["hnsw:search_ef"] = ef
+            self.collection.modify(metadata=metadata)
+    
+    def get_search_ef(self, collection=None) -> Optional[int]:
+        """获取集合（默认当前集合）的ef_search（优先读取configuration，其次读取元数据），未设置时返回None"""
+        collection = collection if collection is not None else self.collection
+        configuration = (getattr(collection, 'configuration', None)
+                         or getattr(collection, 'configuration_json', None) or {})
+        ef = (configuration.get("hnsw") or {}).get("ef_search") if isinstance(configuration, dict) else None
+        if ef is None:
+            ef = (collection.metadata or {}).get("hnsw:search_ef")
+        return ef
+    
+    def _write_batch(self, 
+                     ids: List[str], 
+                     documents: List[str], 
+                     embeddings: np.ndarray, 
+                     metadatas: List[Dict]) -> None:
+        """写入一个批次，优先直接传入numpy矩阵，避免转换为Python列表"""
+        if not self._embeddings_as_list:
+            try:
+                self.collection.add(
+                    documents=documents,
+                    embeddings=embeddings,
+                    ids=ids,
+                    metadatas=metadatas
+                )
+                return
+            except (TypeError, ValueError) as e:
+                if "embedding" not in str(e).lower():
+                    raise
+                print(f"ChromaDB不接受numpy向量，改用列表写入: {e}")
+                self._embeddings_as_list = True
         
-        # 添加文档
         self.collection.add(
             documents=documents,
-            embeddings=embeddings_list,
+            embeddings=embeddings.tolist(),
             ids=ids,
             metadatas=metadatas
         )
-        print(f"成功添加 {len(documents)} 个文档到向量数据库")
     
     def search(self, 
               query_embedding: np.ndarray, 
               n_results: int = 5,
-              where: Optional[Dict] = None) -> Dict:
+              where: Optional[Dict] = None,
+              collection=None) -> Dict:
         """
-        搜索相似文档
+        搜索相似文档（ef_search为集合级设置，见set_search_ef）
         
         Args:
             query_embedding: 查询向量
             n_results: 返回结果数量
             where: 过滤条件
+            collection: 集合句柄（见open_collection），None表示当前集合
             
         Returns:
             搜索结果字典
         """
-        if not self.collection:
+        if collection is None:
+            collection = self.collection
+        if not collection:
             raise ValueError("向量集合未初始化")
         
         # 确保向量格式正确
@@ -125,36 +703,48 @@ class ChromaVectorDB:
             query_embedding_list = query_embedding
         
         # 执行搜索
-        results = self.collection.query(
+        return collection.query(
             query_embeddings=[query_embedding_list],
             n_results=n_results,
             where=where
         )
-        
-        return results
     
-    def search_by_text(self, 
-                      query_text: str, 
-                      vectorizer,
-                      n_results: int = 5,
-                      where: Optional[Dict] = None) -> Dict:
-        """
-        通过文本搜索
-        
-        Args:
-            query_text: 查询文本
-            vectorizer: 向量化器
-            n_results: 返回结果数量
-            where: 过滤条件
-            
-        Returns:
-            搜索结果字典
-        """
-        # 编码查询文本
-        query_embedding = vectorizer.encode_single(query_text)
-        
-        # 执行搜索
-        return self.search(query_embedding, n_results, where)
+    def get_all(self, include_embeddings: bool = True) -> Dict:
+        """获取当前集合的全部数据"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.get(include=include)
+    
+    def iter_documents(self, batch_size: Optional[int] = None) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        """按limit/offset分页读取当前集合的文档"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        batch_size = batch_size or self.batch_size
+        offset = 0
+        while True:
+            result = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not result['ids']:
+                return
+            yield result['ids'], result['documents'], result['metadatas']
+            offset += len(result['ids'])
+    
+    def list_ids(self) -> List[str]:
+        """获取当前集合的全部文档ID"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        return self.collection.get(include=[])['ids']
+    
+    def get_metadatas(self, ids: List[str]) -> Dict[str, Dict]:
+        """获取指定文档的元数据"""
+        if not self.collection:
+            raise ValueError("向量集合未初始化")
+        metadatas = {}
+        # 按批查询，避免单次请求的ID过多
+        for start in range(0, len(ids), 500):
+            result = self.collection.get(ids=ids[start:start + 500], include=["metadatas"])
+            metadatas.update(zip(result['ids'], result['metadatas']))
+        return metadatas
     
     def get_collection_info(self) -> Dict:
         """获取集合信息"""
@@ -216,50 +806,7 @@ class ChromaVectorDB:
         if not self.collection:
             raise ValueError("向量集合未初始化")
         
-        self.collection.delete(ids=ids)
+        # 与写入相同，单次删除不超过最大批量
+        for begin in range(0, len(ids), self.batch_size):
+            self.collection.delete(ids=ids[begin:begin + self.batch_size])
         print(f"成功删除 {len(ids)} 个文档")
-    
-    def export_collection(self, export_path: str) -> None:
-        """
-        导出集合数据
-        
-        Args:
-            export_path: 导出文件路径
-        """
-        if not self.collection:
-            raise ValueError("向量集合未初始化")
-        
-        # 获取所有数据
-        all_data = self.collection.get()
-        
-        # 保存到文件
-        export_data = {
-            "documents": all_data['documents'],
-            "embeddings": all_data['embeddings'],
-            "metadatas": all_data['metadatas'],
-            "ids": all_data['ids']
-        }
-        
-        with open(export_path, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"集合数据导出成功: {export_path}")
-    
-    def import_collection(self, import_path: str) -> None:
-        """
-        导入集合数据
-        
-        Args:
-            import_path: 导入文件路径
-        """
-        with open(import_path, 'r', encoding='utf-8') as f:
-            import_data = json.load(f)
-        
-        self.add_documents(
-            documents=import_data['documents'],
-            embeddings=import_data['embeddings'],
-            metadatas=import_data['metadatas'],
-            ids=import_data['ids']
-        )
-        
-        print(f"集合数据导入成功: {import_path}") 
\ No newline at end of file
@@ -1,16 +1,58 @@
-from sentence_transformers import SentenceTransformer, CrossEncoder
-import torch
+# torch、sentence_transformers、sklearn在首次加载模型时才导入，保证冷启动足够快
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+from contextlib import contextmanager
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+import time
+from .embedding_cache import EmbeddingCache, model_fingerprint
+from .batching import MicroBatcher
+from .onnx_backend import INFERENCE_BACKENDS
+from .model_registry import BI_ENCODER, CROSS_ENCODER, get_model_registry
+
+def to_numpy(embeddings) -> np.ndarray:
+    """把torch张量或numpy数组统一转换为numpy数组"""
+    if hasattr(embeddings, 'cpu'):
+        return embeddings.cpu().numpy()
+    return np.asarray(embeddings)
+
+def token_lengths(tokenizer, texts: List[str], max_length: int = 512) -> List[int]:
+    """
+    计算文本的token长度，没有分词器时退化为字符长度
+    
+    Args:
+        tokenizer: HuggingFace分词器，可为None
+        texts: 文本列表
+        max_length: 截断长度，超出部分不参与计算
+        
+    Returns:
+        与texts对齐的长度列表
+    """
+    if tokenizer is None:
+        return [min(len(text), max_length) for text in texts]
+    encoded = tokenizer(list(texts), add_special_tokens=False, truncation=True, max_length=max_length)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def length_bucketed_batches(lengths: List[int], batch_size: int) -> List[np.ndarray]:
+    """
+    按长度排序后切分批次，使同一批次内的文本长度相近，减少padding
+    
+    Args:
+        lengths: 各条目的长度
+        batch_size: 批处理大小
+        
+    Returns:
+        批次列表，每个批次为原始下标数组
+    """
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
 
 class SimpleVectorizer:
     """简单的TF-IDF向量化器，用于离线模式"""
     
     def __init__(self):
         """初始化TF-IDF向量化器"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
         self.vectorizer = TfidfVectorizer(
             max_features=1000,
             stop_words=None,
@@ -45,35 +87,101 @@ class SimpleVectorizer:
 class BGEVectorizer:
     """BGE模型向量化器，使用Sentence Transformers接口"""
     
-    def __init__(self, model_name="BAAI/bge-small-zh-v1.5", force_bge=False):
+    def __init__(self, model_name="BAAI/bge-small-zh-v1.5", force_bge=False, cache_dir=None,
+                 backend="torch"):
         """
         初始化BGE向量化器
         
         Args:
             model_name: BGE模型名称
             force_bge: 是否强制使用BGE模型（如果失败会抛出异常）
+            cache_dir: 向量缓存目录，为None时不启用缓存
+            backend: 推理后端，"torch"、"onnx" 或 "onnx-int8"
         """
-        try:
-            print(f"🔄 正在加载BGE模型: {model_name}")
-            self.model = SentenceTransformer(model_name)
-            print(f"✅ BGE模型加载完成: {model_name}")
-            self.use_simple = False
-        except Exception as e:
-            print(f"❌ 无法加载BGE模型: {e}")
-            if force_bge:
-                raise Exception(f"强制BGE模式失败: {e}")
-            print("🔄 切换到TF-IDF向量化器（离线模式）")
-            self.model = SimpleVectorizer()
-            self.use_simple = True
-        
-        # 检查GPU可用性
-        if not self.use_simple:
-            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-            self.model = self.model.to(self.device)
-            print(f"🖥️ 使用设备: {self.device}")
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}，可选: {INFERENCE_BACKENDS}")
+        self.model_name = model_name
+        self.force_bge = force_bge
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self.cache = None
+        self.batcher = None
+        self.device = None
+        self.load_seconds = None
+        
+        # 模型在首次使用（或显式调用load）时才加载
+        self._model = None
+        self._use_simple = None
+        self._batching_config = None
+        self._load_lock = threading.Lock()
+        self._mp_encoder = None
+    
+    @property
+    def is_loaded(self) -> bool:
+        """模型是否已加载"""
+        return self._model is not None
+    
+    @property
+    def model(self):
+        """底层模型，首次访问时加载"""
+        self.load()
+        return self._model
+    
+    @property
+    def use_simple(self) -> bool:
+        """是否处于TF-IDF离线模式，首次访问时加载模型"""
+        self.load()
+        return self._use_simple
+    
+    def load(self) -> None:
+        """加载模型（线程安全，只加载一次）"""
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            start = time.perf_counter()
+            model_name = self.model_name
+            backend = self.backend
+            try:
+                print(f"🔄 正在加载BGE模型: {model_name} (后端: {backend})")
+                # 从进程级注册表获取，同一模型在进程内只加载一次
+                model = get_model_registry().acquire(model_name, BI_ENCODER, backend)
+                print(f"✅ BGE模型加载完成: {model_name}")
+                use_simple = False
+            except Exception as e:
+                print(f"❌ 无法加载BGE模型: {e}")
+                if self.force_bge:
+                    raise Exception(f"强制BGE模式失败: {e}")
+                print("🔄 切换到TF-IDF向量化器（离线模式）")
+                model = SimpleVectorizer()
+                use_simple = True
+            
+            # 设备由注册表在加载时选择（有GPU时使用cuda）
+            if not use_simple:
+                self.device = str(getattr(model, 'device', 'cpu'))
+                print(f"🖥️ 使用设备: {self.device}")
+                
+                # TF-IDF向量依赖拟合语料，只对BGE模型启用缓存
+                if self.cache_dir:
+                    self.cache = EmbeddingCache(self.cache_dir, model_fingerprint(model_name, backend))
+                    print(f"🗄️ 向量缓存已启用: {self.cache.cache_path}")
+            
+            self._use_simple = use_simple
+            self._model = model
+            self.load_seconds = time.perf_counter() - start
+            if self._batching_config is not None:
+                self._start_batcher()
     
     def get_model_info(self):
         """获取模型信息"""
+        if not self.is_loaded:
+            return {
+                "type": "BGE",
+                "mode": "not_loaded",
+                "backend": self.backend,
+                "description": f"BGE模型尚未加载: {self.model_name}"
+            }
         if self.use_simple:
             return {
                 "type": "TF-IDF",
@@ -81,11 +189,15 @@ class BGEVectorizer:
                 "description": "使用TF-IDF向量化器，无需网络连接"
             }
         else:
-            return {
+            info = {
                 "type": "BGE",
                 "mode": "online",
+                "backend": self.backend,
                 "description": f"使用BGE模型: {self.model.model_name if hasattr(self.model, 'model_name') else 'Unknown'}"
             }
+            if self.cache is not None:
+                info["cache"] = self.cache.get_stats()
+            return info
     
     def encode_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
         """
@@ -101,6 +213,50 @@ class BGEVectorizer:
         if self.use_simple:
             return self.model.encode_texts(texts, batch_size)
         
+        encode = self._encode_batch
+        if self._mp_encoder is not None:
+            encode = lambda missing, _: self._mp_encoder.encode(missing)
+        if self.cache is not None:
+            return self.cache.encode(texts, lambda missing: encode(missing, batch_size))
+        return encode(texts, batch_size)
+    
+    @contextmanager
+    def multiprocess(self,
+                     num_workers: Optional[int] = None,
+                     threads_per_worker: Optional[int] = None,
+                     min_texts: int = 4096):
+        """
+        在with块内使用多进程编码文档（用于大规模构建），退出时关闭工作进程
+        
+        缓存查找仍在当前进程进行，只有未命中的文本分发给工作进程；
+        输入少于min_texts或离线模式下仍在当前进程编码。
+        
+        Args:
+            num_workers: 工作进程数，默认按可用核心数计算
+            threads_per_worker: 每个进程的计算线程数
+            min_texts: 启用多进程的最小文本数
+            
+        Returns:
+            MultiProcessEncoder实例
+        """
+        from .multiprocess_encoder import MultiProcessEncoder
+        
+        if self.use_simple:
+            yield None
+            return
+        encoder = MultiProcessEncoder(
+            self.model_name, self.backend, num_workers, threads_per_worker,
+            min_texts=min_texts, fallback=lambda texts: self._encode_batch(texts, 32)
+        )
+        self._mp_encoder = encoder
+        try:
+            yield encoder
+        finally:
+            self._mp_encoder = None
+            encoder.close()
+    
+    def _encode_batch(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """使用BGE模型编码文本（sentence-transformers内部已按长度排序组批）"""
         embeddings = self.model.encode(
             texts,
             batch_size=batch_size,
@@ -108,7 +264,7 @@ class BGEVectorizer:
             convert_to_tensor=True,
             normalize_embeddings=True
         )
-        return embeddings.cpu().numpy()
+        return to_numpy(embeddings)
     
     def encode_single(self, text: str) -> np.ndarray:
         """
@@ -123,18 +279,65 @@ class BGEVectorizer:
         if self.use_simple:
             return self.model.encode_single(text)
         
+        if self.batcher is not None:
+            return self.batcher.submit(text)
+        
         embedding = self.model.encode(
             [text],
             convert_to_tensor=True,
             normalize_embeddings=True
         )
-        return embedding[0].cpu().numpy()
+        return to_numpy(embedding[0])
+    
+    def enable_micro_batching(self, max_batch_size: int = 32, max_wait_ms: float = 5.0) -> None:
+        """
+        启用查询编码微批：并发的encode_single调用会合并为一次前向计算
+        
+        Args:
+            max_batch_size: 单批最大文本数
+            max_wait_ms: 批次收集的最长等待时间（毫秒）
+        """
+        self._batching_config = (max_batch_size, max_wait_ms)
+        if self.is_loaded:
+            self._start_batcher()
+    
+    def _start_batcher(self) -> None:
+        """模型加载后创建微批调度器"""
+        if self._use_simple or self.batcher is not None:
+            return
+        max_batch_size, max_wait_ms = self._batching_config
+        
+        def encode_batch(texts: List[str]) -> np.ndarray:
+            embeddings = self.model.encode(
+                texts,
+                batch_size=len(texts),
+                convert_to_tensor=True,
+                normalize_embeddings=True
+            )
+            return to_numpy(embeddings)
+        
+        self.batcher = MicroBatcher(encode_batch, max_batch_size, max_wait_ms, name="bi-encoder")
+        print(f"查询编码微批已启用: max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}")
+    
+    def close(self) -> None:
+        """停止微批调度器并释放注册表中的模型引用"""
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+        if self._model is not None and not self._use_simple:
+            get_model_registry().release(self.model_name, BI_ENCODER, self.backend)
+        self._model = None
+        self._use_simple = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
 
 class SimpleReranker:
     """简单的重排器，使用TF-IDF相似度"""
     
     def __init__(self):
         """初始化简单重排器"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
         self.vectorizer = TfidfVectorizer(
             max_features=1000,
             stop_words=None,
@@ -161,6 +364,7 @@ class SimpleReranker:
         embeddings = self.vectorizer.fit_transform(all_texts)
         
         # 计算相似度
+        from sklearn.metrics.pairwise import cosine_similarity
         query_embedding = embeddings[0:1]
         doc_embeddings = embeddings[1:]
         
@@ -182,21 +386,81 @@ class SimpleReranker:
 class CrossEncoderReranker:
     """Cross-Encoder重排器"""
     
-    def __init__(self, model_name="BAAI/bge-reranker-v2-m3"):
-        """初始化Cross-Encoder重排器"""
-        try:
-            print(f"🔄 正在加载Cross-Encoder模型: {model_name}")
-            self.model = CrossEncoder(model_name)
-            print(f"✅ Cross-Encoder模型加载完成: {model_name}")
-            self.use_simple = False
-        except Exception as e:
-            print(f"❌ 无法加载Cross-Encoder模型: {e}")
-            print("🔄 切换到TF-IDF重排器（离线模式）")
-            self.model = SimpleReranker()
-            self.use_simple = True
+    def __init__(self, model_name="BAAI/bge-reranker-v2-m3", backend="torch"):
+        """
+        初始化Cross-Encoder重排器
+        
+        Args:
+            model_name: Cross-Encoder模型名称
+            backend: 推理后端，"torch"、"onnx" 或 "onnx-int8"
+        """
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}，可选: {INFERENCE_BACKENDS}")
+        self.model_name = model_name
+        self.backend = backend
+        self.batcher = None
+        self.load_seconds = None
+        
+        # 模型在首次使用（或显式调用load）时才加载
+        self._model = None
+        self._use_simple = None
+        self._batching_config = None
+        self._load_lock = threading.Lock()
+    
+    @property
+    def is_loaded(self) -> bool:
+        """模型是否已加载"""
+        return self._model is not None
+    
+    @property
+    def model(self):
+        """底层模型，首次访问时加载"""
+        self.load()
+        return self._model
+    
+    @property
+    def use_simple(self) -> bool:
+        """是否处于TF-IDF离线模式，首次访问时加载模型"""
+        self.load()
+        return self._use_simple
+    
+    def load(self) -> None:
+        """加载模型（线程安全，只加载一次）"""
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            start = time.perf_counter()
+            model_name = self.model_name
+            backend = self.backend
+            try:
+                print(f"🔄 正在加载Cross-Encoder模型: {model_name} (后端: {backend})")
+                # 从进程级注册表获取，同一模型在进程内只加载一次
+                model = get_model_registry().acquire(model_name, CROSS_ENCODER, backend)
+                print(f"✅ Cross-Encoder模型加载完成: {model_name}")
+                use_simple = False
+            except Exception as e:
+                print(f"❌ 无法加载Cross-Encoder模型: {e}")
+                print("🔄 切换到TF-IDF重排器（离线模式）")
+                model = SimpleReranker()
+                use_simple = True
+            
+            self._use_simple = use_simple
+            self._model = model
+            self.load_seconds = time.perf_counter() - start
+            if self._batching_config is not None:
+                self._start_batcher()
     
     def get_model_info(self):
         """获取模型信息"""
+        if not self.is_loaded:
+            return {
+                "type": "Cross-Encoder",
+                "mode": "not_loaded",
+                "backend": self.backend,
+                "description": f"Cross-Encoder模型尚未加载: {self.model_name}"
+            }
         if self.use_simple:
             return {
                 "type": "TF-IDF",
@@ -207,9 +471,54 @@ class CrossEncoderReranker:
             return {
                 "type": "Cross-Encoder",
                 "mode": "online",
+                "backend": self.backend,
                 "description": f"使用Cross-Encoder模型: {self.model.model_name if hasattr(self.model, 'model_name') else 'Unknown'}"
             }
     
+    def enable_micro_batching(self, max_batch_size: int = 64, max_wait_ms: float = 5.0) -> None:
+        """
+        启用重排微批：并发请求的查询-文档对会合并为一次predict调用
+        
+        Args:
+            max_batch_size: 单批最大查询-文档对数
+            max_wait_ms: 批次收集的最长等待时间（毫秒）
+        """
+        self._batching_config = (max_batch_size, max_wait_ms)
+        if self.is_loaded:
+            self._start_batcher()
+    
+    def _start_batcher(self) -> None:
+        """模型加载后创建微批调度器"""
+        if self._use_simple or self.batcher is not None:
+            return
+        max_batch_size, max_wait_ms = self._batching_config
+        
+        def predict_batch(pairs: List[Tuple[str, str]]) -> np.ndarray:
+            return self._predict_bucketed(pairs)
+        
+        self.batcher = MicroBatcher(predict_batch, max_batch_size, max_wait_ms, name="cross-encoder")
+        print(f"重排微批已启用: max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}")
+    
+    def _predict_bucketed(self, pairs: List[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        """按查询-文档对的token长度分桶组批打分，输出保持原始顺序"""
+        if len(pairs) <= batch_size:
+            return np.asarray(self.model.predict(pairs, batch_size=batch_size))
+        
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        max_length = getattr(self.model, 'max_length', None) or 512
+        # 同一查询会重复出现，分别计算查询和文档长度后相加
+        query_lengths = {}
+        for query in dict.fromkeys(query for query, _ in pairs):
+            query_lengths[query] = token_lengths(tokenizer, [query], max_length)[0]
+        doc_lengths = token_lengths(tokenizer, [doc for _, doc in pairs], max_length)
+        lengths = [min(query_lengths[query] + doc_length, max_length)
+                   for (query, _), doc_length in zip(pairs, doc_lengths)]
+        
+        scores = np.empty(len(pairs), dtype=np.float32)
+        for indices in length_bucketed_batches(lengths, batch_size):
+            scores[indices] = self.model.predict([pairs[i] for i in indices], batch_size=len(indices))
+        return scores
+    
     def rerank(self, query: str, documents: List[str], top_k: int = 5) -> List[Dict]:
         """
         对文档进行重排
@@ -229,7 +538,10 @@ class CrossEncoderReranker:
         query_doc_pairs = [(query, doc) for doc in documents]
         
         # 计算分数
-        scores = self.model.predict(query_doc_pairs)
+        if self.batcher is not None:
+            scores = self.batcher.submit_many(query_doc_pairs)
+        else:
+            scores = self._predict_bucketed(query_doc_pairs)
         
         # 创建结果列表
         results = []
@@ -243,27 +555,97 @@ class CrossEncoderReranker:
         # 按分数排序
         results.sort(key=lambda x: x['score'], reverse=True)
         return results[:top_k]
+    
+    def close(self) -> None:
+        """停止微批调度器并释放注册表中的模型引用"""
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+        if self._model is not None and not self._use_simple:
+            get_model_registry().release(self.model_name, CROSS_ENCODER, self.backend)
+        self._model = None
+        self._use_simple = None
 
 class AdvancedRAGVectorizer:
     """高级RAG向量化器，集成Bi-Encoder和Cross-Encoder"""
     
     def __init__(self, 
                  bi_encoder_model="BAAI/bge-small-zh-v1.5",
-                 cross_encoder_model="BAAI/bge-reranker-v2-m3"):
+                 cross_encoder_model="BAAI/bge-reranker-v2-m3",
+                 embedding_cache_dir=None,
+                 inference_backend="torch"):
         """
         初始化高级RAG向量化器
         
         Args:
             bi_encoder_model: Bi-Encoder模型名称
             cross_encoder_model: Cross-Encoder模型名称
+            embedding_cache_dir: Bi-Encoder向量缓存目录，为None时不启用缓存
+            inference_backend: 推理后端，"torch"、"onnx" 或 "onnx-int8"
         """
-        self.bi_encoder = BGEVectorizer(bi_encoder_model)
-        self.cross_encoder = CrossEncoderReranker(cross_encoder_model)
+        self.bi_encoder = BGEVectorizer(bi_encoder_model, cache_dir=embedding_cache_dir,
+                                        backend=inference_backend)
+        self.cross_encoder = CrossEncoderReranker(cross_encoder_model, backend=inference_backend)
+        
+        # 预计算的文档向量矩阵（float32、L2归一化、C连续），行与self.doc_texts对齐
+        self.doc_texts: List[str] = []
+        self.doc_embeddings: Optional[np.ndarray] = None
         print("高级RAG向量化器初始化完成")
     
+    def index_documents(self, documents: List[str]) -> None:
+        """
+        编码文档并重建文档向量矩阵
+        
+        Args:
+            documents: 文档列表
+        """
+        self.doc_texts = []
+        self.doc_embeddings = None
+        self.add_documents(documents)
+    
+    def add_documents(self, documents: List[str]) -> None:
+        """
+        增量添加文档，只编码新增的文档
+        
+        Args:
+            documents: 新增文档列表
+        """
+        if not documents:
+            return
+        
+        new_embeddings = self._normalize(self.bi_encoder.encode_texts(list(documents)))
+        if self.doc_embeddings is None:
+            self.doc_embeddings = new_embeddings
+        else:
+            self.doc_embeddings = np.ascontiguousarray(
+                np.vstack([self.doc_embeddings, new_embeddings])
+            )
+        self.doc_texts.extend(documents)
+        print(f"文档向量矩阵已更新: {self.doc_embeddings.shape[0]} x {self.doc_embeddings.shape[1]}")
+    
+    def _ensure_indexed(self, documents: List[str]) -> None:
+        """确保文档向量矩阵与给定文档列表一致，必要时增量更新或重建"""
+        indexed_count = len(self.doc_texts)
+        if len(documents) == indexed_count and documents == self.doc_texts:
+            return
+        if len(documents) > indexed_count and documents[:indexed_count] == self.doc_texts:
+            self.add_documents(documents[indexed_count:])
+            return
+        self.index_documents(documents)
+    
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """L2归一化，返回float32的C连续数组"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(1, -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(embeddings / norms)
+    
     def retrieve_and_rerank(self, 
                            query: str, 
-                           documents: List[str], 
+                           documents: Optional[List[str]] = None, 
                            top_k_retrieve: int = 20, 
                            top_k_final: int = 5) -> List[Dict]:
         """
@@ -271,13 +653,16 @@ class AdvancedRAGVectorizer:
         
         Args:
             query: 查询文本
-            documents: 文档列表
+            documents: 文档列表，为None时使用已建立索引的文档
             top_k_retrieve: 粗检索候选数量
             top_k_final: 最终结果数量
             
         Returns:
             最终结果列表
         """
+        if documents is None:
+            documents = self.doc_texts
+        
         print(f"开始检索-重排流程...")
         print(f"查询: {query}")
         print(f"文档总数: {len(documents)}")
@@ -296,27 +681,40 @@ class AdvancedRAGVectorizer:
     def _bi_encoder_retrieve(self, query: str, documents: List[str], top_k: int) -> List[Dict]:
         """Bi-Encoder粗检索"""
         
-        # 编码查询和文档
-        query_embedding = self.bi_encoder.model.encode(query, convert_to_tensor=True)
-        doc_embeddings = self.bi_encoder.model.encode(documents, convert_to_tensor=True)
+        # 文档向量只在文档变化时编码，每次查询只编码查询本身
+        self._ensure_indexed(documents)
+        if self.doc_embeddings is None:
+            return []
         
-        # 计算余弦相似度
-        similarities = torch.cosine_similarity(query_embedding.unsqueeze(0), doc_embeddings)
+        query_embedding = self._normalize(self.bi_encoder.encode_single(query))[0]
         
-        # 获取top_k候选
-        top_indices = torch.argsort(similarities, descending=True)[:top_k]
+        # 归一化向量的点积即余弦相似度
+        similarities = self.doc_embeddings @ query_embedding
+        
+        # 部分选择top_k候选，再对候选排序
+        top_k = min(top_k, similarities.shape[0])
+        if top_k < similarities.shape[0]:
+            top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        else:
+            top_indices = np.arange(similarities.shape[0])
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
         
         candidates = []
         for idx in top_indices:
             candidates.append({
-                'document': documents[idx],
-                'bi_encoder_score': similarities[idx].item(),
-                'index': idx.item()
+                'document': self.doc_texts[idx],
+                'bi_encoder_score': float(similarities[idx]),
+                'index': int(idx)
             })
         
         print(f"粗检索完成，获得 {len(candidates)} 个候选文档")
         return candidates
     
+    def close(self) -> None:
+        """释放Bi-Encoder和Cross-Encoder占用的资源"""
+        self.bi_encoder.close()
+        self.cross_encoder.close()
+    
     def _cross_encoder_rerank(self, query: str, candidates: List[Dict], top_k: int) -> List[Dict]:
         """Cross-Encoder精排"""
         
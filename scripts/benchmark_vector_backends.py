@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量存储后端基准测试
+对比ChromaDB与内存映射NumPy扁平索引在不同规模下的写入耗时、打开耗时和检索延迟
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rag_system.vector_db import create_vector_db
+
+def random_unit_vectors(count, dim, seed):
+    """生成随机归一化向量"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000.0
+
+def measure_search(db, queries, top_k):
+    """逐条检索，返回每次耗时（秒）"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        db.search(query, top_k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def reader_process(args):
+    """只读打开同一快照并检索，模拟多个服务进程"""
+    persist_directory, queries, top_k = args
+    start = time.perf_counter()
+    db = create_vector_db("numpy", persist_directory, read_only=True)
+    db.get_or_create_collection("benchmark")
+    open_seconds = time.perf_counter() - start
+    latencies = measure_search(db, queries, top_k)
+    return open_seconds, percentile_ms(latencies, 50), percentile_ms(latencies, 95)
+
+def bench_backend(backend, vectors, queries, top_k, batch_size, workdir):
+    """构建并测试单个后端"""
+    persist_directory = os.path.join(workdir, backend)
+    ids = [f"vec_{i}" for i in range(len(vectors))]
+    documents = [f"文档{i}" for i in range(len(vectors))]
+    metadatas = [{"type": "benchmark"} for _ in range(len(vectors))]
+
+    db = create_vector_db(backend, persist_directory, batch_size=batch_size)
+    db.get_or_create_collection("benchmark")
+    start = time.perf_counter()
+    db.add_documents(documents, vectors, metadatas, ids)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reopened = create_vector_db(backend, persist_directory)
+    reopened.get_or_create_collection("benchmark")
+    open_seconds = time.perf_counter() - start
+
+    measure_search(reopened, queries[:5], top_k)
+    latencies = measure_search(reopened, queries, top_k)
+    return {
+        "build_s": build_seconds,
+        "open_s": open_seconds,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "persist_directory": persist_directory
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储后端基准测试")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="向量数量，逗号分隔")
+    parser.add_argument("--dim", type=int, default=512, help="向量维度（bge-small-zh为512）")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入的记录数")
+    parser.add_argument("--chroma-max", type=int, default=1000000, help="超过该规模时跳过ChromaDB")
+    parser.add_argument("--readers", type=int, default=4, help="只读共享快照的进程数，0表示不测试")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vector_backend_bench_")
+    print(f"📁 临时目录: {workdir}")
+    rows = []
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            print(f"\n📊 规模: {size} 个向量 × {args.dim} 维")
+            vectors = random_unit_vectors(size, args.dim, seed=0)
+            queries = random_unit_vectors(args.queries, args.dim, seed=1)
+            size_dir = os.path.join(workdir, str(size))
+
+            backends = ["numpy"] + (["chroma"] if size <= args.chroma_max else [])
+            for backend in backends:
+                result = bench_backend(backend, vectors, queries, args.top_k, args.batch_size, size_dir)
+                rows.append((size, backend, result))
+                print(f"  {backend:6s} 写入 {result['build_s']:8.2f}s  打开 {result['open_s'] * 1000:8.1f}ms  "
+                      f"检索 p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms")
+
+            if args.readers:
+                numpy_dir = os.path.join(size_dir, "numpy")
+                with Pool(args.readers) as pool:
+                    stats = pool.map(reader_process,
+                                     [(numpy_dir, queries, args.top_k)] * args.readers)
+                print(f"  {args.readers} 个只读进程共享快照: "
+                      f"打开 {max(s[0] for s in stats) * 1000:.1f}ms  "
+                      f"检索 p50 {max(s[1] for s in stats):.2f}ms  p95 {max(s[2] for s in stats):.2f}ms")
+
+            del vectors
+            shutil.rmtree(size_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n📋 汇总")
+    print(f"{'规模':>10} {'后端':>8} {'写入(s)':>10} {'打开(ms)':>10} {'p50(ms)':>10} {'p95(ms)':>10}")
+    for size, backend, result in rows:
+        print(f"{size:>10} {backend:>8} {result['build_s']:>10.2f} {result['open_s'] * 1000:>10.1f} "
+              f"{result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
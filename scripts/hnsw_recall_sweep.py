@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HNSW召回率-延迟扫描
+以暴力检索为基准，测量当前集合在不同ef_search（以及可选的M、ef_construction）下的recall@k和查询延迟
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rag_system.vector_db import ChromaVectorDB
+
+def parse_ints(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+def exact_top_k(vectors, queries, k):
+    """暴力检索的真实近邻（余弦相似度）"""
+    truth = []
+    # 分块计算，避免几十万行时一次性生成过大的相似度矩阵
+    for begin in range(0, len(queries), 32):
+        scores = queries[begin:begin + 32] @ vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        truth.extend(set(row) for row in top)
+    return truth
+
+def sample_queries(vectors, count, noise, seed):
+    """从集合中抽取向量并加入噪声作为查询，避免查询与文档完全重合"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    queries = vectors[picks] + noise * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def sweep_ef(db, ids, queries, truth, k, ef_values):
+    """
+    对每个ef测量recall@k和延迟
+    
+    ef_search是集合级设置：每个取值只修改一次，计时的是普通查询；扫描结束后恢复原设置
+    """
+    index_of = {doc_id: i for i, doc_id in enumerate(ids)}
+    original_ef = db.get_search_ef()
+    rows = []
+    try:
+        for ef in ef_values:
+            rows.append(measure_ef(db, index_of, queries, truth, k, ef))
+    finally:
+        if original_ef is not None:
+            db.set_search_ef(original_ef)
+        else:
+            print(f"⚠️ 集合原先未显式设置ef_search，扫描后保持为 {ef_values[-1]}，请按需调用set_search_ef修改")
+    return rows
+
+def measure_ef(db, index_of, queries, truth, k, ef):
+    """把集合的ef_search设为ef后测量普通查询的recall@k和延迟"""
+    db.set_search_ef(ef)
+    db.search(queries[0], k)
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = db.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        found = {index_of[doc_id] for doc_id in result['ids'][0]}
+        hits += len(found & expected)
+    return {
+        "ef": ef,
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000.0,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000.0
+    }
+
+def print_rows(label, rows, target_recall):
+    print(f"\n📊 {label}")
+    print(f"{'ef_search':>10} {'recall@k':>10} {'p50(ms)':>10} {'p95(ms)':>10}")
+    for row in rows:
+        print(f"{row['ef']:>10} {row['recall']:>10.4f} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f}")
+    passing = [row for row in rows if row['recall'] >= target_recall]
+    if passing:
+        best = min(passing, key=lambda row: row['p95_ms'])
+        print(f"✅ 满足 recall@k ≥ {target_recall} 的最低延迟设置: ef_search={best['ef']}")
+    else:
+        print(f"⚠️ 没有设置达到 recall@k ≥ {target_recall}，请增大ef_search或M")
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW召回率-延迟扫描")
+    parser.add_argument("--persist-directory", default="./vector_db")
+    parser.add_argument("--collection", default="student_knowledge")
+    parser.add_argument("--k", type=int, default=20, help="recall@k中的k")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05, help="查询向量扰动幅度")
+    parser.add_argument("--ef", default="10,20,40,80,160,320", help="ef_search取值，逗号分隔")
+    parser.add_argument("--m", default="", help="可选，M取值；指定时在临时集合中重建索引后扫描")
+    parser.add_argument("--ef-construction", default="", help="可选，ef_construction取值")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    db = ChromaVectorDB(args.persist_directory)
+    db.get_or_create_collection(args.collection)
+    data = db.get_all()
+    ids = data['ids']
+    if not ids:
+        print("❌ 集合为空")
+        return
+    vectors = np.asarray(data['embeddings'], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    k = min(args.k, len(ids))
+    print(f"📚 集合 {args.collection}: {len(ids)} 个向量 × {vectors.shape[1]} 维，"
+          f"当前参数 {db.collection.metadata}")
+
+    queries = sample_queries(vectors, args.queries, args.noise, seed=0)
+    start = time.perf_counter()
+    truth = exact_top_k(vectors, queries, k)
+    brute_ms = (time.perf_counter() - start) * 1000.0 / len(queries)
+    print(f"🎯 暴力检索基准: 平均 {brute_ms:.2f}ms/查询")
+
+    ef_values = parse_ints(args.ef)
+    print_rows("当前集合", sweep_ef(db, ids, queries, truth, k, ef_values), args.target_recall)
+
+    m_values = parse_ints(args.m)
+    construction_values = parse_ints(args.ef_construction) or [None]
+    if not m_values:
+        return
+
+    # 在临时目录中按不同建图参数重建集合
+    workdir = tempfile.mkdtemp(prefix="hnsw_sweep_")
+    try:
+        for m in m_values:
+            for ef_construction in construction_values:
+                temp_db = ChromaVectorDB(os.path.join(workdir, f"m{m}_efc{ef_construction}"))
+                temp_db.create_collection("sweep", M=m, ef_construction=ef_construction)
+                start = time.perf_counter()
+                temp_db.add_documents(data['documents'], vectors, data['metadatas'], ids)
+                build_seconds = time.perf_counter() - start
+                rows = sweep_ef(temp_db, ids, queries, truth, k, ef_values)
+                print_rows(f"M={m} ef_construction={ef_construction or '默认'}（建图 {build_seconds:.2f}s）",
+                           rows, args.target_recall)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
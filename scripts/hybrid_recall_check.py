@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+混合检索召回检查
+比较纯向量检索与向量+BM25（RRF融合）交给Cross-Encoder的候选集合的召回率。
+参考答案为重排器在宽候选池（向量检索与BM25各取--pool个）上选出的top_k_final文档；
+混合检索在更小的候选集合上召回不低于纯向量检索时，才应启用hybrid_retrieval。
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rag_system import RAGSystem
+
+DEFAULT_QUESTIONS = [
+    "有哪些高薪就业的毕业生？",
+    "微电子科学与工程专业的培养目标是什么？",
+    "GPA成绩高的学生就业情况如何？",
+    "有哪些核心课程？",
+    "人工智能方向的毕业生去向如何？",
+    "需要修多少学分才能毕业？",
+    "哪些公司招聘微电子专业的学生？",
+    "去腾讯工作的毕业生有哪些？",
+    "去宁德时代工作的毕业生有哪些？",
+    "微电子专业的实践环节有哪些？"
+]
+
+def load_questions(path):
+    if not path:
+        return DEFAULT_QUESTIONS
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def recall(candidates, reference):
+    if not reference:
+        return 1.0
+    return len(set(candidates) & set(reference)) / len(reference)
+
+def check_question(rag, question, collection, bm25_index, args):
+    """
+    计算一个问题在三种候选集合上的召回率
+
+    Returns:
+        {"dense": 纯向量top_k_retrieve, "dense_small": 纯向量取与混合相同数量, "hybrid": 混合检索}
+    """
+    query_embedding = rag.vectorizer.bi_encoder.encode_single(question)
+
+    dense = rag.vector_db.search(query_embedding, args.pool, collection=collection)
+    dense_docs = dense['documents'][0] if dense['documents'] else []
+    sparse_docs = [hit["document"] for hit in bm25_index.search(question, args.pool)]
+    pool = list(dict.fromkeys(dense_docs + sparse_docs))
+    reference = [result['document'] for result in
+                 rag.vectorizer.cross_encoder.rerank(question, pool, args.top_k_final)]
+
+    hybrid_docs = rag._hybrid_retrieve(
+        question, query_embedding, bm25_index, args.top_k_retrieve, args.top_k_final,
+        collection=collection
+    )
+    return {
+        "dense": recall(dense_docs[:args.top_k_retrieve], reference),
+        "dense_small": recall(dense_docs[:len(hybrid_docs)], reference),
+        "hybrid": recall(hybrid_docs, reference),
+        "hybrid_candidates": len(hybrid_docs)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="混合检索召回检查")
+    parser.add_argument("--persist-directory", default="./vector_db")
+    parser.add_argument("--collection", default="student_knowledge")
+    parser.add_argument("--questions", default="", help="问题文件，每行一个问题；默认使用内置问题")
+    parser.add_argument("--top-k-retrieve", type=int, default=20)
+    parser.add_argument("--top-k-final", type=int, default=5)
+    parser.add_argument("--rerank-candidates", type=int, default=10)
+    parser.add_argument("--pool", type=int, default=100, help="构造参考答案的每路候选数量")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="允许混合检索召回低于纯向量检索的幅度")
+    args = parser.parse_args()
+
+    rag = RAGSystem(persist_directory=args.persist_directory,
+                    semantic_cache=False,
+                    hybrid_retrieval=True,
+                    rerank_candidates=args.rerank_candidates)
+    collection_name = rag.resolve_collection(args.collection)
+    collection = rag.vector_db.open_collection(collection_name)
+    bm25_index = rag._get_bm25_index(collection_name, collection)
+    if bm25_index is None:
+        print(f"❌ 集合 {collection_name} 没有可用的BM25索引，请先重新构建知识库")
+        return
+
+    questions = load_questions(args.questions)
+    print(f"📚 集合 {collection_name}: {collection.count()} 个文档，{len(questions)} 个问题")
+
+    totals = {"dense": 0.0, "dense_small": 0.0, "hybrid": 0.0, "hybrid_candidates": 0}
+    start = time.perf_counter()
+    print(f"\n{'dense':>8} {'dense@n':>8} {'hybrid':>8}  问题")
+    for question in questions:
+        row = check_question(rag, question, collection, bm25_index, args)
+        for key in totals:
+            totals[key] += row[key]
+        print(f"{row['dense']:>8.2f} {row['dense_small']:>8.2f} {row['hybrid']:>8.2f}  {question}")
+
+    count = len(questions)
+    dense_recall = totals["dense"] / count
+    hybrid_recall = totals["hybrid"] / count
+    candidates = totals["hybrid_candidates"] / count
+    print(f"\n📊 平均召回率（参考: 重排器在宽候选池上的top-{args.top_k_final}，耗时 {time.perf_counter() - start:.1f}s）")
+    print(f"   纯向量 top-{args.top_k_retrieve}:      {dense_recall:.4f}")
+    print(f"   纯向量 top-{candidates:.0f}:       {totals['dense_small'] / count:.4f}")
+    print(f"   混合检索（{candidates:.1f} 个候选）: {hybrid_recall:.4f}")
+    if hybrid_recall + args.tolerance >= dense_recall:
+        print(f"✅ 混合检索以 {candidates:.1f} 个候选达到纯向量 top-{args.top_k_retrieve} 的召回，可以启用hybrid_retrieval")
+    else:
+        print("⚠️ 混合检索召回低于纯向量检索，保持hybrid_retrieval关闭或增大rerank_candidates")
+
+    rag.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ONNX后端一致性检查
+在自带数据上对比PyTorch后端与ONNX(/int8)后端的向量余弦、检索重合度和重排分数漂移
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmark_length_bucketing import load_mixed_corpus
+from rag_system.vectorizer import BGEVectorizer, CrossEncoderReranker
+
+TEST_QUESTIONS = [
+    "微电子专业的毕业生就业情况如何？",
+    "需要修多少学分才能毕业？",
+    "GPA高的学生一般去哪里工作？",
+    "集成电路设计与集成系统专业的核心课程有哪些？",
+    "哪些公司招聘微电子专业的学生？"
+]
+
+def rank_correlation(a: np.ndarray, b: np.ndarray) -> float:
+    """Spearman秩相关系数"""
+    rank_a = np.argsort(np.argsort(a))
+    rank_b = np.argsort(np.argsort(b))
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+def check_bi_encoder(model_name, backend, documents, top_k):
+    """对比Bi-Encoder向量与检索结果"""
+    reference = BGEVectorizer(model_name, force_bge=True, backend="torch")
+    candidate = BGEVectorizer(model_name, force_bge=True, backend=backend)
+
+    start = time.perf_counter()
+    ref_docs = reference.encode_texts(documents)
+    ref_time = time.perf_counter() - start
+    start = time.perf_counter()
+    cand_docs = candidate.encode_texts(documents)
+    cand_time = time.perf_counter() - start
+
+    cosines = np.sum(ref_docs * cand_docs, axis=1)
+    print(f"\n🔄 Bi-Encoder ({model_name})")
+    print(f"   文档向量余弦: 最小 {cosines.min():.5f}，平均 {cosines.mean():.5f}")
+    print(f"   编码耗时: torch {ref_time:.2f}s，{backend} {cand_time:.2f}s "
+          f"(加速 {ref_time / cand_time:.2f}x)")
+
+    overlaps = []
+    for question in TEST_QUESTIONS:
+        ref_top = np.argsort(-(ref_docs @ reference.encode_single(question)))[:top_k]
+        cand_top = np.argsort(-(cand_docs @ candidate.encode_single(question)))[:top_k]
+        overlaps.append(len(set(ref_top) & set(cand_top)) / top_k)
+    print(f"   检索top{top_k}重合率: 最小 {min(overlaps):.2%}，平均 {np.mean(overlaps):.2%}")
+    return float(cosines.min())
+
+def check_cross_encoder(model_name, backend, documents, candidates):
+    """对比Cross-Encoder打分"""
+    reference = CrossEncoderReranker(model_name, backend="torch")
+    candidate = CrossEncoderReranker(model_name, backend=backend)
+    if reference.use_simple or candidate.use_simple:
+        print("❌ Cross-Encoder模型加载失败，跳过重排检查")
+        return None
+
+    max_drifts = []
+    correlations = []
+    ref_time = cand_time = 0.0
+    for question in TEST_QUESTIONS:
+        pairs = [(question, doc) for doc in documents[:candidates]]
+        start = time.perf_counter()
+        ref_scores = np.asarray(reference.model.predict(pairs))
+        ref_time += time.perf_counter() - start
+        start = time.perf_counter()
+        cand_scores = np.asarray(candidate.model.predict(pairs))
+        cand_time += time.perf_counter() - start
+        max_drifts.append(float(np.abs(ref_scores - cand_scores).max()))
+        correlations.append(rank_correlation(ref_scores, cand_scores))
+
+    print(f"\n🔄 Cross-Encoder ({model_name})")
+    print(f"   分数漂移: 最大 {max(max_drifts):.5f}")
+    print(f"   排序相关(Spearman): 最小 {min(correlations):.5f}")
+    print(f"   打分耗时: torch {ref_time:.2f}s，{backend} {cand_time:.2f}s "
+          f"(加速 {ref_time / cand_time:.2f}x)")
+    return max(max_drifts)
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX后端一致性检查")
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--bi-encoder", default="BAAI/bge-small-zh-v1.5")
+    parser.add_argument("--cross-encoder", default="BAAI/bge-reranker-v2-m3")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=40, help="每个问题参与重排的文档数")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="向量余弦下限")
+    parser.add_argument("--max-drift", type=float, default=0.05, help="重排分数漂移上限")
+    args = parser.parse_args()
+
+    documents = load_mixed_corpus()
+    print(f"📚 语料: {len(documents)} 个文档，后端: {args.backend}")
+
+    min_cosine = check_bi_encoder(args.bi_encoder, args.backend, documents, args.top_k)
+    max_drift = check_cross_encoder(args.cross_encoder, args.backend, documents, args.candidates)
+
+    passed = min_cosine >= args.min_cosine and (max_drift is None or max_drift <= args.max_drift)
+    print("\n" + ("✅ 一致性检查通过" if passed else "❌ 一致性检查未通过"))
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,138 @@
 import os
+import sys
 import json
+import time
+import argparse
+from multiprocessing import Pool
 from PyPDF2 import PdfReader
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rag_system.build_manifest import BuildManifest
+
 # PDF文件所在目录
 pdf_dir = os.path.join(os.path.dirname(__file__), '../培养方案')
 # 输出JSON文件也放在同一目录
 
-for filename in os.listdir(pdf_dir):
-    if filename.lower().endswith('.pdf'):
-        pdf_path = os.path.join(pdf_dir, filename)
-        json_path = os.path.splitext(pdf_path)[0] + '.json'
-        try:
-            reader = PdfReader(pdf_path)
-            pages = [page.extract_text() for page in reader.pages]
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(pages, f, ensure_ascii=False, indent=2)
-            print(f"已保存: {json_path}")
-        except Exception as e:
-            print(f"处理 {filename} 时出错: {e}") 
\ No newline at end of file
+# 与build_kb等脚本共用构建清单，每个PDF单独一个阶段
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), '../vector_db/build_manifest.json')
+STAGE_PREFIX = "pdf2json:"
+
+# 工作进程内缓存当前PDF的reader，连续的页任务不必重复解析文件结构
+_worker_reader = {"path": None, "reader": None}
+
+def extract_pdf_pages(pdf_path):
+    """逐页提取PDF文本"""
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() for page in reader.pages]
+
+def _extract_page(task):
+    """工作进程：提取单页文本，返回 (文件序号, 页码, 文本, 错误信息)"""
+    file_index, pdf_path, page_index = task
+    try:
+        if _worker_reader["path"] != pdf_path:
+            _worker_reader["reader"] = PdfReader(pdf_path)
+            _worker_reader["path"] = pdf_path
+        return file_index, page_index, _worker_reader["reader"].pages[page_index].extract_text(), None
+    except Exception as e:
+        return file_index, page_index, None, str(e)
+
+class PageJsonWriter:
+    """逐页写出JSON数组（格式与json.dump(pages, indent=2)一致），完成后原子替换"""
+
+    def __init__(self, json_path):
+        self.json_path = json_path
+        self.tmp_path = json_path + ".tmp"
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, text):
+        self.file.write("[\n  " if self.count == 0 else ",\n  ")
+        self.file.write(json.dumps(text, ensure_ascii=False))
+        self.count += 1
+
+    def commit(self):
+        self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+        os.replace(self.tmp_path, self.json_path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+def iter_page_tasks(pdf_jobs):
+    for file_index, (pdf_path, _, page_count) in enumerate(pdf_jobs):
+        for page_index in range(page_count):
+            yield file_index, pdf_path, page_index
+
+def main():
+    parser = argparse.ArgumentParser(description="并行、增量地把培养方案PDF逐页提取为JSON")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="提取进程数")
+    parser.add_argument("--chunksize", type=int, default=4, help="每次分发给工作进程的页数")
+    parser.add_argument("--force", action="store_true", help="忽略哈希，重新提取所有PDF")
+    args = parser.parse_args()
+
+    manifest = BuildManifest(MANIFEST_PATH)
+    pdf_jobs = []
+    skipped = 0
+    for filename in sorted(os.listdir(pdf_dir)):
+        if filename.lower().endswith('.pdf'):
+            pdf_path = os.path.join(pdf_dir, filename)
+            json_path = os.path.splitext(pdf_path)[0] + '.json'
+            # PDF和上次生成的JSON都没有变化时跳过
+            if not args.force and manifest.is_up_to_date(STAGE_PREFIX + filename, [pdf_path], outputs=[json_path]):
+                skipped += 1
+                continue
+            try:
+                page_count = len(PdfReader(pdf_path).pages)
+            except Exception as e:
+                print(f"处理 {filename} 时出错: {e}")
+                continue
+            if page_count == 0:
+                PageJsonWriter(json_path).commit()
+                manifest.record(STAGE_PREFIX + filename, [pdf_path], outputs=[json_path])
+                continue
+            pdf_jobs.append((pdf_path, json_path, page_count))
+
+    total_pages = sum(job[2] for job in pdf_jobs)
+    print(f"待提取 {len(pdf_jobs)} 个PDF，共 {total_pages} 页；未变化跳过 {skipped} 个")
+    if not pdf_jobs:
+        manifest.save()
+        return
+
+    # 所有页按 (文件, 页码) 顺序分发，imap按同样顺序返回，结果到达即写盘，
+    # 内存中只保留正在处理的少量页面
+    writers = {}
+    failed = set()
+    pages_done = 0
+    start = time.perf_counter()
+    with Pool(max(1, args.workers)) as pool:
+        for file_index, page_index, text, error in pool.imap(_extract_page, iter_page_tasks(pdf_jobs),
+                                                             chunksize=args.chunksize):
+            pdf_path, json_path, page_count = pdf_jobs[file_index]
+            if file_index not in failed:
+                if error is not None:
+                    print(f"处理 {os.path.basename(pdf_path)} 第{page_index + 1}页时出错: {error}")
+                    failed.add(file_index)
+                    if file_index in writers:
+                        writers.pop(file_index).abort()
+                else:
+                    if file_index not in writers:
+                        writers[file_index] = PageJsonWriter(json_path)
+                    writers[file_index].write(text or "")
+            pages_done += 1
+
+            if page_index + 1 == page_count and file_index not in failed:
+                writers.pop(file_index).commit()
+                manifest.record(STAGE_PREFIX + os.path.basename(pdf_path), [pdf_path], outputs=[json_path])
+                manifest.save()
+                print(f"已保存: {json_path}（{page_count} 页）")
+
+    elapsed = time.perf_counter() - start
+    print(f"提取完成: {pages_done} 页，耗时 {elapsed:.2f} 秒，"
+          f"{pages_done / elapsed if elapsed > 0 else 0:.1f} 页/秒（{args.workers} 个进程）")
+    if failed:
+        print(f"失败 {len(failed)} 个PDF，下次运行时会重试")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+知识库构建流水线
+PDF → 逐页文本 → 培养方案汇总 → 文档分块 → 向量化 → 向量库/BM25索引
+
+每个阶段的产物按内容寻址缓存在 pipeline_cache/ 下，输入未变化的阶段直接复用；
+互不依赖的阶段（培养方案链路与毕业生链路）并发执行。中断后重新运行同一命令即可
+从未完成的阶段继续。
+"""
+
+import os
+import sys
+import json
+import inspect
+import argparse
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from rag_system.pipeline import Pipeline, Stage
+from rag_system.embedding_cache import EmbeddingCache, model_fingerprint
+from rag_system.bm25_index import BM25Index, bm25_index_path
+from rag_system.vector_db import ChromaVectorDB
+from rag_system.document_ids import assign_document_ids
+from rag_system.model_registry import BI_ENCODER, get_model_registry
+from build_kb import (
+    DOC_FORMAT_VERSION, EMBEDDING_CACHE_DIR, GRADUATES_CSV, MIN_SECTION_CHARS,
+    PERSIST_DIRECTORY, PLANS_TXT, expected_model_path, graduate_documents, load_bge_model,
+    plan_documents, serving_collection_name, split_cultivation_plan
+)
+from process_all_cultivation_plans import combine_plans, summarize_plan
+
+PLAN_DIR = "培养方案"
+CACHE_DIR = "./pipeline_cache"
+
+_embedding_lock = threading.Lock()
+_embedding_state = {}
+
+def plan_source_files():
+    """培养方案目录下的PDF和已提取的JSON"""
+    if not os.path.isdir(PLAN_DIR):
+        return []
+    return sorted(os.path.join(PLAN_DIR, f) for f in os.listdir(PLAN_DIR)
+                  if f.lower().endswith(('.pdf', '.json')))
+
+def extract_pages():
+    """逐页提取培养方案文本；同名PDF和JSON都存在时以PDF为准"""
+    pages_by_file = {}
+    for path in plan_source_files():
+        stem, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() == '.pdf':
+            # 只有存在PDF时才需要PyPDF2
+            from pdf2json import extract_pdf_pages
+            pages_by_file[f"{stem}.json"] = extract_pdf_pages(path)
+        elif not any(os.path.exists(os.path.join(PLAN_DIR, stem + e)) for e in ('.pdf', '.PDF')):
+            with open(path, 'r', encoding='utf-8') as f:
+                pages_by_file[f"{stem}.json"] = json.load(f)
+    print(f"📄 提取 {len(pages_by_file)} 个培养方案，共 {sum(map(len, pages_by_file.values()))} 页")
+    return pages_by_file
+
+def summarize_plans(pages_by_file):
+    """整理各专业培养方案并生成合并文本"""
+    plans = [summarize_plan(pages, name) for name, pages in sorted(pages_by_file.items())]
+    for plan in plans:
+        print(f"   ✅ {plan['file_name']}: {plan['profession_name']}")
+    return combine_plans(plans)
+
+def plan_chunks(combined):
+    documents, metadatas = plan_documents(combined, PLANS_TXT)
+    print(f"📋 培养方案文档: {len(documents)} 个")
+    return documents, metadatas
+
+def graduate_chunks():
+    documents, metadatas = graduate_documents(GRADUATES_CSV)
+    print(f"📊 毕业生文档: {len(documents)} 个")
+    return documents, metadatas
+
+def _embedding_backend():
+    """两个向量化阶段共用同一个模型实例和向量缓存"""
+    with _embedding_lock:
+        if not _embedding_state:
+            model, model_path = load_bge_model()
+            _embedding_state["model"] = model
+            _embedding_state["model_path"] = model_path
+            _embedding_state["cache"] = EmbeddingCache(EMBEDDING_CACHE_DIR, model_fingerprint(model_path))
+        return _embedding_state["model"], _embedding_state["cache"]
+
+def release_embedding_backend():
+    """释放向量化阶段获取的模型引用（全部阶段命中缓存时未加载模型）"""
+    with _embedding_lock:
+        if _embedding_state:
+            get_model_registry().release(_embedding_state["model_path"], BI_ENCODER)
+            _embedding_state.clear()
+
+def embed_chunks(chunks):
+    """生成稳定文档ID并编码，产物包含写入向量库所需的全部数据"""
+    documents, metadatas = chunks
+    ids = assign_document_ids(documents, metadatas)
+    model, cache = _embedding_backend()
+    embeddings = cache.encode(
+        documents,
+        lambda batch: model.encode(batch, show_progress_bar=False, batch_size=32,
+                                   normalize_embeddings=True)
+    )
+    return {"ids": ids, "documents": documents, "metadatas": metadatas, "embeddings": embeddings}
+
+def index_documents(*parts):
+    """把预先计算的向量增量同步到ChromaDB，并重建BM25索引"""
+    ids, documents, metadatas, vectors = [], [], [], {}
+    for part in parts:
+        ids.extend(part["ids"])
+        documents.extend(part["documents"])
+        metadatas.extend(part["metadatas"])
+        vectors.update(zip(part["documents"], part["embeddings"]))
+
+    collection_name = serving_collection_name()
+    vector_db = ChromaVectorDB(PERSIST_DIRECTORY)
+    vector_db.get_or_create_collection(collection_name)
+    report = vector_db.sync_documents(ids, documents, metadatas,
+                                      lambda texts: [vectors[text] for text in texts])
+
+    bm25 = BM25Index()
+    bm25.collection_id = str(vector_db.collection.id)
+    bm25.add_documents(ids, documents, metadatas)
+    bm25.save(bm25_index_path(PERSIST_DIRECTORY, collection_name))
+    print(f"📚 新增: {report['added']} 个，更新: {report['updated']} 个，"
+          f"未变: {report['unchanged']} 个，删除: {report['removed']} 个")
+    return report
+
+def index_exists():
+    """向量库或BM25索引被删除时，即使输入未变也要重新写入"""
+    return (os.path.exists(bm25_index_path(PERSIST_DIRECTORY, serving_collection_name()))
+            and os.path.exists(os.path.join(PERSIST_DIRECTORY, "chroma.sqlite3")))
+
+def source_params(*functions, **params):
+    """阶段参数：相关函数的源码和设置，处理逻辑改动后对应阶段自动失效"""
+    params["source"] = "".join(inspect.getsource(fn) for fn in functions)
+    return params
+
+def build_stages():
+    doc_params = {"min_section_chars": MIN_SECTION_CHARS, "doc_format_version": DOC_FORMAT_VERSION}
+    embed_params = {"model_fingerprint": model_fingerprint(expected_model_path())}
+    return [
+        Stage("extract_pages", extract_pages, files=plan_source_files),
+        Stage("summarize_plans", summarize_plans, deps=["extract_pages"],
+              params=source_params(summarize_plan, combine_plans)),
+        Stage("plan_chunks", plan_chunks, deps=["summarize_plans"],
+              params=source_params(split_cultivation_plan, plan_documents, **doc_params)),
+        Stage("graduate_chunks", graduate_chunks, files=lambda: [GRADUATES_CSV],
+              params=source_params(graduate_documents, **doc_params)),
+        Stage("embed_plans", embed_chunks, deps=["plan_chunks"], params=embed_params),
+        Stage("embed_graduates", embed_chunks, deps=["graduate_chunks"], params=embed_params),
+        Stage("index", index_documents, deps=["embed_plans", "embed_graduates"],
+              params={"persist_directory": PERSIST_DIRECTORY, "collection": serving_collection_name()},
+              check=index_exists),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="分阶段构建知识库（可缓存、可中断续跑）")
+    parser.add_argument("--force", nargs="*", default=None, metavar="STAGE",
+                        help="忽略缓存重新执行的阶段，不带参数时重新执行全部阶段")
+    parser.add_argument("--max-workers", type=int, default=4, help="最大并发阶段数")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="阶段产物缓存目录")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    stages = build_stages()
+    names = [stage.name for stage in stages]
+    force = [] if args.force is None else (args.force or names)
+    unknown = set(force) - set(names)
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(sorted(unknown))}（可选: {', '.join(names)}）")
+
+    print("🚀 开始运行知识库构建流水线...")
+    pipeline = Pipeline(stages, cache_dir=args.cache_dir, max_workers=args.max_workers)
+    try:
+        report = pipeline.run(force=force)
+    finally:
+        release_embedding_backend()
+
+    print("\n⏱️ 各阶段耗时")
+    for record in report:
+        status = {"cached": "缓存", "ran": "执行"}.get(record["status"], "")
+        print(f"  {record['stage']:<18} {status:<4} {record['seconds']:>8.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rag_system.batching import MicroBatcher
+
+
+def test_results_are_returned_in_order():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_wait_ms=1)
+    try:
+        assert batcher.submit_many([1, 2, 3]) == [2, 4, 6]
+        assert batcher.submit(5) == 10
+    finally:
+        batcher.close()
+
+
+def test_concurrent_submissions_are_batched():
+    sizes = []
+    release = threading.Event()
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        release.wait(1.0)
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(batcher.submit, i) for i in range(8)]
+            release.set()
+            assert sorted(future.result(timeout=2) for future in futures) == list(range(8))
+        assert max(sizes) > 1
+        assert batcher.get_stats()["batch_size"]["count"] == len(sizes)
+    finally:
+        batcher.close()
+
+
+def test_batch_exception_reaches_every_caller():
+    def batch_fn(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(batch_fn, max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match="model failed"):
+            batcher.submit_many([1, 2])
+    finally:
+        batcher.close()
+
+
+def test_short_result_fails_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait_ms=1)
+    try:
+        with ThreadPoolExecutor(1) as pool:
+            future = pool.submit(batcher.submit_many, [1, 2, 3])
+            with pytest.raises(ValueError):
+                future.result(timeout=2)
+    finally:
+        batcher.close()
+
+
+def test_close_drains_queue_and_rejects_new_items():
+    batcher = MicroBatcher(lambda items: items, max_wait_ms=1)
+    assert batcher.submit("a") == "a"
+    batcher.close()
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("b")
+
+
+def test_submit_racing_close_never_hangs():
+    for _ in range(20):
+        batcher = MicroBatcher(lambda items: items, max_wait_ms=0.5)
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(batcher.submit, i) for i in range(4)]
+            batcher.close()
+            for future in futures:
+                try:
+                    future.result(timeout=2)
+                except RuntimeError:
+                    pass
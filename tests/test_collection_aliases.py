@@ -0,0 +1,13 @@
+from rag_system.collection_aliases import CollectionAliases, versioned_collection_name
+
+
+def test_swap_never_expires_unversioned_base_collection(tmp_path):
+    aliases = CollectionAliases(str(tmp_path))
+    versions = [f"{versioned_collection_name('kb')}_{i}" for i in range(3)]
+
+    # 首次切换前别名解析为同名的未版本化集合，它不应进入历史或被返回删除
+    assert aliases.swap("kb", versions[0], keep_previous=1) == []
+    assert aliases.swap("kb", versions[1], keep_previous=1) == []
+    assert aliases.swap("kb", versions[2], keep_previous=1) == [versions[0]]
+    assert aliases.resolve("kb") == versions[2]
+    assert aliases.remove("kb") == [versions[2], versions[1]]
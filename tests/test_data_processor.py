@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from rag_system.data_processor import DataProcessor
+
+PLAN = """培养方案总则
+## 微电子科学与工程 专业专业培养方案
+一、专业介绍
+微电子专业介绍。
+二、培养目标与毕业要求
+微电子培养目标。
+## 智能制造工程 专业专业培养方案
+一、专业介绍
+智能制造专业介绍。
+"""
+
+
+def _doc_keys(tmp_path, content):
+    plan_file = tmp_path / "plan.txt"
+    plan_file.write_text(content, encoding="utf-8")
+    return {metadata["doc_key"]: chunk for chunk, metadata in DataProcessor().iter_cultivation_plan(str(plan_file))}
+
+
+def test_iter_plan_sections_splits_by_major_and_heading():
+    sections = list(DataProcessor().iter_plan_sections(PLAN))
+    assert [key for key, _ in sections] == [
+        "#",
+        "微电子科学与工程#一、专业介绍",
+        "微电子科学与工程#二、培养目标与毕业要求",
+        "智能制造工程#一、专业介绍",
+    ]
+    assert sections[1][1].startswith("## 微电子科学与工程 专业专业培养方案\n一、专业介绍")
+    assert sections[2][1] == "二、培养目标与毕业要求\n微电子培养目标。"
+
+
+def test_plan_doc_keys_do_not_shift_when_earlier_section_grows(tmp_path):
+    before = _doc_keys(tmp_path, PLAN)
+    after = _doc_keys(tmp_path, PLAN.replace("微电子专业介绍。", "微电子专业介绍。" * 200))
+
+    # 只有被修改章节的块发生变化，后续章节的doc_key和内容保持不变
+    changed = {key for key in after if before.get(key) != after[key]}
+    assert changed and all(key.startswith("微电子科学与工程#一、专业介绍#") for key in changed)
+    assert after["智能制造工程#一、专业介绍#0"] == before["智能制造工程#一、专业介绍#0"]
@@ -0,0 +1,37 @@
+from rag_system.document_ids import assign_document_ids, make_document_id, plan_sync, split_document_id
+
+
+def test_document_ids_are_deterministic():
+    metadatas = [{"source": "a.csv", "doc_key": "1"}, {"source": "a.csv", "doc_key": "1"}]
+    first = assign_document_ids(["x", "y"], [dict(m) for m in metadatas])
+    second = assign_document_ids(["x", "y"], [dict(m) for m in metadatas])
+    assert first == second
+    assert len(set(first)) == 2
+
+
+def test_split_document_id_handles_legacy_ids():
+    doc_id = make_document_id("a.csv", "1", "text")
+    slot, digest = split_document_id(doc_id)
+    assert len(slot) == 16 and len(digest) == 16
+    assert split_document_id("doc_0") == ("doc_0", None)
+
+
+def test_plan_sync_classifies_changes():
+    unchanged = make_document_id("a.csv", "1", "same")
+    old = make_document_id("a.csv", "2", "old text")
+    new = make_document_id("a.csv", "2", "new text")
+    added = make_document_id("a.csv", "3", "added")
+    removed = make_document_id("a.csv", "4", "removed")
+
+    plan = plan_sync([unchanged, old, removed], [unchanged, new, added])
+    assert plan["write"] == {new, added}
+    assert plan["delete"] == sorted([old, removed])
+    assert (plan["added"], plan["updated"], plan["unchanged"], plan["removed"]) == (1, 1, 1, 1)
+
+
+def test_plan_sync_without_changes():
+    ids = [make_document_id("a.csv", str(i), f"text {i}") for i in range(5)]
+    plan = plan_sync(ids, ids)
+    assert plan["write"] == set()
+    assert plan["delete"] == []
+    assert plan["unchanged"] == 5
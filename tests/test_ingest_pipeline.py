@@ -0,0 +1,142 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from rag_system.numpy_vector_db import NumpyVectorDB
+from rag_system.vector_db import iter_in_thread
+
+
+def test_iter_in_thread_preserves_order():
+    assert list(iter_in_thread(range(100), maxsize=2)) == list(range(100))
+
+
+def test_iter_in_thread_runs_in_background_thread():
+    threads = []
+
+    def produce():
+        for i in range(3):
+            threads.append(threading.current_thread().name)
+            yield i
+
+    assert list(iter_in_thread(produce(), name="test-stage")) == [0, 1, 2]
+    assert set(threads) == {"test-stage"}
+
+
+def test_iter_in_thread_applies_backpressure():
+    produced = []
+
+    def produce():
+        for i in range(50):
+            produced.append(i)
+            yield i
+
+    stage = iter_in_thread(produce(), maxsize=2)
+    assert next(stage) == 0
+    time.sleep(0.3)
+    # 队列容量2 + 已取出的1个 + 生产者阻塞在put上的1个
+    assert len(produced) <= 4
+    stage.close()
+
+
+def test_iter_in_thread_propagates_exceptions():
+    def produce():
+        yield 1
+        raise RuntimeError("boom")
+
+    stage = iter_in_thread(produce())
+    assert next(stage) == 1
+    with pytest.raises(RuntimeError, match="boom"):
+        next(stage)
+
+
+def test_iter_in_thread_closes_upstream_when_consumer_stops():
+    closed = threading.Event()
+
+    def produce():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    stage = iter_in_thread(produce(), maxsize=1)
+    assert next(stage) == 0
+    stage.close()
+    assert closed.wait(1.0)
+
+
+def _embed(texts):
+    rng = np.random.default_rng(len(texts))
+    return rng.standard_normal((len(texts), 8)).astype(np.float32)
+
+
+def _records(count, prefix="doc"):
+    return [(f"{prefix}{i}", f"文档{i}", {"type": "document"}) for i in range(count)]
+
+
+def test_sync_records_adds_and_removes(tmp_path):
+    db = NumpyVectorDB(str(tmp_path))
+    db.create_collection("sync")
+
+    report = db.sync_records(iter(_records(10)), _embed, batch_size=3, queue_size=1)
+    assert report["added"] == 10
+    assert sorted(db.list_ids()) == sorted(f"doc{i}" for i in range(10))
+
+    report = db.sync_records(iter(_records(6)), _embed, batch_size=3)
+    assert report["unchanged"] == 6
+    assert report["removed"] == 4
+    assert sorted(db.list_ids()) == sorted(f"doc{i}" for i in range(6))
+
+
+def test_sync_records_keeps_collection_on_empty_stream(tmp_path):
+    db = NumpyVectorDB(str(tmp_path))
+    db.create_collection("sync")
+    db.sync_records(iter(_records(5)), _embed)
+
+    report = db.sync_records(iter([]), _embed)
+    assert report["removed"] == 0
+    assert len(db.list_ids()) == 5
+
+
+def test_sync_records_propagates_encoder_errors(tmp_path):
+    db = NumpyVectorDB(str(tmp_path))
+    db.create_collection("sync")
+    db.sync_records(iter(_records(5)), _embed)
+
+    def failing_embed(texts):
+        raise RuntimeError("encoder failed")
+
+    with pytest.raises(RuntimeError, match="encoder failed"):
+        db.sync_records(iter(_records(3, prefix="new")), failing_embed)
+    # 编码失败时不应删除任何已有文档
+    assert len(db.list_ids()) == 5
+
+
+def test_sync_records_only_removes_documents_from_sources_read(tmp_path):
+    db = NumpyVectorDB(str(tmp_path))
+    db.create_collection("sync")
+    students = [(f"s{i}", f"学生{i}", {"source": "students.csv"}) for i in range(4)]
+    plans = [(f"p{i}", f"培养方案{i}", {"source": "plan.txt"}) for i in range(3)]
+    db.sync_records(iter(students + plans), _embed)
+
+    # 只重新读取学生数据：培养方案文档保留，学生数据中消失的文档被删除
+    report = db.sync_records(iter(students[:2]), _embed)
+    assert report["removed"] == 2
+    assert sorted(db.list_ids()) == ["p0", "p1", "p2", "s0", "s1"]
+
+
+def test_iter_documents_streams_live_documents_in_batches(tmp_path):
+    db = NumpyVectorDB(str(tmp_path))
+    db.create_collection("sync")
+    db.sync_records(iter(_records(7)), _embed)
+    db.delete_documents(["doc3"])
+
+    batches = list(db.iter_documents(batch_size=4))
+    assert [len(ids) for ids, _, _ in batches] == [4, 2]
+    ids = [doc_id for batch_ids, _, _ in batches for doc_id in batch_ids]
+    assert sorted(ids) == sorted(f"doc{i}" for i in range(7) if i != 3)
+    assert all(document == f"文档{doc_id[3:]}" for batch in batches for doc_id, document in zip(batch[0], batch[1]))
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from rag_system.response_cache import ResponseCache, SingleFlight, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  ＧＰＡ  高的\t学生 ") == normalize_question("gpa 高的 学生")
+
+
+def test_single_flight_shares_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def main():
+        return await asyncio.gather(*(flight.run("q", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result is results[0][0] for result, _ in results)
+    assert flight.get_stats()["in_flight"] == 0
+    assert flight.shared == 4
+
+
+def test_single_flight_shares_exceptions_and_forgets_key():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(flight.do("q", fail), flight.do("q", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.executed == 1
+
+    async def ok():
+        return "ok"
+
+    assert asyncio.run(flight.do("q", ok)) == "ok"
+
+
+def test_single_flight_survives_cancelled_caller():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("q", fetch))
+        second = asyncio.ensure_future(flight.do("q", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_response_cache_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.evictions == 1
+
+
+def test_response_cache_ttl_expiry():
+    cache = ResponseCache(ttl_seconds=0.05)
+    cache.put("a", 1)
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_response_cache_purge():
+    cache = ResponseCache()
+    cache.put(("kb1", "q"), 1)
+    cache.put(("kb2", "q"), 2)
+    assert cache.purge(lambda key: key[0] == "kb1") == 1
+    assert cache.get(("kb1", "q")) is None
+    assert cache.get(("kb2", "q")) == 2
+    assert cache.purge() == 1
+    assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from rag_system.upstream_balancer import NoUpstreamAvailable, Upstream, UpstreamBalancer
+from rag_system.upstream_health import CLOSED, OPEN, CircuitBreaker
+
+
+class FakeHttp:
+    """按预设延迟和状态码返回响应的上游连接池替身"""
+
+    def __init__(self, base_url, delay=0.0, status_code=200):
+        self.base_url = base_url
+        self.delay = delay
+        self.status_code = status_code
+        self.started = 0
+        self.cancelled = 0
+        self.completed = 0
+
+    async def request(self, method, path, **kwargs):
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.completed += 1
+        return httpx.Response(self.status_code, json={"from": self.base_url},
+                              request=httpx.Request(method, self.base_url + path))
+
+    def get_stats(self):
+        return {}
+
+
+def _balancer(*https, **kwargs):
+    upstreams = [Upstream(http, CircuitBreaker(failure_threshold=2)) for http in https]
+    balancer = UpstreamBalancer(upstreams, hedge=True, hedge_min_samples=1,
+                                hedge_min_delay_ms=20, **kwargs)
+    # 预置延迟样本，使对冲延迟为20ms
+    balancer.recent_ms.extend([10.0] * 5)
+    return balancer, upstreams
+
+
+def test_hedge_wins_and_cancels_slow_primary():
+    slow, fast = FakeHttp("http://slow", delay=1.0), FakeHttp("http://fast", delay=0.0)
+    balancer, (slow_upstream, fast_upstream) = _balancer(slow, fast)
+    # 让慢上游成为首选
+    fast_upstream.outstanding = 1
+
+    async def main():
+        response, upstream = await balancer.request("GET", "/q")
+        await asyncio.sleep(0.01)
+        return response, upstream
+
+    response, upstream = asyncio.run(main())
+    assert upstream is fast_upstream
+    assert response.json() == {"from": "http://fast"}
+    assert slow.cancelled == 1
+    assert slow_upstream.cancelled == 1
+    assert balancer.hedge_wins == 1
+    # 被取消的对冲请求不计入熔断
+    assert slow_upstream.breaker.failures == 0
+    assert slow_upstream.breaker.state == CLOSED
+
+
+def test_no_hedge_when_primary_is_fast():
+    first, second = FakeHttp("http://a", delay=0.0), FakeHttp("http://b", delay=0.0)
+    balancer, _ = _balancer(first, second)
+    asyncio.run(balancer.request("GET", "/q"))
+    assert first.started + second.started == 1
+    assert balancer.hedged_requests == 0
+
+
+def test_non_idempotent_request_is_not_hedged():
+    slow, fast = FakeHttp("http://slow", delay=0.05), FakeHttp("http://fast")
+    balancer, (_, fast_upstream) = _balancer(slow, fast)
+    fast_upstream.outstanding = 1
+    response, upstream = asyncio.run(balancer.request("POST", "/q", hedge=False))
+    assert upstream.base_url == "http://slow"
+    assert fast.started == 0
+
+
+def test_caller_cancellation_cancels_all_attempts():
+    first, second = FakeHttp("http://a", delay=1.0), FakeHttp("http://b", delay=1.0)
+    balancer, upstreams = _balancer(first, second)
+
+    async def main():
+        task = asyncio.ensure_future(balancer.request("GET", "/q"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert first.started == second.started == 1
+    assert first.cancelled == second.cancelled == 1
+    assert all(upstream.outstanding == 0 for upstream in upstreams)
+
+
+def test_server_errors_fall_back_and_open_breaker():
+    broken, healthy = FakeHttp("http://broken", status_code=503), FakeHttp("http://ok")
+    balancer, (broken_upstream, healthy_upstream) = _balancer(broken, healthy)
+    healthy_upstream.outstanding = 5
+
+    async def main():
+        for _ in range(2):
+            await balancer.request("GET", "/q", hedge=False)
+
+    asyncio.run(main())
+    assert broken_upstream.breaker.state == OPEN
+    assert balancer.pick() is healthy_upstream
+
+
+def test_all_upstreams_open_raises():
+    balancer, upstreams = _balancer(FakeHttp("http://a"), FakeHttp("http://b"))
+    for upstream in upstreams:
+        upstream.breaker.trip("down")
+    with pytest.raises(NoUpstreamAvailable):
+        balancer.pick()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from rag_system.upstream_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HealthPoller
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+    breaker.record_failure("a")
+    breaker.record_failure("b")
+    assert breaker.state == CLOSED
+    breaker.record_failure("c")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+    assert breaker.retry_after() > 0
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_max_calls=1)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # 只放行一个探测请求
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_half_open_probe_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+
+
+def test_breaker_release_returns_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def _poller(results, breaker):
+    async def check():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return HealthPoller(check, interval=0.01, breaker=breaker)
+
+
+def test_single_failed_poll_does_not_trip_breaker():
+    breaker = CircuitBreaker(failure_threshold=3)
+    poller = _poller([TimeoutError("slow"), {"ok": True}], breaker)
+    asyncio.run(poller.poll_once())
+    assert poller.status == "unhealthy"
+    assert breaker.state == CLOSED
+    asyncio.run(poller.poll_once())
+    assert poller.status == "healthy"
+    assert poller.consecutive_failures == 0
+
+
+def test_consecutive_failed_polls_trip_and_recovery_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    poller = _poller([ConnectionError("down"), ConnectionError("down"), {"ok": True}], breaker)
+    asyncio.run(poller.poll_once())
+    asyncio.run(poller.poll_once())
+    assert breaker.state == OPEN
+    asyncio.run(poller.poll_once())
+    assert breaker.state == HALF_OPEN